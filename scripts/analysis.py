@@ -0,0 +1,420 @@
+from itertools import combinations
+from typing import Dict, List, Tuple
+
+from numpy import (
+    arange,
+    argsort,
+    ascontiguousarray,
+    bincount,
+    clip,
+    float64,
+    floor,
+    full,
+    inf,
+    int64,
+    lexsort,
+    maximum,
+    minimum,
+    ndarray,
+    percentile,
+    put,
+    repeat,
+    searchsorted,
+    sqrt,
+    stack,
+    tile,
+    zeros,
+)
+
+from constants import DISTANCE_METRICS, GRID_VALUES
+from utils import (
+    accumulate_rectangles,
+    expand_ranges,
+    find_tower_pairs,
+    get_footprint_bounds,
+    get_prefix_sums,
+    sum_rectangles,
+)
+
+Bounds = Tuple[ndarray, ndarray, ndarray, ndarray]
+
+
+def get_intersection_bounds(
+    n: int,
+    m: int,
+    xs: ndarray,
+    ys: ndarray,
+    ranges: ndarray,
+    members: List[ndarray],
+) -> Bounds:
+    """Get bounds of intersections of areas covered by groups of towers.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        ranges: ranges of towers.
+        members: indexes of towers, one array for every group member.
+
+    Returns:
+        First rows, last rows (excluded), first columns and last columns
+        (excluded) of intersections.
+    """
+    bounds = [
+        get_footprint_bounds(n, m, xs[index], ys[index], ranges[index])
+        for index in members
+    ]
+    rows_start, rows_end, columns_start, columns_end = bounds[0]
+    for other_bounds in bounds[1:]:
+        rows_start = maximum(rows_start, other_bounds[0])
+        rows_end = minimum(rows_end, other_bounds[1])
+        columns_start = maximum(columns_start, other_bounds[2])
+        columns_end = minimum(columns_end, other_bounds[3])
+    return rows_start, rows_end, columns_start, columns_end
+
+
+def get_failure_impacts(
+    grid: ndarray,
+    coverage: ndarray,
+    xs: ndarray,
+    ys: ndarray,
+    ranges: ndarray,
+    members: List[ndarray],
+) -> ndarray:
+    """Count clear blocks losing coverage if groups of towers fail.
+
+    A block loses coverage if it is covered only by towers of the group,
+    so it is enough to count blocks covered exactly k times in the
+    intersection of areas of every k towers of the group.
+
+    Args:
+        grid: city grid.
+        coverage: amounts of towers covering blocks.
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        ranges: ranges of towers.
+        members: indexes of towers, one array for every group member.
+
+    Returns:
+        Amount of uncovered blocks for every group.
+    """
+    n, m = grid.shape
+    impacts = zeros(len(members[0]), int64)
+    for size in range(1, len(members) + 1):
+        if size == 1:
+            counted = grid == GRID_VALUES['covered']
+        else:
+            counted = (grid == GRID_VALUES['over covered']) & (
+                coverage == size
+            )
+        prefix_sums = get_prefix_sums(counted)
+        for group in combinations(members, size):
+            impacts += sum_rectangles(
+                prefix_sums,
+                *get_intersection_bounds(n, m, xs, ys, ranges, list(group)),
+            )
+    return impacts
+
+
+def find_tower_triangles(
+    firsts: ndarray,
+    seconds: ndarray,
+    towers_amount: int,
+) -> Tuple[ndarray, ndarray, ndarray]:
+    """Find triples of towers, which are pairwise close.
+
+    Args:
+        firsts: first towers of close pairs.
+        seconds: second towers of close pairs (greater than first).
+        towers_amount: amount of towers.
+
+    Returns:
+        Indexes of first, second and third towers in increasing order.
+    """
+    if not len(firsts):
+        return firsts, seconds, seconds
+    order = lexsort((seconds, firsts))
+    firsts, seconds = firsts[order], seconds[order]
+    starts = searchsorted(firsts, firsts)
+    pairs, neighbors = expand_ranges(
+        starts,
+        bincount(firsts, minlength=towers_amount)[firsts],
+    )
+    thirds = seconds[neighbors]
+    keep = thirds > seconds[pairs]
+    pairs, thirds = pairs[keep], thirds[keep]
+    keys = firsts * towers_amount + seconds
+    queries = seconds[pairs] * towers_amount + thirds
+    found = minimum(searchsorted(keys, queries), len(keys) - 1)
+    close = keys[found] == queries
+    pairs = pairs[close]
+    return firsts[pairs], seconds[pairs], thirds[close]
+
+
+def find_worst_failures(
+    grid: ndarray,
+    coverage: ndarray,
+    xs: ndarray,
+    ys: ndarray,
+    ranges: ndarray,
+    size: int,
+    amount: int,
+) -> Tuple[ndarray, ndarray]:
+    """Find groups of close towers, which failure uncovers most blocks.
+
+    Only groups of towers with pairwise overlapping areas are checked.
+
+    Args:
+        grid: city grid.
+        coverage: amounts of towers covering blocks.
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        ranges: ranges of towers.
+        size: amount of towers in group (from 1 to 3).
+        amount: maximum amount of groups to find.
+
+    Returns:
+        Indexes of towers of groups and amounts of uncovered blocks in
+        decreasing order of impact.
+
+    Raises:
+        Exception if size is not supported.
+    """
+    if size == 1:
+        members = [arange(len(xs))]
+    elif size == 2:
+        members = list(find_tower_pairs(xs, ys, ranges))
+    elif size == 3:
+        members = list(
+            find_tower_triangles(
+                *find_tower_pairs(xs, ys, ranges),
+                len(xs),
+            ),
+        )
+    else:
+        raise Exception('Only groups of 1 to 3 towers are supported')
+    impacts = get_failure_impacts(grid, coverage, xs, ys, ranges, members)
+    worst = argsort(-impacts, kind='stable')[:amount]
+    return stack([index[worst] for index in members], axis=1), impacts[worst]
+
+
+def get_failure_impact_map(
+    grid: ndarray,
+    xs: ndarray,
+    ys: ndarray,
+    ranges: ndarray,
+    impacts: ndarray,
+) -> ndarray:
+    """Create map with failure impact of the only tower covering blocks.
+
+    Blocks covered exactly once get the impact of their tower, which is
+    found as the sum of tower numbers over covered areas. Towers get their
+    own impact.
+
+    Args:
+        grid: city grid.
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        ranges: ranges of towers.
+        impacts: failure impacts of towers.
+
+    Returns:
+        Impact map.
+    """
+    n, m = grid.shape
+    owners = accumulate_rectangles(
+        n,
+        m,
+        get_footprint_bounds(n, m, xs, ys, ranges),
+        arange(1, len(xs) + 1),
+    )
+    impact_map = zeros((n, m), int64)
+    uniquely_covered = grid == GRID_VALUES['covered']
+    impact_map[uniquely_covered] = impacts[owners[uniquely_covered] - 1]
+    impact_map[xs, ys] = impacts
+    return impact_map
+
+
+def get_column_distances(n: int, m: int, xs: ndarray, ys: ndarray) -> ndarray:
+    """Calculate distances to the closest tower in the same column.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+
+    Returns:
+        Distances, n + m for columns without towers.
+    """
+    distances = full((n, m), n + m, int64)
+    distances[xs, ys] = 0
+    for row in range(1, n):
+        minimum(distances[row], distances[row - 1] + 1, out=distances[row])
+    for row in range(n - 2, -1, -1):
+        minimum(distances[row], distances[row + 1] + 1, out=distances[row])
+    return distances
+
+
+def get_chebyshev_distances(
+    n: int,
+    m: int,
+    xs: ndarray,
+    ys: ndarray,
+) -> ndarray:
+    """Calculate Chebyshev distance from every block to the closest tower.
+
+    Two raster passes of the 3x3 chamfer mask give exact Chebyshev
+    distances. Every row takes distances from the previous row at once,
+    and the propagation along the row is a running minimum.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+
+    Returns:
+        Distances, n + m everywhere if there are no towers.
+    """
+    distances = full((n, m), n + m, int64)
+    distances[xs, ys] = 0
+    columns = arange(m)
+    for rows in (range(n), range(n - 1, -1, -1)):
+        previous = None
+        for row in rows:
+            current = distances[row]
+            if previous is not None:
+                neighbors = previous.copy()
+                minimum(neighbors[1:], previous[:-1], out=neighbors[1:])
+                minimum(neighbors[:-1], previous[1:], out=neighbors[:-1])
+                minimum(current, neighbors + 1, out=current)
+            minimum.accumulate(current - columns, out=current)
+            current += columns
+            reversed_current = current[::-1]
+            minimum.accumulate(
+                reversed_current - columns,
+                out=reversed_current,
+            )
+            reversed_current += columns
+            previous = current
+    return distances
+
+
+def get_euclidean_distances(
+    n: int,
+    m: int,
+    xs: ndarray,
+    ys: ndarray,
+) -> ndarray:
+    """Calculate Euclidean distance from every block to the closest tower.
+
+    Distances along columns are combined along rows with the lower
+    envelope of parabolas (Felzenszwalb and Huttenlocher), built for all
+    rows at once column by column.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+
+    Returns:
+        Distances, at least n + m everywhere if there are no towers.
+    """
+    heights = ascontiguousarray(
+        get_column_distances(n, m, xs, ys).T.astype(float64) ** 2,
+    )
+    rows = arange(n)
+    vertices = zeros((m, n), int64)
+    values = zeros((m, n))
+    values[0] = heights[0]
+    bounds = full((m + 1, n), inf)
+    bounds[0] = -inf
+    envelope = zeros(n, int64)
+    for column in range(1, m):
+        value = heights[column] + column**2
+        active = rows
+        intersection = zeros(n)
+        while len(active):
+            index = envelope[active] * n + active
+            vertex = vertices.take(index)
+            intersection[active] = (value[active] - values.take(index)) / (
+                2 * (column - vertex)
+            )
+            active = active[intersection[active] <= bounds.take(index)]
+            envelope[active] -= 1
+        envelope += 1
+        index = envelope * n + rows
+        put(vertices, index, column)
+        put(values, index, value)
+        put(bounds, index, intersection)
+        put(bounds, index + n, inf)
+    segments = (arange(m)[:, None] <= envelope).T
+    vertices = vertices.T[segments]
+    starts = clip(floor(bounds[:-1].T[segments]) + 1, 0, m).astype(int64)
+    ends = clip(floor(bounds[1:].T[segments]) + 1, 0, m).astype(int64)
+    vertices = repeat(vertices, ends - starts)
+    columns = tile(arange(m), n)
+    squares = (
+        heights.T.ravel()[rows.repeat(m) * m + vertices]
+        + (columns - vertices) ** 2
+    ).reshape(n, m)
+    return sqrt(squares)
+
+
+def get_distance_statistics(
+    distances: ndarray,
+    mask: ndarray,
+    percentiles: Tuple[int, ...],
+) -> Dict[str, float]:
+    """Calculate statistics of distances of chosen blocks.
+
+    Args:
+        distances: distances of blocks.
+        mask: chosen blocks.
+        percentiles: percentiles to calculate.
+
+    Returns:
+        Mean, maximum and percentiles of distances.
+    """
+    values = distances[mask]
+    if not len(values):
+        return {}
+    statistics = {'mean': float(values.mean()), 'max': float(values.max())}
+    for rank, value in zip(
+        percentiles,
+        percentile(values, percentiles).tolist(),
+    ):
+        statistics[f'p{rank}'] = value
+    return statistics
+
+
+def get_distances(
+    n: int,
+    m: int,
+    xs: ndarray,
+    ys: ndarray,
+    metric: str,
+) -> ndarray:
+    """Calculate distance from every block to the closest tower.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        metric: 'chebyshev' or 'euclidean'.
+
+    Returns:
+        Distances.
+
+    Raises:
+        Exception if metric is not supported.
+    """
+    if metric == 'chebyshev':
+        return get_chebyshev_distances(n, m, xs, ys)
+    if metric == 'euclidean':
+        return get_euclidean_distances(n, m, xs, ys)
+    raise Exception(f'Metric should be one of {DISTANCE_METRICS}')
@@ -0,0 +1,118 @@
+from typing import List
+
+from numpy import (
+    arange,
+    argmax,
+    argsort,
+    bincount,
+    concatenate,
+    cumsum,
+    flatnonzero,
+    int64,
+    ndarray,
+    pad,
+    split,
+    stack,
+    zeros,
+)
+
+from constants import BATCH_GAIN_TYPE, DEFAULT_FOOTPRINT
+from kernels import correlate, create_footprint
+
+
+def cover_batch(
+    masks: ndarray,
+    tower_range: int,
+    footprint: str = DEFAULT_FOOTPRINT,
+) -> List[ndarray]:
+    """Cover stack of cities greedily in lock-step.
+
+    Every step places one tower in every city, which is not covered yet,
+    at the first block with maximal gain, so towers are the same as of
+    greedy strategy of CityGrid. Gains, uncovered blocks and maximal gains
+    of rows of all cities are kept in arrays padded by twice the range,
+    so windows around new towers of all cities are updated at once.
+
+    Args:
+        masks: boolean masks of obstructed blocks with shape (cities, n, m).
+        tower_range: range of towers.
+        footprint: shape of area covered by towers ('square', 'circle'
+            or 'diamond').
+
+    Returns:
+        Positions of towers with shape (towers, 2) for every city in order
+        of placing.
+
+    Raises:
+        Exception if masks are not three-dimensional.
+    """
+    if masks.ndim != 3:
+        raise Exception('Masks should be three-dimensional')
+    kernel = create_footprint(footprint, tower_range)
+    radius = 2 * tower_range
+    padding = ((0, 0), (radius, radius), (radius, radius))
+    uncovered = pad(~masks, padding)
+    gains = pad(
+        correlate(~masks, kernel).astype(BATCH_GAIN_TYPE),
+        padding,
+        constant_values=-1,
+    )
+    gains[pad(masks, padding)] = -1
+    row_maxima = gains.max(axis=2)
+    remaining = (~masks).sum(axis=(1, 2))
+    offsets = arange(2 * tower_range + 1) - tower_range
+    gain_offsets = arange(2 * radius + 1) - radius
+    cities_list = []
+    rows_list = []
+    columns_list = []
+    active = flatnonzero(remaining)
+    while len(active):
+        rows = argmax(row_maxima[active], axis=1)
+        columns = argmax(gains[active, rows], axis=1)
+        cities_list.append(active)
+        rows_list.append(rows)
+        columns_list.append(columns)
+        window = (
+            active[:, None, None],
+            rows[:, None, None] + offsets[:, None],
+            columns[:, None, None] + offsets,
+        )
+        covered = uncovered[window] & kernel
+        uncovered[window] &= ~kernel
+        remaining[active] -= covered.sum(axis=(1, 2))
+        gain_rows = rows[:, None] + gain_offsets
+        gain_window = (
+            active[:, None, None],
+            gain_rows[:, :, None],
+            columns[:, None, None] + gain_offsets,
+        )
+        window_gains = gains[gain_window]
+        window_gains -= (
+            correlate(
+                pad(covered, ((0, 0), (tower_range,) * 2, (tower_range,) * 2)),
+                kernel,
+            )
+            * (window_gains >= 0)
+        ).astype(BATCH_GAIN_TYPE)
+        gains[gain_window] = window_gains
+        gains[active, rows, columns] = -1
+        row_maxima[active[:, None], gain_rows] = gains[
+            active[:, None],
+            gain_rows,
+        ].max(axis=2)
+        active = active[remaining[active] > 0]
+    if not cities_list:
+        return [zeros((0, 2), int64) for _ in masks]
+    cities = concatenate(cities_list)
+    positions = (
+        stack(
+            (concatenate(rows_list), concatenate(columns_list)),
+            axis=1,
+        )
+        - radius
+    )
+    order = argsort(cities, kind='stable')
+    return split(
+        positions[order],
+        cumsum(bincount(cities, minlength=len(masks)))[:-1],
+    )
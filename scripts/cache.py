@@ -0,0 +1,219 @@
+import json
+from collections import OrderedDict
+from hashlib import sha256
+from os import replace, utime
+from pathlib import Path as FilePath
+from tempfile import NamedTemporaryFile
+from typing import Dict, List, Optional, Tuple
+from zipfile import BadZipFile
+
+from numpy import load, ndarray, packbits, savez
+
+from constants import (
+    CACHE_DISK_SIZE,
+    CACHE_MEMORY_SIZE,
+    CACHE_SUFFIX,
+    RESULT_NAMES,
+    RESULTS_VERSION,
+)
+from loaders import FileName
+
+Result = Dict[str, ndarray]
+
+
+def get_result_key(
+    obstruction_mask: ndarray,
+    tower_range: int,
+    strategy: str,
+    footprint: str,
+) -> str:
+    """Get content hash of covering inputs.
+
+    Args:
+        obstruction_mask: boolean mask of obstructed blocks.
+        tower_range: range of towers.
+        strategy: covering strategy.
+        footprint: shape of area covered by towers.
+
+    Returns:
+        Hexadecimal SHA-256 of results version, parameters, mask shape and
+        packed mask.
+    """
+    digest = sha256(str(RESULTS_VERSION).encode())
+    digest.update(
+        json.dumps(
+            [tower_range, strategy, footprint, obstruction_mask.shape],
+        ).encode(),
+    )
+    digest.update(packbits(obstruction_mask).tobytes())
+    return digest.hexdigest()
+
+
+def get_result_size(result: Result) -> int:
+    """Get memory size of cached result.
+
+    Args:
+        result: arrays of result.
+
+    Returns:
+        Size in bytes.
+    """
+    return sum(array.nbytes for array in result.values())
+
+
+def get_file_name(directory: FilePath, key: str) -> FilePath:
+    """Get path to stored result.
+
+    Args:
+        directory: directory of stored results.
+        key: content hash of result.
+
+    Returns:
+        Path to .npz file.
+    """
+    return directory / f'{key}{CACHE_SUFFIX}'
+
+
+def get_stored_files(directory: FilePath) -> List[Tuple[float, int, FilePath]]:
+    """Get stored results from the oldest to the newest.
+
+    Files removed by other processes meanwhile are skipped.
+
+    Args:
+        directory: directory of stored results.
+
+    Returns:
+        Modification times, sizes and paths of files.
+    """
+    stored = []
+    for stored_name in directory.glob(f'*{CACHE_SUFFIX}'):
+        try:
+            status = stored_name.stat()
+        except FileNotFoundError:
+            continue
+        stored.append((status.st_mtime, status.st_size, stored_name))
+    return sorted(stored)
+
+
+def store_result(
+    directory: FilePath,
+    key: str,
+    result: Result,
+    disk_size: int,
+) -> None:
+    """Write result to directory and evict old files over the size.
+
+    The file is written under a unique temporary name and then renamed,
+    so readers never see partial files and writers of the same result
+    do not interfere.
+
+    Args:
+        directory: directory of stored results.
+        key: content hash of result.
+        result: arrays of result.
+        disk_size: maximum size of stored results in bytes.
+    """
+    with NamedTemporaryFile(
+        dir=directory,
+        prefix=f'{key}.',
+        suffix='.tmp',
+        delete=False,
+    ) as file:
+        temporary_name = FilePath(file.name)
+        try:
+            savez(file, **result)
+        except BaseException:
+            file.close()
+            temporary_name.unlink(missing_ok=True)
+            raise
+    replace(temporary_name, get_file_name(directory, key))
+    stored = get_stored_files(directory)
+    size = sum(file_size for _, file_size, _ in stored)
+    for _, file_size, stored_name in stored[:-1]:
+        if size <= disk_size:
+            break
+        stored_name.unlink(missing_ok=True)
+        size -= file_size
+
+
+class ResultCache:
+    """Content-addressed cache of covering results.
+
+    Results are kept in the in-memory LRU, backed by .npz files in the
+    directory. Both are limited by size, the least recently used results
+    are evicted first.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[FileName] = None,
+        memory_size: int = CACHE_MEMORY_SIZE,
+        disk_size: int = CACHE_DISK_SIZE,
+    ) -> None:
+        """Initialize class ResultCache.
+
+        Args:
+            directory: directory of stored results, results are kept only
+                in memory if not specified.
+            memory_size: maximum size of results in memory in bytes.
+            disk_size: maximum size of stored results in bytes.
+        """
+        self.directory = None if directory is None else FilePath(directory)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.results: 'OrderedDict[str, Result]' = OrderedDict()
+        self.size = 0
+
+    def _remember(self, key: str, result: Result) -> None:
+        """Put result to memory and evict old results over the size.
+
+        Args:
+            key: content hash of result.
+            result: arrays of result.
+        """
+        if key in self.results:
+            self.size -= get_result_size(self.results.pop(key))
+        self.results[key] = result
+        self.size += get_result_size(result)
+        while self.size > self.memory_size and len(self.results) > 1:
+            self.size -= get_result_size(self.results.popitem(False)[1])
+
+    def get(self, key: str) -> Optional[Result]:
+        """Get cached result.
+
+        Args:
+            key: content hash of result.
+
+        Returns:
+            Arrays of result, None if result is not cached. Broken stored
+            results are removed and treated as not cached.
+        """
+        result = self.results.get(key)
+        if result is not None:
+            self.results.move_to_end(key)
+            return result
+        if self.directory is None:
+            return None
+        file_name = get_file_name(self.directory, key)
+        try:
+            with load(file_name) as data:
+                result = {name: data[name] for name in RESULT_NAMES}
+            utime(file_name)
+        except (OSError, EOFError, ValueError, BadZipFile, KeyError):
+            file_name.unlink(missing_ok=True)
+            return None
+        self._remember(key, result)
+        return result
+
+    def put(self, key: str, result: Result) -> None:
+        """Cache result.
+
+        Args:
+            key: content hash of result.
+            result: arrays of result.
+        """
+        self._remember(key, result)
+        if self.directory is not None:
+            store_result(self.directory, key, result, self.disk_size)
@@ -1,65 +1,250 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import repeat
 from math import sqrt
 from random import sample
-from typing import List, Set
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from matplotlib import colors, patches, pyplot
+from numpy import (
+    arange,
+    array,
+    bincount,
+    concatenate,
+    flatnonzero,
+    full,
+    int32,
+    isin,
+    lexsort,
+    ndarray,
+    nonzero,
+    uint8,
+    where,
+    zeros,
+)
 
+from analysis import (
+    find_worst_failures,
+    get_distance_statistics,
+    get_distances,
+    get_failure_impact_map,
+    get_failure_impacts,
+)
+from cache import Result, ResultCache, get_result_key
 from constants import (
+    BLOCK_VALUES,
     CITY_COLORS,
     CITY_LABELS,
+    CLEAR_VALUES,
+    DEFAULT_CELL_SIZE,
+    DEFAULT_CHUNK_ROWS,
+    DEFAULT_DISTANCE_METRIC,
+    DEFAULT_FAILURES_AMOUNT,
+    DEFAULT_FAILURES_SIZE,
+    DEFAULT_FOOTPRINT,
     DEFAULT_OBSTRUCTED_PERCENTAGE,
+    DEFAULT_OBSTRUCTED_SHARE,
+    DEFAULT_STRATEGY,
+    DISTANCE_COLORMAP,
+    DISTANCE_PERCENTILES,
     GRID_VALUES,
+    GRID_VALUES_AMOUNT,
+    IMPACT_COLORMAP,
+    LINK_GAP,
+    STRATEGIES,
+    VERIFICATION_AMOUNT,
 )
-from objects import Path, Position, Tower
+from hierarchy import get_tiling_positions
+from kernels import (
+    accumulate_footprints,
+    add_footprint,
+    create_footprint,
+    find_best_position,
+    get_footprint_area,
+    get_gain_maps,
+    get_window,
+    update_gain_map,
+)
+from loaders import FileName, load_obstruction_mask
+from objects import Path, Position, TowerType
+from placement import get_backend
+from store import PathView, TowerStore
 from utils import (
-    additionally_optimize_place_for_tower,
-    change_grid_from_data,
-    create_grid_from_data,
-    find_place_for_tower,
-    find_tower_by_path,
+    count_grid_values,
+    create_random_mask,
+    find_tower_pairs,
+    get_cheapest_types,
     get_covered_area,
+    get_footprint_slices,
+    get_grid_values,
     get_percentage,
     get_percentage_amount,
+    get_position_arrays,
+    get_positions_from_mask,
+    get_rectangle_positions,
+    get_workers,
 )
+from verification import find_violations
 
 
 class CityGrid:
     """Class for city grid."""
 
-    def __init__(self, n: int, m: int) -> None:
+    def __init__(
+        self,
+        n: int,
+        m: int,
+        obstruction_mask: Optional[ndarray] = None,
+    ) -> None:
         """Initialize class CityGrid.
 
         Args:
             n: rows amount (height).
             m: columns amount (width).
+            obstruction_mask: boolean mask of obstructed blocks with shape
+                (n, m), random blocks are obstructed if not specified.
+
+        Raises:
+            Exception if obstruction mask has wrong shape.
         """
         self.n = n
         self.m = m
-        self.towers: List[Tower] = []
-        self.paths: List[Path] = []
-        self.min_percentage = DEFAULT_OBSTRUCTED_PERCENTAGE
-        self.obstructed_amount = get_percentage_amount(
-            m * n,
-            self.min_percentage,
-        )
+        self.towers = TowerStore(self.get_covered_area)
+        if obstruction_mask is None:
+            self.min_percentage = DEFAULT_OBSTRUCTED_PERCENTAGE
+            self.obstructed_amount = get_percentage_amount(
+                m * n,
+                self.min_percentage,
+            )
+            obstruction_mask = create_random_mask(
+                n,
+                m,
+                self.obstructed_amount,
+            )
+        else:
+            if obstruction_mask.shape != (n, m):
+                raise Exception('Obstruction mask has wrong shape')
+            self.obstructed_amount = int(obstruction_mask.sum())
+            self.min_percentage = get_percentage(
+                m * n,
+                self.obstructed_amount,
+            )
         self.percentage = get_percentage(m * n, self.obstructed_amount)
-        self.clear_map = set(
-            [Position(i, j) for i in range(n) for j in range(m)],
-        )
-        self.obstructed_blocks = set(
-            sample(self.clear_map, self.obstructed_amount),
+        self.obstructions = obstruction_mask.astype(bool)
+        self.grid = zeros((n, m), uint8)
+        self.grid[self.obstructions] = GRID_VALUES['obstructed']
+        self.coverage = zeros((n, m), int32)
+        self._amounts = count_grid_values(self.grid)
+        self.footprint = DEFAULT_FOOTPRINT
+        self._journal: List[Callable[[], Any]] = []
+        self._checkpoints: List[int] = []
+        self._forks: List[int] = []
+        self.debug = False
+
+    @classmethod
+    def from_file(
+        cls,
+        file_name: FileName,
+        cell_size: int = DEFAULT_CELL_SIZE,
+        obstructed_share: float = DEFAULT_OBSTRUCTED_SHARE,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        invert: bool = False,
+    ) -> 'CityGrid':
+        """Create CityGrid with obstructed blocks loaded from file.
+
+        Args:
+            file_name: path to .png, .npy, .csv or ASCII grid file.
+            cell_size: side of the square block in source pixels.
+            obstructed_share: minimal share of obstructed pixels to
+                obstruct the whole block.
+            chunk_rows: approximate rows amount to read at a time.
+            invert: obstruct zero (dark) pixels instead of non-zero ones.
+
+        Returns:
+            Created CityGrid.
+        """
+        obstruction_mask = load_obstruction_mask(
+            file_name,
+            cell_size,
+            obstructed_share,
+            chunk_rows,
+            invert,
         )
-        self.clear_blocks = self.clear_map - self.obstructed_blocks
-        self.covered_blocks: Set[Position] = set()
-        self.uncovered_blocks: Set[Position] = self.clear_blocks.copy()
-        self.obstructed_covered_blocks: Set[Position] = set()
-        self.over_covered_blocks: Set[Position] = set()
-        self.grid = create_grid_from_data(
-            n,
-            m,
-            {GRID_VALUES['obstructed']: self.obstructed_blocks},
+        n, m = obstruction_mask.shape
+        return cls(n, m, obstruction_mask)
+
+    @property
+    def paths(self) -> PathView:
+        """Paths between linked towers."""
+        return self.towers.paths
+
+    @property
+    def clear_blocks(self) -> Set[Position]:
+        """Positions of not obstructed blocks without towers."""
+        return self._get_blocks('clear_blocks')
+
+    @property
+    def uncovered_blocks(self) -> Set[Position]:
+        """Positions of clear blocks not covered by towers."""
+        return self._get_blocks('uncovered_blocks')
+
+    @property
+    def covered_blocks(self) -> Set[Position]:
+        """Positions of clear blocks covered by one tower."""
+        return self._get_blocks('covered_blocks')
+
+    @property
+    def over_covered_blocks(self) -> Set[Position]:
+        """Positions of clear blocks covered by several towers."""
+        return self._get_blocks('over_covered_blocks')
+
+    @property
+    def obstructed_blocks(self) -> Set[Position]:
+        """Positions of obstructed blocks."""
+        return self._get_blocks('obstructed_blocks')
+
+    @property
+    def obstructed_covered_blocks(self) -> Set[Position]:
+        """Positions of obstructed blocks covered by towers."""
+        return self._get_blocks('obstructed_covered_blocks')
+
+    def _get_blocks(self, attribute: str) -> Set[Position]:
+        """Get positions of blocks from the grid.
+
+        Sets are built on request only, the grid is the state of blocks.
+
+        Args:
+            attribute: name of set of blocks.
+
+        Returns:
+            Set of positions.
+        """
+        return get_positions_from_mask(
+            isin(self.grid, BLOCK_VALUES[attribute]),
         )
 
+    def _count_blocks(self, attribute: str) -> int:
+        """Get amount of blocks in set without building it.
+
+        Args:
+            attribute: name of set of blocks.
+
+        Returns:
+            Amount of blocks.
+        """
+        return int(self._amounts[list(BLOCK_VALUES[attribute])].sum())
+
     def get_name(self) -> str:
         """Create the name of class CityGrid.
 
@@ -103,55 +288,515 @@ class CityGrid:
             ncol=len(CITY_COLORS) // 2,
         )
 
-    def change_obstructed(self, percentage: float) -> None:
+    def _record(self, undo: Callable[[], Any]) -> None:
+        """Record function undoing the change if checkpoint exists.
+
+        Args:
+            undo: function undoing the change.
+        """
+        if self._checkpoints:
+            self._journal.append(undo)
+
+    def _record_attributes(self, *names: str) -> None:
+        """Record current values of attributes if checkpoint exists.
+
+        Args:
+            names: names of attributes to restore on rollback.
+        """
+        if self._checkpoints:
+            values = {name: getattr(self, name) for name in names}
+            self._journal.append(lambda: self.__dict__.update(values))
+
+    def _set_values(
+        self,
+        rows: ndarray,
+        columns: ndarray,
+        values: ndarray,
+    ) -> None:
+        """Set grid values of different blocks and count them.
+
+        Args:
+            rows: x coordinates of blocks.
+            columns: y coordinates of blocks.
+            values: new grid values of blocks.
+        """
+        old_values = self.grid[rows, columns]
+        self._record(partial(self._set_values, rows, columns, old_values))
+        self.grid[rows, columns] = values
+        self._amounts += bincount(
+            values,
+            minlength=GRID_VALUES_AMOUNT,
+        ) - bincount(old_values, minlength=GRID_VALUES_AMOUNT)
+
+    def _set_obstructions(
+        self,
+        rows: ndarray,
+        columns: ndarray,
+        obstructions: ndarray,
+    ) -> None:
+        """Set obstruction of different blocks.
+
+        Args:
+            rows: x coordinates of blocks.
+            columns: y coordinates of blocks.
+            obstructions: whether blocks are obstructed.
+        """
+        self._record(
+            partial(
+                self._set_obstructions,
+                rows,
+                columns,
+                self.obstructions[rows, columns],
+            ),
+        )
+        self.obstructions[rows, columns] = obstructions
+
+    def _update_blocks(
+        self,
+        rows: ndarray,
+        columns: ndarray,
+        obstructed: Optional[bool] = None,
+    ) -> None:
+        """Recalculate grid values of different blocks using their coverage.
+
+        Args:
+            rows: x coordinates of blocks.
+            columns: y coordinates of blocks.
+            obstructed: new obstruction of blocks, kept if not specified.
+        """
+        if obstructed is not None:
+            self._set_obstructions(
+                rows,
+                columns,
+                full(len(rows), obstructed),
+            )
+        old_values = self.grid[rows, columns]
+        values = get_grid_values(
+            self.obstructions[rows, columns],
+            old_values == GRID_VALUES['tower'],
+            self.coverage[rows, columns],
+        )
+        changed = values != old_values
+        self._set_values(rows[changed], columns[changed], values[changed])
+
+    def _update_area(self, position: Position, tower_range: int) -> None:
+        """Recalculate grid values of blocks around tower position.
+
+        Args:
+            position: tower position.
+            tower_range: tower range.
+        """
+        rows_slice, columns_slice = get_footprint_slices(
+            self.n,
+            self.m,
+            position,
+            tower_range,
+        )
+        old_values = self.grid[rows_slice, columns_slice]
+        values = get_grid_values(
+            self.obstructions[rows_slice, columns_slice],
+            old_values == GRID_VALUES['tower'],
+            self.coverage[rows_slice, columns_slice],
+        )
+        rows, columns = nonzero(values != old_values)
+        self._set_values(
+            rows + rows_slice.start,
+            columns + columns_slice.start,
+            values[rows, columns],
+        )
+
+    def _change_coverage(
+        self,
+        position: Position,
+        tower_range: int,
+        difference: int,
+        footprint: str,
+    ) -> None:
+        """Change coverage of blocks covered by tower.
+
+        Args:
+            position: tower position.
+            tower_range: tower range.
+            difference: coverage difference.
+            footprint: shape of area covered by tower.
+        """
+        if footprint == 'square':
+            self.coverage[
+                get_footprint_slices(self.n, self.m, position, tower_range)
+            ] += difference
+        else:
+            add_footprint(
+                self.coverage,
+                position,
+                create_footprint(footprint, tower_range),
+                difference,
+            )
+        self.coverage[position] -= difference
+        self._record(
+            partial(
+                self._change_coverage,
+                position,
+                tower_range,
+                -difference,
+                footprint,
+            ),
+        )
+
+    def _check_square_footprint(self, footprint: Optional[str] = None) -> None:
+        """Check that towers cover square areas.
+
+        Args:
+            footprint: shape of area covered by towers, the current one if
+                not specified.
+
+        Raises:
+            Exception if footprint is not square.
+        """
+        if (footprint or self.footprint) != 'square':
+            raise Exception('Only square footprints are supported')
+
+    def get_covered_area(
+        self,
+        position: Position,
+        tower_range: int,
+    ) -> Set[Position]:
+        """Get area covered by tower with the city footprint.
+
+        Args:
+            position: tower position.
+            tower_range: tower range.
+
+        Returns:
+            Set of covered positions without tower position.
+        """
+        if self.footprint == 'square':
+            return get_covered_area(self.n, self.m, position, tower_range)
+        return get_footprint_area(
+            self.n,
+            self.m,
+            position,
+            create_footprint(self.footprint, tower_range),
+        )
+
+    def _update_obstructed_amount(self) -> None:
+        """Update obstructed blocks amount and percentage."""
+        self._record_attributes('percentage', 'obstructed_amount')
+        self.obstructed_amount = self._count_blocks('obstructed_blocks')
+        self.percentage = get_percentage(
+            self.m * self.n,
+            self.obstructed_amount,
+        )
+
+    def checkpoint(self) -> int:
+        """Start recording changes to be able to roll them back.
+
+        Only changed blocks and towers are recorded, so memory usage
+        is proportional to the amount of changes.
+
+        Returns:
+            Number of created checkpoint.
+        """
+        self._checkpoints.append(len(self._journal))
+        return len(self._checkpoints)
+
+    def rollback(self, checkpoint: Optional[int] = None) -> None:
+        """Undo all changes made after checkpoint.
+
+        Args:
+            checkpoint: number of checkpoint, the last one if not specified.
+
+        Raises:
+            Exception if checkpoint does not exist or belongs to active fork.
+        """
+        if checkpoint is None:
+            checkpoint = len(self._checkpoints)
+        if not 0 < checkpoint <= len(self._checkpoints):
+            raise Exception('Checkpoint not found')
+        if self._forks and checkpoint <= self._forks[-1]:
+            raise Exception('Checkpoint belongs to active fork')
+        start = self._checkpoints[checkpoint - 1]
+        undo_list = self._journal[start:]
+        del self._journal[start:]
+        checkpoints = self._checkpoints[: checkpoint - 1]
+        self._checkpoints = []
+        for undo in reversed(undo_list):
+            undo()
+        self._checkpoints = checkpoints
+        self._verify_in_debug()
+
+    def commit(self) -> None:
+        """Keep changes made after the last checkpoint and forget it.
+
+        Raises:
+            Exception if there are no checkpoints or the last one belongs
+            to active fork.
+        """
+        if not self._checkpoints:
+            raise Exception('Checkpoint not found')
+        if self._forks and len(self._checkpoints) <= self._forks[-1]:
+            raise Exception('Checkpoint belongs to active fork')
+        self._checkpoints.pop()
+        if not self._checkpoints:
+            self._journal = []
+
+    @contextmanager
+    def fork(self) -> Iterator['CityGrid']:
+        """Make what-if changes, which are rolled back on exit.
+
+        Checkpoints created inside the fork can be committed or rolled
+        back, but the fork checkpoint itself and the outer ones can not.
+
+        Yields:
+            The same CityGrid recording its changes.
+        """
+        checkpoint = self.checkpoint()
+        self._forks.append(checkpoint)
+        try:
+            yield self
+        finally:
+            self._forks.pop()
+            self.rollback(checkpoint)
+
+    def get_violations(
+        self,
+        complete: bool = False,
+        amount: int = VERIFICATION_AMOUNT,
+    ) -> List[str]:
+        """Check invariants of grid, coverage, towers, links and amounts.
+
+        Args:
+            complete: check that all clear blocks are covered.
+            amount: maximum amount of reported items of every violation.
+
+        Returns:
+            Descriptions of violations with the first violating blocks,
+            towers or links.
+        """
+        xs, ys, ranges = self.towers.get_arrays()
+        return find_violations(
+            self.grid,
+            self.coverage,
+            xs,
+            ys,
+            ranges,
+            self.towers.get_links(),
+            self.footprint,
+            self.obstructions,
+            self._amounts,
+            complete,
+            amount,
+        )
+
+    def verify(
+        self,
+        complete: bool = False,
+        amount: int = VERIFICATION_AMOUNT,
+    ) -> None:
+        """Check invariants of grid, coverage, towers, links and amounts.
+
+        Args:
+            complete: check that all clear blocks are covered.
+            amount: maximum amount of reported items of every violation.
+
+        Raises:
+            Exception with descriptions of violations if any are found.
+        """
+        violations = self.get_violations(complete, amount)
+        if violations:
+            raise Exception(
+                'City state is broken:\n' + '\n'.join(violations),
+            )
+
+    def _verify_in_debug(self, complete: bool = False) -> None:
+        """Check invariants after changes if debug mode is on.
+
+        Args:
+            complete: check that all clear blocks are covered.
+        """
+        if self.debug:
+            self.verify(complete)
+
+    def change_obstructed(
+        self,
+        percentage: float,
+        tower_range: Optional[int] = None,
+    ) -> None:
         """Change obstructed blocks percentage.
 
         Args:
             percentage: new obstructed blocks percentage.
+            tower_range: range of towers to cover the city incrementally,
+                all towers are removed if not specified.
         """
-        self.clear_city()
+        if tower_range is None:
+            self.clear_city()
         if not 100 >= percentage >= 0:
             raise Exception('Percentage should be in the range from 0 to 100')
+        self._record_attributes('min_percentage')
         self.min_percentage = percentage
         new_obstructed_amount = get_percentage_amount(
             self.m * self.n,
             percentage,
         )
         if new_obstructed_amount > self.obstructed_amount:
-            self.percentage = get_percentage(
-                self.m * self.n,
-                new_obstructed_amount,
-            )
-            new_obstructed_blocks = set(
-                sample(
-                    self.clear_blocks,
+            self.obstruct_blocks(
+                self._sample_blocks(
+                    ~self.obstructions,
                     new_obstructed_amount - self.obstructed_amount,
                 ),
             )
-            self.clear_blocks -= new_obstructed_blocks
-            self.uncovered_blocks = self.clear_blocks.copy()
-            self.obstructed_blocks |= new_obstructed_blocks
-            self.obstructed_amount = new_obstructed_amount
-            change_grid_from_data(self.grid, {1: new_obstructed_blocks})
         elif new_obstructed_amount < self.obstructed_amount:
-            self.percentage = get_percentage(
-                self.m * self.n,
-                new_obstructed_amount,
-            )
-            new_clear_blocks = set(
-                sample(
-                    self.obstructed_blocks,
+            self.clear_obstructions(
+                self._sample_blocks(
+                    self.obstructions,
                     self.obstructed_amount - new_obstructed_amount,
                 ),
             )
-            self.clear_blocks |= new_clear_blocks
-            self.uncovered_blocks = self.clear_blocks.copy()
-            self.obstructed_blocks -= new_clear_blocks
-            self.obstructed_amount = new_obstructed_amount
-            change_grid_from_data(
-                self.grid,
-                {GRID_VALUES['clear']: new_clear_blocks},
-            )
+        if tower_range is not None:
+            self._repair_covering(tower_range)
+
+    def _repair_covering(self, tower_range: int) -> None:
+        """Cover uncovered blocks keeping placed towers after changes.
+
+        Sweep supports only square footprints, so the city is covered
+        greedily with other footprints.
+
+        Args:
+            tower_range: range of new towers.
+        """
+        self.cover_with_towers(
+            tower_range,
+            incremental=True,
+            strategy=DEFAULT_STRATEGY
+            if self.footprint == 'square'
+            else 'greedy',
+        )
+
+    def _sample_blocks(self, mask: ndarray, amount: int) -> List[Position]:
+        """Choose random blocks of mask.
+
+        Args:
+            mask: boolean mask of blocks to choose from.
+            amount: amount of chosen blocks.
+
+        Returns:
+            Positions of chosen blocks.
+        """
+        return [
+            Position(*divmod(index, self.m))
+            for index in sample(flatnonzero(mask).tolist(), amount)
+        ]
+
+    def _get_position_arrays(
+        self,
+        positions: Iterable[Position],
+    ) -> Tuple[ndarray, ndarray]:
+        """Get coordinates of different positions inside the grid.
+
+        Args:
+            positions: positions of blocks, may be repeated.
+
+        Returns:
+            Arrays of x and y coordinates.
+
+        Raises:
+            Exception if some position is outside of the grid.
+        """
+        rows, columns = get_position_arrays(positions)
+        if not (
+            (rows >= 0).all()
+            and (rows < self.n).all()
+            and (columns >= 0).all()
+            and (columns < self.m).all()
+        ):
+            raise Exception('Position is outside of the grid')
+        return rows, columns
+
+    def obstruct_blocks(
+        self,
+        positions: Iterable[Position],
+        tower_range: Optional[int] = None,
+    ) -> None:
+        """Obstruct blocks removing towers placed on them.
+
+        Args:
+            positions: positions of blocks to obstruct.
+            tower_range: range of towers to cover uncovered blocks after
+                removing towers, blocks are left uncovered if not specified.
+
+        Raises:
+            Exception if some position is outside of the grid.
+        """
+        rows, columns = self._get_position_arrays(positions)
+        clear = ~self.obstructions[rows, columns]
+        rows, columns = rows[clear], columns[clear]
+        towers = self.grid[rows, columns] == GRID_VALUES['tower']
+        for x, y in zip(rows[towers].tolist(), columns[towers].tolist()):
+            self.remove_tower(Position(x, y))
+        self._update_blocks(rows, columns, True)
+        self._update_obstructed_amount()
+        if tower_range is not None:
+            self._repair_covering(tower_range)
+
+    def clear_obstructions(
+        self,
+        positions: Iterable[Position],
+        tower_range: Optional[int] = None,
+    ) -> None:
+        """Make obstructed blocks clear.
+
+        Args:
+            positions: positions of blocks to clear.
+            tower_range: range of towers to cover new clear blocks, blocks
+                are left uncovered if not specified.
+
+        Raises:
+            Exception if some position is outside of the grid.
+        """
+        rows, columns = self._get_position_arrays(positions)
+        obstructed = self.obstructions[rows, columns]
+        self._update_blocks(rows[obstructed], columns[obstructed], False)
+        self._update_obstructed_amount()
+        if tower_range is not None:
+            self._repair_covering(tower_range)
+
+    def obstruct_rectangle(
+        self,
+        left_bottom: Position,
+        right_top: Position,
+        tower_range: Optional[int] = None,
+    ) -> None:
+        """Obstruct rectangle of blocks removing towers placed on them.
+
+        Args:
+            left_bottom: corner with minimal coordinates.
+            right_top: corner with maximal coordinates.
+            tower_range: range of towers to cover uncovered blocks after
+                removing towers, blocks are left uncovered if not specified.
+        """
+        self.obstruct_blocks(
+            get_rectangle_positions(self.n, self.m, left_bottom, right_top),
+            tower_range,
+        )
+
+    def clear_rectangle(
+        self,
+        left_bottom: Position,
+        right_top: Position,
+        tower_range: Optional[int] = None,
+    ) -> None:
+        """Make obstructed blocks of rectangle clear.
+
+        Args:
+            left_bottom: corner with minimal coordinates.
+            right_top: corner with maximal coordinates.
+            tower_range: range of towers to cover new clear blocks, blocks
+                are left uncovered if not specified.
+        """
+        self.clear_obstructions(
+            get_rectangle_positions(self.n, self.m, left_bottom, right_top),
+            tower_range,
+        )
 
     def place_tower(self, position: Position, tower_range: int) -> None:
         """Place tower to provided place.
@@ -163,121 +808,525 @@ class CityGrid:
         Returns:
             Created tower object.
         """
-        if self.grid[position] in (
-            GRID_VALUES['obstructed'],
-            GRID_VALUES['obstructed covered'],
-            GRID_VALUES['tower'],
+        if (
+            self.obstructions[position]
+            or self.grid[position] == GRID_VALUES['tower']
         ):
             raise Exception('Forbidden to place the tower')
-        tower = Tower(
-            position,
-            tower_range,
-            get_covered_area(self.n, self.m, position, tower_range),
-            [],
-        )
-        self.towers.append(tower)
-        self.clear_blocks -= {tower.position}
-        self.uncovered_blocks -= {tower.position}
-        self.covered_blocks -= {tower.position}
-        self.over_covered_blocks -= {tower.position}
-        new_covered_blocks = self.uncovered_blocks & tower.covered
-        new_obstructed_covered_blocks = self.obstructed_blocks & tower.covered
-        new_over_covered_blocks = self.covered_blocks & tower.covered - {
-            tower.position,
-        }
-        self.obstructed_covered_blocks |= new_obstructed_covered_blocks
-        self.over_covered_blocks |= new_over_covered_blocks
-        self.covered_blocks |= new_covered_blocks
-        self.covered_blocks -= new_over_covered_blocks
-        self.uncovered_blocks -= new_covered_blocks
-        change_grid_from_data(
-            self.grid,
-            {
-                GRID_VALUES['covered']: new_covered_blocks,
-                GRID_VALUES[
-                    'obstructed covered'
-                ]: new_obstructed_covered_blocks,
-                GRID_VALUES['over covered']: new_over_covered_blocks,
-                GRID_VALUES['tower']: set([tower.position]),
-            },
+        self.towers.append(position, tower_range)
+        self._record(self.towers.pop)
+        self._change_coverage(position, tower_range, 1, self.footprint)
+        self._set_values(
+            array([position.x]),
+            array([position.y]),
+            array([GRID_VALUES['tower']], uint8),
         )
+        self._update_area(position, tower_range)
 
     def clear_city(self) -> None:
         """Clear city grid from all towers and paths."""
-        tower_blocks = {tower.position for tower in self.towers}
-        self.clear_blocks |= tower_blocks
-        self.uncovered_blocks = self.clear_blocks.copy()
-        change_grid_from_data(
-            self.grid,
-            {
-                GRID_VALUES['clear']: self.covered_blocks
-                | self.over_covered_blocks
-                | tower_blocks,
-                GRID_VALUES['obstructed']: self.obstructed_covered_blocks,
-            },
+        rows, columns = nonzero(
+            ~isin(
+                self.grid,
+                (GRID_VALUES['clear'], GRID_VALUES['obstructed']),
+            ),
+        )
+        self._set_values(
+            rows,
+            columns,
+            where(
+                self.obstructions[rows, columns],
+                GRID_VALUES['obstructed'],
+                GRID_VALUES['clear'],
+            ).astype(uint8),
         )
-        self.covered_blocks = set()
-        self.over_covered_blocks = set()
-        self.obstructed_covered_blocks = set()
-        self.towers = []
-        self.paths = []
+        self._record_attributes('towers', 'coverage')
+        self.towers = TowerStore(self.get_covered_area)
+        self.coverage = zeros((self.n, self.m), int32)
 
-    def cover_with_towers(self, tower_range: int) -> None:
+    def remove_tower(self, position: Position) -> None:
+        """Remove tower and its paths.
+
+        Args:
+            position: position of tower.
+        """
+        index = self.towers.find(position)
+        tower_range = int(self.towers.ranges[index])
+        self._record(
+            partial(self.towers.insert, index, self.towers.delete(index)),
+        )
+        self._change_coverage(position, tower_range, -1, self.footprint)
+        self._set_values(
+            array([position.x]),
+            array([position.y]),
+            array([GRID_VALUES['clear']], uint8),
+        )
+        self._update_area(position, tower_range)
+        self._verify_in_debug()
+
+    def _prepare_covering(
+        self,
+        incremental: bool,
+        footprint: Optional[str],
+    ) -> None:
+        """Clear the city and change footprint before covering.
+
+        Args:
+            incremental: keep placed towers and cover only uncovered blocks.
+            footprint: shape of area covered by towers, the current one if
+                not specified.
+
+        Raises:
+            Exception if footprint is unknown or changed while towers are
+            kept, the city is not changed then.
+        """
+        if footprint is None:
+            footprint = self.footprint
+        if footprint != self.footprint:
+            create_footprint(footprint, 0)
+            if incremental and self.towers:
+                raise Exception('Footprint can not change with placed towers')
+        if not incremental:
+            self.clear_city()
+        if footprint != self.footprint:
+            self._record_attributes('footprint')
+            self.footprint = footprint
+
+    def cover_with_towers(
+        self,
+        tower_range: int,
+        incremental: bool = False,
+        strategy: str = DEFAULT_STRATEGY,
+        footprint: Optional[str] = None,
+        backend: Optional[str] = None,
+        workers: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+    ) -> None:
         """Cover the whole city with minimum amount of towers.
 
         Args:
             tower_range: range og towers.
+            incremental: keep placed towers and cover only uncovered blocks.
+            strategy: 'sweep' to place towers from the corner, 'greedy'
+                to place every tower where it covers most blocks or
+                'hierarchical' to tile clear areas and cover the rest
+                greedily.
+            footprint: shape of area covered by towers ('square', 'circle'
+                or 'diamond'), the current one if not specified.
+            backend: 'numba' or 'numpy' array kernels of sweep, the fastest
+                available if not specified.
+            workers: amount of threads of greedy and hierarchical
+                strategies, all processors if not specified.
+            cache: cache of results to restore the same covering of the
+                same obstructions from, not used for incremental covering.
+
+        Raises:
+            Exception if strategy is not supported or footprint is changed
+            while towers are kept.
         """
-        self.clear_city()
-        while self.uncovered_blocks:
-            closest_position = min(
-                self.uncovered_blocks,
-                key=lambda position: position.x + position.y,
-            )
-            optimized_place = find_place_for_tower(
+        if strategy not in STRATEGIES:
+            raise Exception(f'Strategy should be one of {STRATEGIES}')
+        if strategy == 'sweep':
+            self._check_square_footprint(footprint)
+        key = None
+        if cache is not None and not incremental:
+            key = get_result_key(
+                self.obstructions,
                 tower_range,
-                closest_position,
-                self.clear_blocks,
-                self.uncovered_blocks,
-                self.covered_blocks,
-                self.n,
-                self.m,
+                strategy,
+                footprint or self.footprint,
             )
-            additionally_optimized_place = (
-                additionally_optimize_place_for_tower(
-                    optimized_place,
-                    self.uncovered_blocks,
-                    self.clear_blocks,
-                    tower_range,
-                    self.n,
-                    self.m,
-                )
+            result = cache.get(key)
+            if result is not None:
+                self._set_covering(result, footprint or self.footprint)
+                self._verify_in_debug(True)
+                return
+        self._prepare_covering(incremental, footprint)
+        if strategy == 'greedy':
+            self._cover_by_gain(
+                [TowerType(strategy, tower_range, 1)],
+                workers,
             )
-            self.place_tower(
-                additionally_optimized_place,
-                tower_range,
+        elif strategy == 'hierarchical':
+            self._cover_by_tiling(tower_range, workers)
+        else:
+            self._cover_by_sweep(tower_range, backend)
+        if cache is not None and key is not None:
+            cache.put(key, self.get_covering())
+        self._verify_in_debug(True)
+
+    def get_covering(self) -> Result:
+        """Get arrays of towers, grid and coverage to cache.
+
+        Returns:
+            Positions and ranges of towers, grid and coverage.
+        """
+        columns = self.towers.get_columns()
+        return {
+            'positions': columns[:2].T.copy(),
+            'ranges': columns[2].copy(),
+            'grid': self.grid.astype(uint8),
+            'coverage': self.coverage.copy(),
+        }
+
+    def _set_covering(self, result: Result, footprint: str) -> None:
+        """Replace towers, grid and coverage with cached or built ones.
+
+        The new covering has the same obstructions, so only amounts
+        of blocks with every grid value are counted again.
+
+        Args:
+            result: positions and ranges of towers, grid and coverage.
+            footprint: shape of area covered by towers.
+        """
+        self._record_attributes(
+            'grid',
+            'coverage',
+            'towers',
+            'footprint',
+            '_amounts',
+        )
+        self.grid = result['grid'].astype(uint8)
+        self.coverage = result['coverage'].copy()
+        self.footprint = footprint
+        self._amounts = count_grid_values(self.grid)
+        tower_positions = result['positions']
+        self.towers = TowerStore(
+            self.get_covered_area,
+            tower_positions[:, 0],
+            tower_positions[:, 1],
+            result['ranges'],
+        )
+
+    def cover_with_catalogue(
+        self,
+        catalogue: Iterable[TowerType],
+        incremental: bool = False,
+        footprint: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> float:
+        """Cover the whole city with towers of minimum total cost.
+
+        Args:
+            catalogue: tower types with ranges and costs.
+            incremental: keep placed towers and cover only uncovered blocks.
+            footprint: shape of area covered by towers ('square', 'circle'
+                or 'diamond'), the current one if not specified.
+            workers: amount of threads, all processors if not specified.
+
+        Returns:
+            Total cost of placed towers.
+        """
+        tower_types = get_cheapest_types(catalogue)
+        self._prepare_covering(incremental, footprint)
+        total_cost = self._cover_by_gain(tower_types, workers)
+        self._verify_in_debug(True)
+        return total_cost
+
+    def _cover_by_sweep(
+        self,
+        tower_range: int,
+        backend: Optional[str] = None,
+    ) -> None:
+        """Cover the city placing towers from the corner.
+
+        The uncovered block closest to the corner is covered by tower
+        placed as far from the corner as possible, then the tower is moved
+        to the left or to the bottom while it is better.
+
+        Args:
+            tower_range: range of towers.
+            backend: 'numba' or 'numpy' array kernels, the fastest
+                available if not specified.
+        """
+        find_sweep_place = get_backend(backend).find_sweep_place
+        diagonal = 0
+        while self._count_blocks('uncovered_blocks'):
+            x, y, diagonal = find_sweep_place(self.grid, tower_range, diagonal)
+            self.place_tower(Position(x, y), tower_range)
+
+    def _cover_by_tiling(
+        self,
+        tower_range: int,
+        workers: Optional[int] = None,
+    ) -> None:
+        """Tile uncovered clear areas with towers and cover the rest greedily.
+
+        Squares of uncovered blocks are found from the coarse levels of
+        pyramid of their amounts, and all towers of the covering lattice
+        inside them are placed at once. Only blocks of mixed squares are
+        left to the greedy covering, so the time depends on the complexity
+        of the city more than on its area.
+
+        Args:
+            tower_range: range of towers.
+            workers: amount of threads, all processors if not specified.
+        """
+        positions = get_tiling_positions(
+            self.grid == GRID_VALUES['clear'],
+            self.footprint,
+            tower_range,
+        )
+        if len(positions):
+            self._add_towers(positions, tower_range)
+        if self._count_blocks('uncovered_blocks'):
+            self._cover_by_gain(
+                [TowerType('hierarchical', tower_range, 1)],
+                workers,
             )
 
+    def _add_towers(self, positions: ndarray, tower_range: int) -> None:
+        """Place many towers at once.
+
+        Coverage of all towers is accumulated together and the grid is
+        rebuilt at once instead of updating it by every tower.
+
+        Args:
+            positions: positions of towers with shape (towers, 2).
+            tower_range: range of towers.
+        """
+        xs, ys = positions[:, 0], positions[:, 1]
+        coverage = self.coverage + accumulate_footprints(
+            (self.n, self.m),
+            xs,
+            ys,
+            full(len(positions), tower_range),
+            self.footprint,
+        )
+        coverage[xs, ys] -= 1
+        columns = self.towers.get_columns()
+        tower_positions = concatenate([columns[:2].T, positions])
+        towers = zeros((self.n, self.m), bool)
+        towers[tower_positions[:, 0], tower_positions[:, 1]] = True
+        links = self.towers.get_links().copy()
+        self._set_covering(
+            {
+                'positions': tower_positions,
+                'ranges': concatenate(
+                    [columns[2], full(len(positions), tower_range)],
+                ),
+                'grid': get_grid_values(self.obstructions, towers, coverage),
+                'coverage': coverage,
+            },
+            self.footprint,
+        )
+        self.towers.add_links(*links)
+
+    def _cover_by_gain(
+        self,
+        tower_types: List[TowerType],
+        workers: Optional[int] = None,
+    ) -> float:
+        """Cover the city placing towers where they cover most blocks per cost.
+
+        Gains of all blocks are found with one convolution of uncovered
+        blocks with every footprint, then only gains around every new tower
+        are updated. Types with the same range share gains, so only the
+        cheapest of them is used. Stripes of grid and gains of different
+        types are processed in threads, the result does not depend on the
+        amount of threads.
+
+        Args:
+            tower_types: the cheapest tower types of different ranges.
+            workers: amount of threads, all processors if not specified.
+
+        Returns:
+            Total cost of placed towers.
+        """
+        workers = get_workers(workers)
+        kernels = [
+            create_footprint(self.footprint, tower_type.range)
+            for tower_type in tower_types
+        ]
+        gains = get_gain_maps(self.grid, kernels, workers)
+        row_maxima = [gain.max(axis=1) for gain in gains]
+        clear = GRID_VALUES['clear']
+        total_cost = 0.0
+        threads = min(workers, len(kernels))
+        with ThreadPoolExecutor(threads) as executor:
+            update: Callable[..., Iterator[None]] = map
+            if threads > 1:
+                update = executor.map
+            while self._count_blocks('uncovered_blocks'):
+                positions = [
+                    find_best_position(gain, maxima)
+                    for gain, maxima in zip(gains, row_maxima)
+                ]
+                scores = [
+                    gain[position] / tower_type.cost
+                    for gain, position, tower_type in zip(
+                        gains,
+                        positions,
+                        tower_types,
+                    )
+                ]
+                index = scores.index(max(scores))
+                position = positions[index]
+                kernel = kernels[index]
+                uncovered = get_window(self.grid, position, kernel) == clear
+                self.place_tower(position, tower_types[index].range)
+                uncovered &= get_window(self.grid, position, kernel) != clear
+                list(
+                    update(
+                        update_gain_map,
+                        gains,
+                        row_maxima,
+                        repeat(uncovered),
+                        kernels,
+                        repeat(position),
+                    ),
+                )
+                total_cost += tower_types[index].cost
+        return total_cost
+
     def create_paths(self) -> None:
-        """Create paths between all towers on pyplot."""
-        for index1 in range(len(self.towers)):
-            for index2 in range(index1 + 1, len(self.towers)):
-                tower1 = self.towers[index1]
-                tower2 = self.towers[index2]
-                tower_range = tower1.range
-                position1 = tower1.position
-                position2 = tower2.position
-                if (
-                    abs(position1.x - position2.x) <= 2 * tower_range + 1
-                    and abs(position1.y - position2.y) <= 2 * tower_range + 1
-                ):
-                    self.paths.append(Path(position1, position2))
-                    tower1.connections.append(position2)
-                    tower2.connections.append(position1)
+        """Create paths between all towers on pyplot.
+
+        Towers are linked if there is at most one block between their
+        areas, so towers of different ranges are linked symmetrically.
+        """
+        self._record(
+            partial(self.towers.truncate_links, self.towers.links_amount),
+        )
+        firsts, seconds = find_tower_pairs(
+            *self.towers.get_arrays(),
+            gap=LINK_GAP,
+        )
+        order = lexsort((seconds, firsts))
+        self.towers.add_links(firsts[order], seconds[order])
+        self._verify_in_debug()
         self.vizualize()
         for path in self.paths:
             pyplot.plot(*zip(path.start[::-1], path.end[::-1]), 'k--')
 
+    def get_failure_impact(self) -> ndarray:
+        """Count clear blocks losing coverage if every tower fails.
+
+        Returns:
+            Amount of blocks covered only by tower for every tower.
+
+        Raises:
+            Exception if footprint is not square.
+        """
+        self._check_square_footprint()
+        xs, ys, ranges = self.towers.get_arrays()
+        return get_failure_impacts(
+            self.grid,
+            self.coverage,
+            xs,
+            ys,
+            ranges,
+            [arange(len(xs))],
+        )
+
+    def get_worst_failures(
+        self,
+        size: int = DEFAULT_FAILURES_SIZE,
+        amount: int = DEFAULT_FAILURES_AMOUNT,
+    ) -> List[Tuple[Tuple[Position, ...], int]]:
+        """Find groups of close towers, which failure uncovers most blocks.
+
+        Args:
+            size: amount of towers in group (from 1 to 3).
+            amount: maximum amount of groups to find.
+
+        Returns:
+            Positions of towers of groups with amounts of uncovered blocks.
+
+        Raises:
+            Exception if footprint is not square.
+        """
+        self._check_square_footprint()
+        xs, ys, ranges = self.towers.get_arrays()
+        groups, impacts = find_worst_failures(
+            self.grid,
+            self.coverage,
+            xs,
+            ys,
+            ranges,
+            size,
+            amount,
+        )
+        return [
+            (
+                tuple(self.towers.get_position(index) for index in group),
+                impact,
+            )
+            for group, impact in zip(groups.tolist(), impacts.tolist())
+        ]
+
+    def vizualize_failure_impact(self) -> None:
+        """Show failure impact of towers using matplotlib."""
+        self._check_square_footprint()
+        xs, ys, ranges = self.towers.get_arrays()
+        impact_figure = pyplot.figure()
+        impact_plot = impact_figure.add_subplot(111)
+        impact_plot.set_title(f'{self.get_name()}. Failure impact')
+        impact_mesh = impact_plot.pcolor(
+            get_failure_impact_map(
+                self.grid,
+                xs,
+                ys,
+                ranges,
+                self.get_failure_impact(),
+            ),
+            cmap=IMPACT_COLORMAP,
+        )
+        impact_figure.colorbar(impact_mesh, label='uncovered blocks')
+
+    def get_distance_field(
+        self,
+        metric: str = DEFAULT_DISTANCE_METRIC,
+    ) -> ndarray:
+        """Calculate distance from every block to the closest tower.
+
+        Args:
+            metric: 'chebyshev' or 'euclidean'.
+
+        Returns:
+            Distances, at least n + m everywhere if there are no towers.
+        """
+        xs, ys, _ = self.towers.get_arrays()
+        return get_distances(self.n, self.m, xs, ys, metric)
+
+    def get_distance_statistics(
+        self,
+        metric: str = DEFAULT_DISTANCE_METRIC,
+        percentiles: Tuple[int, ...] = DISTANCE_PERCENTILES,
+    ) -> Dict[str, float]:
+        """Calculate statistics of distances from clear blocks to towers.
+
+        Args:
+            metric: 'chebyshev' or 'euclidean'.
+            percentiles: percentiles to calculate.
+
+        Returns:
+            Mean, maximum and percentiles of distances.
+        """
+        return get_distance_statistics(
+            self.get_distance_field(metric),
+            isin(self.grid, CLEAR_VALUES),
+            percentiles,
+        )
+
+    def vizualize_distances(
+        self,
+        metric: str = DEFAULT_DISTANCE_METRIC,
+    ) -> None:
+        """Show distances from blocks to the closest towers using matplotlib.
+
+        Args:
+            metric: 'chebyshev' or 'euclidean'.
+        """
+        distance_figure = pyplot.figure()
+        distance_plot = distance_figure.add_subplot(111)
+        distance_plot.set_title(f'{self.get_name()}. {metric} distance')
+        distance_mesh = distance_plot.pcolor(
+            self.get_distance_field(metric),
+            cmap=DISTANCE_COLORMAP,
+        )
+        distance_figure.colorbar(distance_mesh, label='distance to tower')
+
     def path_between_towers(
         self,
         position1: Position,
@@ -289,14 +1338,16 @@ class CityGrid:
             position1: position of the first tower.
             position2: position of the second tower.
         """
-        find_tower_by_path(self.towers, position1)
-        find_tower_by_path(self.towers, position1)
+        self.towers.find(position1)
+        self.towers.find(position2)
         positions = [position1]
         paths = []
         while positions[-1] != position2:
             positions.append(
                 min(
-                    find_tower_by_path(self.towers, positions[-1]).connections,
+                    self.towers.get_connections(
+                        self.towers.find(positions[-1]),
+                    ),
                     key=lambda position: sqrt(
                         (position.x - position2.x) ** 2
                         + (position.y - position2.y) ** 2,
@@ -29,3 +29,98 @@ TEST_HEIGHT = 100
 TEST_PERCENTAGE = 73.5
 TEST_RANGE = 10
 TEST_TOWERS_AMOUNT = 10
+DEFAULT_CHUNK_ROWS = 256
+DEFAULT_CELL_SIZE = 1
+DEFAULT_OBSTRUCTED_SHARE = 0.5
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+PNG_READ_SIZE = 1 << 16
+ESRI_HEADER_KEYS = (
+    'ncols',
+    'nrows',
+    'xllcorner',
+    'yllcorner',
+    'xllcenter',
+    'yllcenter',
+    'cellsize',
+    'nodata_value',
+)
+TEST_CELL_SIZE = 3
+TEST_WORKERS = 3
+GRID_BLOCKS = OrderedDict(
+    [
+        ('clear', ('clear_blocks', 'uncovered_blocks')),
+        ('obstructed', ('obstructed_blocks',)),
+        ('covered', ('clear_blocks', 'covered_blocks')),
+        (
+            'obstructed covered',
+            ('obstructed_blocks', 'obstructed_covered_blocks'),
+        ),
+        ('over covered', ('clear_blocks', 'over_covered_blocks')),
+        ('tower', ()),
+    ],
+)
+BLOCK_ATTRIBUTES = sorted(
+    {
+        attribute
+        for attributes in GRID_BLOCKS.values()
+        for attribute in attributes
+    },
+)
+VALUE_BLOCKS = {
+    GRID_VALUES[name]: attributes for name, attributes in GRID_BLOCKS.items()
+}
+BLOCK_VALUES = {
+    attribute: tuple(
+        value
+        for value, attributes in VALUE_BLOCKS.items()
+        if attribute in attributes
+    )
+    for attribute in BLOCK_ATTRIBUTES
+}
+GRID_VALUES_AMOUNT = max(GRID_VALUES.values()) + 1
+DEFAULT_REGION_SIZE = 10
+EXPORT_BATCH_SIZE = 4096
+TOWER_FIELDS = ('x', 'y', 'range', 'degree')
+LINK_FIELDS = ('start_x', 'start_y', 'end_x', 'end_y')
+REGION_FIELDS = (
+    'region_x',
+    'region_y',
+    *(name.replace(' ', '_') for name in GRID_VALUES),
+    'covered_percentage',
+)
+DEFAULT_FAILURES_SIZE = 2
+DEFAULT_FAILURES_AMOUNT = 10
+IMPACT_COLORMAP = 'hot_r'
+DISTANCE_METRICS = ('chebyshev', 'euclidean')
+DEFAULT_DISTANCE_METRIC = 'chebyshev'
+DISTANCE_PERCENTILES = (50, 90, 95, 99)
+DISTANCE_COLORMAP = 'viridis'
+CLEAR_VALUES = tuple(
+    GRID_VALUES[name]
+    for name, attributes in GRID_BLOCKS.items()
+    if 'clear_blocks' in attributes
+)
+FOOTPRINTS = ('square', 'circle', 'diamond')
+DEFAULT_FOOTPRINT = 'square'
+STRATEGIES = ('sweep', 'greedy', 'hierarchical')
+DEFAULT_STRATEGY = 'sweep'
+FFT_KERNEL_SIZE = 32
+BACKENDS_ORDER = ('numba', 'numpy')
+BATCH_GAIN_TYPE = 'int32'
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+SERVICE_QUEUE_SIZE = 16
+SERVICE_CACHE_SIZE = 256
+SERVICE_MAX_BODY_SIZE = 1 << 28
+SERVICE_RETRY_AFTER = 1
+RESULTS_VERSION = 1
+RESULT_NAMES = ('positions', 'ranges', 'grid', 'coverage')
+CACHE_MEMORY_SIZE = 1 << 28
+CACHE_DISK_SIZE = 1 << 30
+CACHE_SUFFIX = '.npz'
+TEST_CACHE_SIZE = 1 << 16
+TEST_TOWER_BYTES = 64
+LINK_GAP = 1
+VERIFICATION_AMOUNT = 5
+COVERAGE_LEVELS = (0, 1, 2)
@@ -0,0 +1,343 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path as FilePath
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from numpy import ndarray, pad
+
+from constants import (
+    DEFAULT_REGION_SIZE,
+    EXPORT_BATCH_SIZE,
+    GRID_VALUES,
+    LINK_FIELDS,
+    REGION_FIELDS,
+    TOWER_FIELDS,
+)
+from loaders import FileName
+from objects import Path, Tower
+from store import TowerStore
+from utils import get_percentage
+
+Row = Tuple[Any, ...]
+Geometry = Dict[str, Any]
+
+
+def iter_batches(rows: Iterable[Row], batch_size: int) -> Iterator[List[Row]]:
+    """Split rows into batches.
+
+    Args:
+        rows: rows to split.
+        batch_size: maximum rows amount in every batch.
+
+    Yields:
+        Lists of rows.
+    """
+    iterator = iter(rows)
+    batch = list(islice(iterator, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, batch_size))
+
+
+def get_tower_rows(towers: Iterable[Tower]) -> Iterator[Row]:
+    """Get rows with tower position, range and degree.
+
+    Towers of tower store are read from its arrays without creating
+    tower objects.
+
+    Args:
+        towers: towers to export.
+
+    Yields:
+        Row for every tower.
+    """
+    if isinstance(towers, TowerStore):
+        yield from zip(
+            towers.xs.tolist(),
+            towers.ys.tolist(),
+            towers.ranges.tolist(),
+            towers.get_degrees().tolist(),
+        )
+        return
+    for tower in towers:
+        yield (
+            tower.position.x,
+            tower.position.y,
+            tower.range,
+            len(tower.connections),
+        )
+
+
+def get_link_rows(paths: Iterable[Path]) -> Iterator[Row]:
+    """Get rows with positions of linked towers.
+
+    Args:
+        paths: paths between towers to export.
+
+    Yields:
+        Row for every path.
+    """
+    for path in paths:
+        yield path.start.x, path.start.y, path.end.x, path.end.y
+
+
+def get_region_rows(grid: ndarray, region_size: int) -> Iterator[Row]:
+    """Get coverage statistics of square regions of grid.
+
+    Only one band of regions is processed at a time.
+
+    Args:
+        grid: city grid.
+        region_size: side of the square region.
+
+    Yields:
+        Row for every region with amounts of blocks of every kind and
+        covered clear blocks percentage.
+    """
+    n, m = grid.shape
+    width = -(-m // region_size)
+    for start in range(0, n, region_size):
+        band = grid[start:][:region_size]
+        band = pad(
+            band,
+            ((0, region_size - len(band)), (0, width * region_size - m)),
+            constant_values=-1,
+        ).reshape(region_size, width, region_size)
+        counts = [
+            (band == value).sum(axis=(0, 2)) for value in GRID_VALUES.values()
+        ]
+        for index in range(width):
+            amounts = {
+                name: int(count[index])
+                for name, count in zip(GRID_VALUES, counts)
+            }
+            covered = amounts['covered'] + amounts['over covered']
+            total_clear = covered + amounts['clear']
+            yield (
+                start // region_size,
+                index,
+                *amounts.values(),
+                get_percentage(total_clear, covered) if total_clear else 100.0,
+            )
+
+
+def write_csv(
+    file_name: FileName,
+    fields: Tuple[str, ...],
+    rows: Iterable[Row],
+    batch_size: int,
+) -> None:
+    """Write rows to CSV file by batches.
+
+    Args:
+        file_name: path to file.
+        fields: names of columns.
+        rows: rows to write.
+        batch_size: rows amount to write at a time.
+    """
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(fields)
+        for batch in iter_batches(rows, batch_size):
+            writer.writerows(batch)
+
+
+def write_json_lines(
+    file_name: FileName,
+    fields: Tuple[str, ...],
+    rows: Iterable[Row],
+    batch_size: int,
+) -> None:
+    """Write rows to JSON Lines file by batches.
+
+    Args:
+        file_name: path to file.
+        fields: names of object keys.
+        rows: rows to write.
+        batch_size: rows amount to write at a time.
+    """
+    with open(file_name, 'w') as file:
+        for batch in iter_batches(rows, batch_size):
+            file.write(
+                ''.join(
+                    json.dumps(dict(zip(fields, row))) + '\n' for row in batch
+                ),
+            )
+
+
+def write_geojson(
+    file_name: FileName,
+    fields: Tuple[str, ...],
+    rows: Iterable[Row],
+    batch_size: int,
+    get_geometry: Callable[[Row], Geometry],
+) -> None:
+    """Write rows to GeoJSON feature collection by batches.
+
+    Coordinates are (column, row) pairs, as on the plots.
+
+    Args:
+        file_name: path to file.
+        fields: names of feature properties.
+        rows: rows to write.
+        batch_size: rows amount to write at a time.
+        get_geometry: function creating geometry of row.
+    """
+    with open(file_name, 'w') as file:
+        file.write('{"type": "FeatureCollection", "features": [\n')
+        separator = ''
+        for batch in iter_batches(rows, batch_size):
+            file.write(
+                separator
+                + ',\n'.join(
+                    json.dumps(
+                        {
+                            'type': 'Feature',
+                            'geometry': get_geometry(row),
+                            'properties': dict(zip(fields, row)),
+                        },
+                    )
+                    for row in batch
+                ),
+            )
+            separator = ',\n'
+        file.write('\n]}\n')
+
+
+def get_tower_geometry(row: Row) -> Geometry:
+    """Create point geometry of tower row."""
+    return {'type': 'Point', 'coordinates': [row[1], row[0]]}
+
+
+def get_link_geometry(row: Row) -> Geometry:
+    """Create line geometry of link row."""
+    return {
+        'type': 'LineString',
+        'coordinates': [[row[1], row[0]], [row[3], row[2]]],
+    }
+
+
+def get_region_geometry(region_size: int) -> Callable[[Row], Geometry]:
+    """Create function building polygon geometry of region row.
+
+    Args:
+        region_size: side of the square region.
+
+    Returns:
+        Function building geometry.
+    """
+
+    def get_geometry(row: Row) -> Geometry:
+        """Create polygon geometry of region row."""
+        bottom, left = row[0] * region_size, row[1] * region_size
+        top, right = bottom + region_size, left + region_size
+        return {
+            'type': 'Polygon',
+            'coordinates': [
+                [
+                    [left, bottom],
+                    [right, bottom],
+                    [right, top],
+                    [left, top],
+                    [left, bottom],
+                ],
+            ],
+        }
+
+    return get_geometry
+
+
+def export_rows(
+    file_name: FileName,
+    fields: Tuple[str, ...],
+    rows: Iterable[Row],
+    batch_size: int,
+    get_geometry: Callable[[Row], Geometry],
+) -> None:
+    """Export rows to file with format chosen by its suffix.
+
+    Args:
+        file_name: path to .csv, .jsonl or .geojson file.
+        fields: names of columns.
+        rows: rows to export.
+        batch_size: rows amount to write at a time.
+        get_geometry: function creating geometry of row for GeoJSON.
+
+    Raises:
+        Exception if file format is not supported.
+    """
+    suffix = FilePath(file_name).suffix.lower()
+    if suffix == '.csv':
+        write_csv(file_name, fields, rows, batch_size)
+    elif suffix == '.jsonl':
+        write_json_lines(file_name, fields, rows, batch_size)
+    elif suffix == '.geojson':
+        write_geojson(file_name, fields, rows, batch_size, get_geometry)
+    else:
+        raise Exception('Export format is not supported')
+
+
+def export_towers(
+    towers: Iterable[Tower],
+    file_name: FileName,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> None:
+    """Export towers positions, ranges and degrees.
+
+    Args:
+        towers: towers to export.
+        file_name: path to .csv, .jsonl or .geojson file.
+        batch_size: rows amount to write at a time.
+    """
+    export_rows(
+        file_name,
+        TOWER_FIELDS,
+        get_tower_rows(towers),
+        batch_size,
+        get_tower_geometry,
+    )
+
+
+def export_links(
+    paths: Iterable[Path],
+    file_name: FileName,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> None:
+    """Export paths between towers.
+
+    Args:
+        paths: paths to export.
+        file_name: path to .csv, .jsonl or .geojson file.
+        batch_size: rows amount to write at a time.
+    """
+    export_rows(
+        file_name,
+        LINK_FIELDS,
+        get_link_rows(paths),
+        batch_size,
+        get_link_geometry,
+    )
+
+
+def export_coverage(
+    grid: ndarray,
+    file_name: FileName,
+    region_size: int = DEFAULT_REGION_SIZE,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> None:
+    """Export coverage statistics of square regions of grid.
+
+    Args:
+        grid: city grid.
+        file_name: path to .csv, .jsonl or .geojson file.
+        region_size: side of the square region.
+        batch_size: rows amount to write at a time.
+    """
+    export_rows(
+        file_name,
+        REGION_FIELDS,
+        get_region_rows(grid, region_size),
+        batch_size,
+        get_region_geometry(region_size),
+    )
@@ -0,0 +1,198 @@
+from functools import lru_cache
+from typing import List, Tuple
+
+from numpy import (
+    arange,
+    argmax,
+    bincount,
+    broadcast_arrays,
+    concatenate,
+    indices,
+    int64,
+    lexsort,
+    ndarray,
+    nonzero,
+    pad,
+    stack,
+    zeros,
+)
+
+from kernels import create_footprint
+
+Lattice = Tuple[int, int, int]
+
+
+@lru_cache(maxsize=None)
+def get_tiling_lattice(footprint: str, tower_range: int) -> Lattice:
+    """Find the sparsest lattice of towers covering the whole plane.
+
+    Towers of lattice are in rows, the rows are spaced by the first number,
+    towers of every row are spaced by the second number, and every next
+    row is shifted by the third number. Lattices are checked from the
+    sparsest, every lattice covers the plane if all residues of footprint
+    blocks modulo lattice are different from each other.
+
+    Args:
+        footprint: shape of area covered by towers.
+        tower_range: range of towers.
+
+    Returns:
+        Spacing of rows, spacing of towers in rows and shift of rows.
+    """
+    xs, ys = nonzero(create_footprint(footprint, tower_range))
+    xs, ys = xs - tower_range, ys - tower_range
+    side = 2 * tower_range + 1
+    for area, rows_spacing, spacing in sorted(
+        (
+            (rows_spacing * spacing, rows_spacing, spacing)
+            for rows_spacing in range(1, side + 1)
+            for spacing in range(1, side + 1)
+            if rows_spacing * spacing <= len(xs)
+        ),
+        reverse=True,
+    ):
+        shifts = arange(spacing)[:, None]
+        residues = (
+            xs % rows_spacing * spacing
+            + (ys - xs // rows_spacing * shifts) % spacing
+            + shifts * area
+        )
+        covering = (
+            bincount(residues.ravel(), minlength=spacing * area)
+            .reshape(spacing, area)
+            .all(axis=1)
+        )
+        if covering.any():
+            return rows_spacing, spacing, int(argmax(covering))
+    return 1, 1, 0
+
+
+def get_lattice_positions(
+    xs: ndarray,
+    ys: ndarray,
+    side: int,
+    lattice: Lattice,
+    origin: int,
+) -> ndarray:
+    """Get positions of lattice towers inside squares.
+
+    Args:
+        xs: x coordinates of the first blocks of squares.
+        ys: y coordinates of the first blocks of squares.
+        side: side of squares.
+        lattice: spacing of rows, spacing of towers and shift of rows.
+        origin: x and y coordinates of the first tower of lattice.
+
+    Returns:
+        Positions of towers with shape (towers, 2).
+    """
+    rows_spacing, spacing, shift = lattice
+    rows = (
+        xs[:, None]
+        + (origin - xs[:, None]) % rows_spacing
+        + arange(-(-side // rows_spacing)) * rows_spacing
+    )
+    first_columns = (
+        ys[:, None]
+        + (origin + (rows - origin) // rows_spacing * shift - ys[:, None])
+        % spacing
+    )
+    rows, columns = broadcast_arrays(
+        rows[:, :, None],
+        first_columns[:, :, None] + arange(-(-side // spacing)) * spacing,
+    )
+    inside = (rows < xs[:, None, None] + side) & (
+        columns < ys[:, None, None] + side
+    )
+    return stack([rows[inside], columns[inside]], axis=1)
+
+
+def build_pyramid(mask: ndarray, size: int) -> List[ndarray]:
+    """Count chosen blocks in squares of every level.
+
+    Squares of the first level have the specified side, every square of
+    the next level joins four squares of the previous level, and the last
+    level has one square. Squares crossing the grid borders are padded
+    with not chosen blocks.
+
+    Args:
+        mask: boolean mask of chosen blocks.
+        size: side of squares of the first level.
+
+    Returns:
+        Amounts of chosen blocks in squares from the first level to the last.
+    """
+    n, m = mask.shape
+    rows, columns = -(-n // size), -(-m // size)
+    padded = pad(mask, ((0, rows * size - n), (0, columns * size - m)))
+    counts = padded.reshape(rows, size, columns, size).sum(
+        axis=(1, 3),
+        dtype=int64,
+    )
+    pyramid = [counts]
+    while counts.shape != (1, 1):
+        rows, columns = counts.shape
+        counts = pad(counts, ((0, rows % 2), (0, columns % 2)))
+        counts = counts.reshape(
+            len(counts) // 2,
+            2,
+            counts.shape[1] // 2,
+            2,
+        ).sum(axis=(1, 3))
+        pyramid.append(counts)
+    return pyramid
+
+
+def get_tiling_positions(
+    mask: ndarray,
+    footprint: str,
+    tower_range: int,
+) -> ndarray:
+    """Get positions of lattice towers in squares of chosen blocks.
+
+    Squares of pyramid are checked from the last level: squares of only
+    chosen blocks get towers of lattice, squares without chosen blocks
+    are skipped, and only the other squares are split into squares of the
+    previous level. So the amount of checked squares depends on the length
+    of borders of chosen areas instead of the grid area. Sides of squares
+    of the first level are the footprint side, so square footprints tile
+    them exactly, and mixed squares of the first level get no towers.
+
+    Args:
+        mask: boolean mask of chosen blocks.
+        footprint: shape of area covered by towers.
+        tower_range: range of towers.
+
+    Returns:
+        Positions of towers with shape (towers, 2) in order of rows.
+    """
+    lattice = get_tiling_lattice(footprint, tower_range)
+    size = 2 * tower_range + 1
+    pyramid = build_pyramid(mask, size)
+    rows, columns = (
+        coordinates.ravel() for coordinates in indices(pyramid[-1].shape)
+    )
+    positions_list = [zeros((0, 2), int64)]
+    for level in reversed(range(len(pyramid))):
+        counts = pyramid[level][rows, columns]
+        side = size << level
+        full = counts == side**2
+        positions_list.append(
+            get_lattice_positions(
+                rows[full] * side,
+                columns[full] * side,
+                side,
+                lattice,
+                tower_range,
+            ),
+        )
+        if not level:
+            break
+        mixed = (counts > 0) & ~full
+        shape = pyramid[level - 1].shape
+        rows = (2 * rows[mixed, None] + [0, 0, 1, 1]).ravel()
+        columns = (2 * columns[mixed, None] + [0, 1, 0, 1]).ravel()
+        inside = (rows < shape[0]) & (columns < shape[1])
+        rows, columns = rows[inside], columns[inside]
+    positions = concatenate(positions_list)
+    return positions[lexsort((positions[:, 1], positions[:, 0]))]
@@ -0,0 +1,492 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Set, Tuple
+
+from numpy import (
+    arange,
+    argmax,
+    bincount,
+    clip,
+    concatenate,
+    diff,
+    full,
+    int8,
+    int32,
+    int64,
+    isin,
+    linspace,
+    ndarray,
+    nonzero,
+    pad,
+    promote_types,
+    rint,
+    unique,
+    zeros,
+)
+from numpy.fft import irfft2, rfft2
+
+from constants import CLEAR_VALUES, FFT_KERNEL_SIZE, FOOTPRINTS, GRID_VALUES
+from objects import Position
+
+Slices = Tuple[slice, ...]
+
+
+@lru_cache(maxsize=None)
+def create_footprint(footprint: str, tower_range: int) -> ndarray:
+    """Create boolean kernel of area covered by tower.
+
+    Args:
+        footprint: 'square', 'circle' or 'diamond'.
+        tower_range: tower range.
+
+    Returns:
+        Read-only kernel with tower in the center.
+
+    Raises:
+        Exception if footprint is not supported.
+    """
+    rows = arange(-tower_range, tower_range + 1)[:, None]
+    columns = rows.T
+    if footprint == 'square':
+        kernel = (rows + columns) * 0 == 0
+    elif footprint == 'circle':
+        kernel = rows**2 + columns**2 <= tower_range**2
+    elif footprint == 'diamond':
+        kernel = abs(rows) + abs(columns) <= tower_range
+    else:
+        raise Exception(f'Footprint should be one of {FOOTPRINTS}')
+    kernel.setflags(write=False)
+    return kernel
+
+
+def get_footprint_area(
+    n: int,
+    m: int,
+    position: Position,
+    kernel: ndarray,
+) -> Set[Position]:
+    """Get area covered by tower with footprint kernel.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        position: tower position.
+        kernel: footprint kernel.
+
+    Returns:
+        Set of covered positions of grid without tower position.
+    """
+    tower_range = len(kernel) // 2
+    rows, columns = nonzero(kernel)
+    rows += position.x - tower_range
+    columns += position.y - tower_range
+    inside = (rows >= 0) & (rows < n) & (columns >= 0) & (columns < m)
+    return set(
+        map(Position, rows[inside].tolist(), columns[inside].tolist()),
+    ) - {position}
+
+
+def get_overlap(
+    shape: Tuple[int, ...],
+    position: Position,
+    radius: int,
+) -> Tuple[Slices, Slices]:
+    """Get overlap of array with square window centered at position.
+
+    Args:
+        shape: array shape.
+        position: window center.
+        radius: distance from center to window sides.
+
+    Returns:
+        Slices of array and slices of window.
+    """
+    array_slices = []
+    window_slices = []
+    for center, length in zip(position, shape):
+        start = max(0, center - radius)
+        stop = min(length, center + radius + 1)
+        array_slices.append(slice(start, stop))
+        window_slices.append(
+            slice(start - center + radius, stop - center + radius),
+        )
+    return tuple(array_slices), tuple(window_slices)
+
+
+def add_footprint(
+    array: ndarray,
+    position: Position,
+    kernel: ndarray,
+    value: int,
+) -> None:
+    """Add value to blocks of array covered by footprint.
+
+    Args:
+        array: array to change.
+        position: tower position.
+        kernel: footprint kernel.
+        value: value to add.
+    """
+    array_slices, kernel_slices = get_overlap(
+        array.shape,
+        position,
+        len(kernel) // 2,
+    )
+    array[array_slices] += kernel[kernel_slices] * value
+
+
+def accumulate_footprints(
+    shape: Tuple[int, int],
+    xs: ndarray,
+    ys: ndarray,
+    ranges: ndarray,
+    footprint: str,
+) -> ndarray:
+    """Count towers covering every block.
+
+    Every run of kernel rows of every tower adds one at its start and
+    subtracts one after its end in rows of differences, which are counted
+    at once, so the cost is proportional to the amount of runs instead of
+    footprint areas.
+
+    Args:
+        shape: grid shape.
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        ranges: ranges of towers.
+        footprint: shape of area covered by towers.
+
+    Returns:
+        Amounts of towers covering blocks, including their own blocks.
+    """
+    n, m = shape
+    starts_list, ends_list = [], []
+    for tower_range in unique(ranges).tolist():
+        rows, edges = nonzero(
+            diff(
+                create_footprint(footprint, tower_range),
+                axis=1,
+                prepend=False,
+                append=False,
+            ),
+        )
+        chosen = ranges == tower_range
+        run_rows = xs[chosen, None] + rows[::2] - tower_range
+        starts = clip(ys[chosen, None] + edges[::2] - tower_range, 0, m)
+        ends = clip(ys[chosen, None] + edges[1::2] - tower_range, 0, m)
+        inside = (run_rows >= 0) & (run_rows < n) & (starts < ends)
+        run_rows = run_rows[inside].astype(int64) * (m + 1)
+        starts_list.append(run_rows + starts[inside])
+        ends_list.append(run_rows + ends[inside])
+    size = n * (m + 1)
+    differences = bincount(
+        concatenate([zeros(0, int64), *starts_list]),
+        minlength=size,
+    )
+    differences -= bincount(
+        concatenate([zeros(0, int64), *ends_list]),
+        minlength=size,
+    )
+    return differences.reshape(n, m + 1).cumsum(axis=1, dtype=int32)[:, :m]
+
+
+def correlate_directly(mask: ndarray, kernel: ndarray) -> ndarray:
+    """Count chosen blocks under kernel placed at every block.
+
+    Every kernel row is split into runs, and every run is counted with
+    prefix sums along rows, so the cost is proportional to the amount of
+    runs instead of the kernel area.
+
+    Args:
+        mask: chosen blocks, leading axes are counted separately.
+        kernel: square boolean kernel of odd side.
+
+    Returns:
+        Amounts of chosen blocks.
+    """
+    *batch, n, m = mask.shape
+    tower_range = len(kernel) // 2
+    prefix_sums = zeros(
+        (*batch, n + 2 * tower_range, m + 2 * tower_range + 1),
+        int64,
+    )
+    prefix_sums[..., 1:] = pad(
+        mask,
+        [(0, 0)] * len(batch) + [(tower_range, tower_range)] * 2,
+    ).cumsum(axis=-1)
+    rows, edges = nonzero(diff(kernel, axis=1, prepend=False, append=False))
+    counts = zeros(mask.shape, int64)
+    for row, start, end in zip(
+        rows[::2].tolist(),
+        edges[::2].tolist(),
+        edges[1::2].tolist(),
+    ):
+        counts += (
+            prefix_sums[..., row:, end:][..., :n, :m]
+            - prefix_sums[..., row:, start:][..., :n, :m]
+        )
+    return counts
+
+
+def get_fast_length(length: int) -> int:
+    """Find the smallest length without prime factors except 2, 3 and 5.
+
+    Args:
+        length: minimal length.
+
+    Returns:
+        Fast length.
+    """
+    fast_length = length
+    while True:
+        rest = fast_length
+        for factor in (2, 3, 5):
+            while rest % factor == 0:
+                rest //= factor
+        if rest == 1:
+            return fast_length
+        fast_length += 1
+
+
+def get_fft_shape(shape: Tuple[int, ...], radius: int) -> Tuple[int, int]:
+    """Get fast shape of Fourier transform of padded array.
+
+    Args:
+        shape: array shape.
+        radius: the largest kernel radius.
+
+    Returns:
+        Shape without wrapping of correlations.
+    """
+    return (
+        get_fast_length(shape[-2] + 2 * radius),
+        get_fast_length(shape[-1] + 2 * radius),
+    )
+
+
+def correlate_spectrum(
+    spectrum: ndarray,
+    shape: Tuple[int, int],
+    kernel: ndarray,
+    mask_shape: Tuple[int, ...],
+) -> ndarray:
+    """Count chosen blocks under kernel using Fourier transform of mask.
+
+    Args:
+        spectrum: Fourier transform of chosen blocks.
+        shape: shape of Fourier transform.
+        kernel: square boolean kernel of odd side.
+        mask_shape: shape of chosen blocks mask.
+
+    Returns:
+        Amounts of chosen blocks.
+    """
+    n, m = mask_shape[-2:]
+    tower_range = len(kernel) // 2
+    counts = irfft2(spectrum * rfft2(kernel[::-1, ::-1], shape), shape)
+    return rint(
+        counts[..., tower_range:, tower_range:][..., :n, :m],
+    ).astype(int64)
+
+
+def correlate_with_fft(mask: ndarray, kernel: ndarray) -> ndarray:
+    """Count chosen blocks under kernel using fast Fourier transform.
+
+    Args:
+        mask: chosen blocks, leading axes are counted separately.
+        kernel: square boolean kernel of odd side.
+
+    Returns:
+        Amounts of chosen blocks.
+    """
+    shape = get_fft_shape(mask.shape, len(kernel) // 2)
+    return correlate_spectrum(rfft2(mask, shape), shape, kernel, mask.shape)
+
+
+def correlate_all(mask: ndarray, kernels: List[ndarray]) -> List[ndarray]:
+    """Count chosen blocks under every kernel placed at every block.
+
+    Fourier transform of mask is calculated once for all large kernels.
+
+    Args:
+        mask: chosen blocks, leading axes are counted separately.
+        kernels: square boolean kernels of odd sides.
+
+    Returns:
+        Amounts of chosen blocks for every kernel.
+    """
+    large = [
+        len(kernel) for kernel in kernels if len(kernel) >= FFT_KERNEL_SIZE
+    ]
+    if large:
+        shape = get_fft_shape(mask.shape, max(large) // 2)
+        spectrum = rfft2(mask, shape)
+    return [
+        (
+            correlate_spectrum(spectrum, shape, kernel, mask.shape)
+            if len(kernel) >= FFT_KERNEL_SIZE
+            else correlate_directly(mask, kernel)
+        )
+        for kernel in kernels
+    ]
+
+
+def correlate_many(
+    mask: ndarray,
+    kernels: List[ndarray],
+    workers: int = 1,
+) -> List[ndarray]:
+    """Count chosen blocks under every kernel splitting mask into stripes.
+
+    Every stripe of rows is counted in its own thread with margins of the
+    largest kernel radius. NumPy releases GIL while counting, so stripes
+    are counted on different cores, and the counts do not depend on the
+    amount of stripes.
+
+    Args:
+        mask: chosen blocks.
+        kernels: square boolean kernels of odd sides.
+        workers: amount of threads and stripes.
+
+    Returns:
+        Amounts of chosen blocks for every kernel.
+    """
+    if workers < 2 or len(mask) < 2 * workers:
+        return correlate_all(mask, kernels)
+    radius = max(len(kernel) for kernel in kernels) // 2
+    bounds = linspace(0, len(mask), workers + 1).astype(int64).tolist()
+
+    def correlate_stripe(start: int, end: int) -> List[ndarray]:
+        """Count chosen blocks in rows from start to end (excluded)."""
+        top = max(0, start - radius)
+        bottom = end + radius
+        offset = start - top
+        length = end - start
+        return [
+            counts[offset:][:length]
+            for counts in correlate_all(mask[top:bottom], kernels)
+        ]
+
+    with ThreadPoolExecutor(workers) as executor:
+        stripes = list(executor.map(correlate_stripe, bounds[:-1], bounds[1:]))
+    return [concatenate(counts) for counts in zip(*stripes)]
+
+
+def correlate(mask: ndarray, kernel: ndarray) -> ndarray:
+    """Count chosen blocks under kernel placed at every block.
+
+    Args:
+        mask: chosen blocks, leading axes are counted separately.
+        kernel: square boolean kernel of odd side.
+
+    Returns:
+        Amounts of chosen blocks.
+    """
+    return correlate_all(mask, [kernel])[0]
+
+
+def get_gain_maps(
+    grid: ndarray,
+    kernels: List[ndarray],
+    workers: int = 1,
+) -> List[ndarray]:
+    """Count uncovered blocks, which towers would cover at every block.
+
+    Only clear blocks are counted, so footprints are masked by
+    obstructions. The tower block itself is counted if it is uncovered.
+
+    Args:
+        grid: city grid.
+        kernels: footprint kernels of towers.
+        workers: amount of threads counting stripes of grid.
+
+    Returns:
+        Gains for every kernel, -1 for blocks where tower can not be
+        placed.
+    """
+    forbidden = ~isin(grid, CLEAR_VALUES)
+    gains = correlate_many(grid == GRID_VALUES['clear'], kernels, workers)
+    for gain in gains:
+        gain[forbidden] = -1
+    return gains
+
+
+def get_gain_map(grid: ndarray, kernel: ndarray) -> ndarray:
+    """Count uncovered blocks, which tower would cover at every block.
+
+    Args:
+        grid: city grid.
+        kernel: footprint kernel.
+
+    Returns:
+        Gains, -1 for blocks where tower can not be placed.
+    """
+    return get_gain_maps(grid, [kernel])[0]
+
+
+def get_window(array: ndarray, position: Position, kernel: ndarray) -> ndarray:
+    """Copy blocks of array under kernel placed at position.
+
+    Args:
+        array: array to copy.
+        position: kernel center.
+        kernel: footprint kernel.
+
+    Returns:
+        Copy aligned with kernel, -1 outside of array, so unsigned arrays
+        are copied to a signed type.
+    """
+    array_slices, window_slices = get_overlap(
+        array.shape,
+        position,
+        len(kernel) // 2,
+    )
+    window = full(kernel.shape, -1, promote_types(array.dtype, int8))
+    window[window_slices] = array[array_slices]
+    return window
+
+
+def update_gain_map(
+    gain: ndarray,
+    row_maxima: ndarray,
+    covered: ndarray,
+    kernel: ndarray,
+    position: Position,
+) -> None:
+    """Update gains after new tower is placed.
+
+    Only blocks, which could cover newly covered blocks, lose gains, so
+    the change is one small convolution around the tower.
+
+    Args:
+        gain: gains to update.
+        row_maxima: maximal gains of rows to update.
+        covered: blocks newly covered by tower, aligned with its footprint.
+        kernel: footprint kernel of gains.
+        position: position of new tower.
+    """
+    tower_range = len(kernel) // 2
+    changes = correlate(pad(covered, tower_range), kernel)
+    gain_slices, changes_slices = get_overlap(
+        gain.shape,
+        position,
+        len(changes) // 2,
+    )
+    window = gain[gain_slices]
+    window -= changes[changes_slices] * (window >= 0)
+    gain[position] = -1
+    row_maxima[gain_slices[0]] = gain[gain_slices[0]].max(axis=1)
+
+
+def find_best_position(gain: ndarray, row_maxima: ndarray) -> Position:
+    """Find the first block with maximal gain.
+
+    Args:
+        gain: gains of blocks.
+        row_maxima: maximal gains of rows.
+
+    Returns:
+        Position of the block.
+    """
+    row = int(argmax(row_maxima))
+    return Position(row, int(argmax(gain[row])))
@@ -0,0 +1,495 @@
+import struct
+import zlib
+from os import PathLike
+from pathlib import Path as FilePath
+from typing import (
+    Any,
+    BinaryIO,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from numpy import (
+    arange,
+    array,
+    bool_,
+    concatenate,
+    cumsum,
+    frombuffer,
+    int64,
+    load,
+    loadtxt,
+    ndarray,
+    pad,
+    uint8,
+    uint16,
+    unpackbits,
+    zeros,
+)
+
+from constants import (
+    DEFAULT_CELL_SIZE,
+    DEFAULT_CHUNK_ROWS,
+    DEFAULT_OBSTRUCTED_SHARE,
+    ESRI_HEADER_KEYS,
+    PNG_CHANNELS,
+    PNG_READ_SIZE,
+    PNG_SIGNATURE,
+)
+from placement import NUMBA_AVAILABLE
+
+FileName = Union[str, 'PathLike[str]']
+MaskChunks = Iterator[ndarray]
+
+
+def iter_npy_rows(file_name: FileName, chunk_rows: int) -> MaskChunks:
+    """Stream 2D .npy array by row chunks using memory mapping.
+
+    Args:
+        file_name: path to .npy file.
+        chunk_rows: rows amount in every chunk.
+
+    Yields:
+        Boolean chunks, obstructed where the value is non-zero.
+
+    Raises:
+        Exception if array is not two-dimensional.
+    """
+    array = load(file_name, mmap_mode='r')
+    if array.ndim != 2:
+        raise Exception('Obstruction array should be two-dimensional')
+    for start in range(0, array.shape[0], chunk_rows):
+        yield array[start:][:chunk_rows] != 0
+
+
+def skip_esri_header(file: TextIO) -> List[str]:
+    """Skip ESRI ASCII grid header if it is present.
+
+    Args:
+        file: opened text file.
+
+    Returns:
+        Already read data lines, which are not part of header.
+    """
+    for line in file:
+        words = line.split()
+        if not words:
+            continue
+        if words[0].lower() not in ESRI_HEADER_KEYS:
+            return [line]
+    return []
+
+
+def iter_text_rows(
+    file_name: FileName,
+    chunk_rows: int,
+    delimiter: Optional[str] = None,
+) -> MaskChunks:
+    """Stream CSV or ASCII grid by row chunks.
+
+    Args:
+        file_name: path to text file.
+        chunk_rows: rows amount in every chunk.
+        delimiter: values delimiter, whitespace if not specified.
+
+    Yields:
+        Boolean chunks, obstructed where the value is greater than 0.
+    """
+    with open(file_name) as file:
+        lines = skip_esri_header(file)
+        for line in file:
+            if line.strip():
+                lines.append(line)
+            if len(lines) == chunk_rows:
+                yield loadtxt(lines, delimiter=delimiter, ndmin=2) > 0
+                lines = []
+        if lines:
+            yield loadtxt(lines, delimiter=delimiter, ndmin=2) > 0
+
+
+def read_png_chunk(file: BinaryIO) -> Tuple[bytes, bytes]:
+    """Read next PNG chunk.
+
+    Args:
+        file: opened PNG file positioned at the start of chunk.
+
+    Returns:
+        Chunk type and chunk data.
+
+    Raises:
+        Exception if file ends unexpectedly.
+    """
+    header = file.read(8)
+    if len(header) != 8:
+        raise Exception('Unexpected end of PNG file')
+    length, kind = struct.unpack('>I4s', header)
+    data = file.read(length)
+    file.read(4)
+    return kind, data
+
+
+def unfilter_png_bytes(
+    kind: int,
+    result: Any,
+    above: Any,
+    bpp: int,
+) -> None:
+    """Reconstruct PNG scanline filtered by Average or Paeth filter.
+
+    Every byte depends on the reconstructed byte to the left, so bytes
+    are reconstructed one by one in place. The same loops run on lists
+    of integers or on integer arrays compiled by numba.
+
+    Args:
+        kind: PNG filter type, 3 (Average) or 4 (Paeth).
+        result: filtered scanline bytes.
+        above: reconstructed previous scanline bytes.
+        bpp: bytes per complete pixel (at least 1).
+    """
+    for index in range(len(result)):
+        left = result[index - bpp] if index >= bpp else 0
+        up = above[index]
+        if kind == 3:
+            result[index] = (result[index] + ((left + up) >> 1)) & 255
+            continue
+        up_left = above[index - bpp] if index >= bpp else 0
+        left_distance = abs(up - up_left)
+        up_distance = abs(left - up_left)
+        up_left_distance = abs(left + up - 2 * up_left)
+        if left_distance <= up_distance and left_distance <= up_left_distance:
+            predicted = left
+        elif up_distance <= up_left_distance:
+            predicted = up
+        else:
+            predicted = up_left
+        result[index] = (result[index] + predicted) & 255
+
+
+if NUMBA_AVAILABLE:
+    from numba import njit
+
+    unfilter_png_bytes_compiled = njit(unfilter_png_bytes)
+
+
+def unfilter_png_row(
+    kind: int,
+    row: ndarray,
+    previous: ndarray,
+    bpp: int,
+) -> ndarray:
+    """Reconstruct filtered PNG scanline.
+
+    Args:
+        kind: PNG filter type.
+        row: filtered scanline bytes.
+        previous: reconstructed previous scanline.
+        bpp: bytes per complete pixel (at least 1).
+
+    Returns:
+        Reconstructed scanline.
+
+    Raises:
+        Exception if filter type is unknown.
+    """
+    if kind == 0:
+        return row
+    if kind == 1:
+        return (
+            cumsum(row.reshape(-1, bpp), axis=0, dtype=uint16).astype(uint8)
+        ).ravel()
+    if kind == 2:
+        return row + previous
+    if kind not in (3, 4):
+        raise Exception('Unknown PNG filter type')
+    if NUMBA_AVAILABLE:
+        result = row.astype(int64)
+        unfilter_png_bytes_compiled(kind, result, previous.astype(int64), bpp)
+        return result.astype(uint8)
+    values = row.tolist()
+    unfilter_png_bytes(kind, values, previous.tolist(), bpp)
+    return array(values, uint8)
+
+
+def get_png_obstructions(
+    rows: ndarray,
+    width: int,
+    depth: int,
+    color: int,
+    palette: Optional[ndarray],
+) -> ndarray:
+    """Convert reconstructed PNG scanlines to obstruction mask.
+
+    Args:
+        rows: reconstructed scanlines.
+        width: image width.
+        depth: bit depth of every sample.
+        color: PNG color type.
+        palette: palette colors for indexed images.
+
+    Returns:
+        Boolean chunk, obstructed where the pixel is bright.
+
+    Raises:
+        Exception if indexed image has no palette.
+    """
+    channels = PNG_CHANNELS[color]
+    if depth == 16:
+        samples = rows.view('>u2').reshape(len(rows), width, channels)
+    elif depth == 8:
+        samples = rows.reshape(len(rows), width, channels)
+    else:
+        bits = unpackbits(rows, axis=1)[:, : width * channels * depth]
+        weights = 1 << arange(depth - 1, -1, -1)
+        samples = (
+            bits.reshape(len(rows), width * channels, depth) * weights
+        ).sum(axis=2)
+        samples = samples.reshape(len(rows), width, channels)
+    if color == 3:
+        if palette is None:
+            raise Exception('PNG palette not found')
+        samples = palette[samples[:, :, 0]]
+        depth = 8
+    color_channels = 1 if samples.shape[2] < 3 else 3
+    brightness = samples[:, :, :color_channels].max(axis=2)
+    return brightness.astype(int) * 2 > (1 << depth) - 1
+
+
+def read_png_header(file: BinaryIO) -> Tuple[int, int, int, int, int]:
+    """Read PNG signature and IHDR chunk.
+
+    Args:
+        file: PNG file opened in binary mode.
+
+    Returns:
+        Width, height, bit depth, color type and interlace method.
+
+    Raises:
+        Exception if file is not PNG image.
+    """
+    if file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+        raise Exception('File is not PNG image')
+    _, data = read_png_chunk(file)
+    width, height, depth, color, _, _, interlace = struct.unpack(
+        '>IIBBBBB',
+        data,
+    )
+    return width, height, depth, color, interlace
+
+
+def iter_png_rows(file_name: FileName, chunk_rows: int) -> MaskChunks:
+    """Stream PNG image by row chunks without decoding it whole.
+
+    Args:
+        file_name: path to non-interlaced PNG file.
+        chunk_rows: rows amount in every chunk.
+
+    Yields:
+        Boolean chunks, obstructed where the pixel is bright.
+
+    Raises:
+        Exception if file is not supported PNG.
+    """
+    with open(file_name, 'rb') as file:
+        width, height, depth, color, interlace = read_png_header(file)
+        if interlace or color not in PNG_CHANNELS:
+            raise Exception('Only non-interlaced PNG images are supported')
+        channels = PNG_CHANNELS[color]
+        stride = (width * channels * depth + 7) // 8
+        bpp = max(1, channels * depth // 8)
+        palette = None
+        decompressor = zlib.decompressobj()
+        buffer = bytearray()
+        previous = zeros(stride, uint8)
+        rows: List[ndarray] = []
+        read_rows = 0
+        while read_rows < height:
+            kind, data = read_png_chunk(file)
+            if kind == b'PLTE':
+                palette = frombuffer(data, uint8).reshape(-1, 3)
+            if kind == b'IEND':
+                break
+            if kind != b'IDAT':
+                continue
+            while read_rows < height:
+                decompressed = decompressor.decompress(data, PNG_READ_SIZE)
+                data = decompressor.unconsumed_tail
+                if not data and not decompressed:
+                    break
+                buffer += decompressed
+                while len(buffer) > stride and read_rows < height:
+                    previous = unfilter_png_row(
+                        buffer[0],
+                        frombuffer(bytes(buffer[1:][:stride]), uint8),
+                        previous,
+                        bpp,
+                    )
+                    del buffer[: stride + 1]
+                    rows.append(previous)
+                    read_rows += 1
+                    if len(rows) == chunk_rows or read_rows == height:
+                        yield get_png_obstructions(
+                            concatenate(rows).reshape(len(rows), stride),
+                            width,
+                            depth,
+                            color,
+                            palette,
+                        )
+                        rows = []
+
+
+def get_text_shape(
+    file_name: FileName,
+    delimiter: Optional[str] = None,
+) -> Tuple[int, int]:
+    """Count data rows and columns of CSV or ASCII grid.
+
+    Args:
+        file_name: path to text file.
+        delimiter: values delimiter, whitespace if not specified.
+
+    Returns:
+        Rows and columns amounts.
+    """
+    with open(file_name) as file:
+        lines = skip_esri_header(file)
+        columns = len(lines[0].split(delimiter)) if lines else 0
+        return len(lines) + sum(bool(line.strip()) for line in file), columns
+
+
+def get_mask_shape(file_name: FileName) -> Tuple[int, int]:
+    """Get obstruction mask shape without reading its data.
+
+    Args:
+        file_name: path to .png, .npy, .csv or ASCII grid file.
+
+    Returns:
+        Rows and columns amounts.
+
+    Raises:
+        Exception if .npy array is not two-dimensional.
+    """
+    suffix = FilePath(file_name).suffix.lower()
+    if suffix == '.png':
+        with open(file_name, 'rb') as file:
+            width, height, *_ = read_png_header(file)
+        return height, width
+    if suffix == '.npy':
+        shape = load(file_name, mmap_mode='r').shape
+        if len(shape) != 2:
+            raise Exception('Obstruction array should be two-dimensional')
+        return shape
+    if suffix == '.csv':
+        return get_text_shape(file_name, ',')
+    return get_text_shape(file_name)
+
+
+def iter_mask_rows(file_name: FileName, chunk_rows: int) -> MaskChunks:
+    """Stream obstruction mask from file by row chunks.
+
+    Args:
+        file_name: path to .png, .npy, .csv or ASCII grid file.
+        chunk_rows: rows amount in every chunk.
+
+    Returns:
+        Iterator over boolean chunks.
+    """
+    suffix = FilePath(file_name).suffix.lower()
+    if suffix == '.png':
+        return iter_png_rows(file_name, chunk_rows)
+    if suffix == '.npy':
+        return iter_npy_rows(file_name, chunk_rows)
+    if suffix == '.csv':
+        return iter_text_rows(file_name, chunk_rows, ',')
+    return iter_text_rows(file_name, chunk_rows)
+
+
+def downsample_mask(
+    chunk: ndarray,
+    cell_size: int,
+    obstructed_share: float,
+) -> ndarray:
+    """Downsample chunk of obstruction mask to cells.
+
+    Args:
+        chunk: boolean chunk, rows amount is multiple of cell_size except
+            the last chunk.
+        cell_size: side of the square cell in source pixels.
+        obstructed_share: minimal share of obstructed pixels to obstruct
+            the whole cell.
+
+    Returns:
+        Downsampled chunk.
+    """
+    if cell_size == 1:
+        return chunk.astype(bool_)
+    rows, columns = chunk.shape
+    height = -(-rows // cell_size)
+    width = -(-columns // cell_size)
+    padding = (
+        (0, height * cell_size - rows),
+        (0, width * cell_size - columns),
+    )
+    counts = (
+        pad(chunk, padding)
+        .reshape(height, cell_size, width, cell_size)
+        .sum(axis=(1, 3))
+    )
+    areas = pad(zeros(chunk.shape, uint8) + 1, padding).reshape(
+        height,
+        cell_size,
+        width,
+        cell_size,
+    )
+    return counts >= areas.sum(axis=(1, 3)) * obstructed_share
+
+
+def load_obstruction_mask(
+    file_name: FileName,
+    cell_size: int = DEFAULT_CELL_SIZE,
+    obstructed_share: float = DEFAULT_OBSTRUCTED_SHARE,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    invert: bool = False,
+) -> ndarray:
+    """Load obstruction mask from file streaming it by row chunks.
+
+    The downsampled mask is allocated once from the source shape and only
+    one chunk of source rows is kept in memory at a time, so the peak
+    memory usage is defined by the downsampled mask.
+
+    Args:
+        file_name: path to .png, .npy, .csv or ASCII grid file.
+        cell_size: side of the square cell in source pixels.
+        obstructed_share: minimal share of obstructed pixels to obstruct
+            the whole cell.
+        chunk_rows: approximate rows amount to read at a time.
+        invert: obstruct zero (dark) pixels instead of non-zero ones.
+
+    Returns:
+        Boolean obstruction mask (rows are x, columns are y).
+
+    Raises:
+        Exception if file is empty, truncated or cell size is not positive.
+    """
+    if cell_size < 1:
+        raise Exception('Cell size should be positive')
+    rows, columns = get_mask_shape(file_name)
+    if not rows or not columns:
+        raise Exception('Obstruction map is empty')
+    mask = zeros((-(-rows // cell_size), -(-columns // cell_size)), bool_)
+    chunk_rows = max(1, chunk_rows // cell_size) * cell_size
+    start = 0
+    for chunk in iter_mask_rows(file_name, chunk_rows):
+        if invert:
+            chunk = ~chunk
+        block = downsample_mask(chunk, cell_size, obstructed_share)
+        if block.shape[1] != mask.shape[1] or start + len(block) > len(mask):
+            raise Exception('Obstruction map rows have inconsistent length')
+        mask[start:][: len(block)] = block
+        start += len(block)
+    if start != len(mask):
+        raise Exception('Obstruction map is truncated')
+    return mask
@@ -5,6 +5,7 @@ Tower = namedtuple(
     'Tower',
     'position range covered connections',
 )
+TowerType = namedtuple('TowerType', 'name range cost')
 Path = namedtuple(
     'Path',
     'start end',
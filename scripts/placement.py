@@ -0,0 +1,391 @@
+from collections import namedtuple
+from importlib.util import find_spec
+from math import inf
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from numpy import arange, argmax, flatnonzero, ndarray
+
+from constants import BACKENDS_ORDER, GRID_VALUES
+
+CLEAR = GRID_VALUES['clear']
+COVERED = GRID_VALUES['covered']
+OVER_COVERED = GRID_VALUES['over covered']
+NUMBA_AVAILABLE = find_spec('numba') is not None
+
+Backend = namedtuple(
+    'Backend',
+    'count_square get_band_statistics find_closest_uncovered '
+    'find_place optimize_place find_sweep_place',
+)
+
+
+def count_square(
+    grid: ndarray,
+    value: int,
+    x: int,
+    y: int,
+    tower_range: int,
+) -> int:
+    """Count blocks with value in the square area of tower.
+
+    Args:
+        grid: city grid.
+        value: grid value to count.
+        x: x coordinate of tower.
+        y: y coordinate of tower.
+        tower_range: tower range.
+
+    Returns:
+        Amount of blocks including tower block.
+    """
+    top = max(0, x - tower_range)
+    bottom = x + tower_range + 1
+    left = max(0, y - tower_range)
+    right = y + tower_range + 1
+    return int((grid[top:bottom, left:right] == value).sum())
+
+
+def count_square_loops(
+    grid: ndarray,
+    value: int,
+    x: int,
+    y: int,
+    tower_range: int,
+) -> int:
+    """Count blocks with value in the square area of tower by loops."""
+    n, m = grid.shape
+    amount = 0
+    for row in range(max(0, x - tower_range), min(n, x + tower_range + 1)):
+        for column in range(
+            max(0, y - tower_range),
+            min(m, y + tower_range + 1),
+        ):
+            if grid[row, column] == value:
+                amount += 1
+    return amount
+
+
+def get_band_statistics(
+    grid: ndarray,
+    x: int,
+    y: int,
+    tower_range: int,
+) -> Tuple[float, float]:
+    """Get statistics of uncovered blocks in rows band of tower.
+
+    Only blocks outside of the square area of tower are counted.
+
+    Args:
+        grid: city grid, transposed for columns band.
+        x: x coordinate of tower.
+        y: y coordinate of tower.
+        tower_range: tower range.
+
+    Returns:
+        Average column and the first column of blocks, infinity if there
+        are no blocks.
+    """
+    top = max(0, x - tower_range)
+    bottom = x + tower_range + 1
+    left = max(0, y - tower_range)
+    right = y + tower_range + 1
+    counts = (grid[top:bottom] == CLEAR).sum(axis=0)
+    counts[left:right] = 0
+    amount = counts.sum()
+    if not amount:
+        return inf, inf
+    return (
+        (counts * arange(len(counts))).sum() / amount,
+        float(argmax(counts > 0)),
+    )
+
+
+def get_band_statistics_loops(
+    grid: ndarray,
+    x: int,
+    y: int,
+    tower_range: int,
+) -> Tuple[float, float]:
+    """Get statistics of uncovered blocks in rows band of tower by loops."""
+    n, m = grid.shape
+    amount = 0
+    total = 0
+    first = -1
+    for column in range(m):
+        if y - tower_range <= column <= y + tower_range:
+            continue
+        for row in range(max(0, x - tower_range), min(n, x + tower_range + 1)):
+            if grid[row, column] == CLEAR:
+                amount += 1
+                total += column
+                if first < 0:
+                    first = column
+    if not amount:
+        return inf, inf
+    return total / amount, float(first)
+
+
+def find_closest_uncovered(
+    grid: ndarray,
+    diagonal: int,
+) -> Tuple[int, int, int]:
+    """Find uncovered block with minimal x + y, then with minimal x.
+
+    Args:
+        grid: city grid.
+        diagonal: x + y of blocks to start from, all blocks closer to the
+            corner are already covered.
+
+    Returns:
+        Coordinates of block and its x + y, -1 coordinates if all blocks
+        are covered.
+    """
+    n, m = grid.shape
+    while diagonal < n + m - 1:
+        rows = arange(max(0, diagonal - m + 1), min(n, diagonal + 1))
+        found = flatnonzero(grid[rows, diagonal - rows] == CLEAR)
+        if len(found):
+            x = int(rows[found[0]])
+            return x, diagonal - x, diagonal
+        diagonal += 1
+    return -1, -1, diagonal
+
+
+def find_closest_uncovered_loops(
+    grid: ndarray,
+    diagonal: int,
+) -> Tuple[int, int, int]:
+    """Find uncovered block closest to the corner by loops."""
+    n, m = grid.shape
+    while diagonal < n + m - 1:
+        for x in range(max(0, diagonal - m + 1), min(n, diagonal + 1)):
+            if grid[x, diagonal - x] == CLEAR:
+                return x, diagonal - x, diagonal
+        diagonal += 1
+    return -1, -1, diagonal
+
+
+def create_backend(
+    count: Callable[..., int],
+    get_statistics: Callable[..., Tuple[float, float]],
+    find_closest: Callable[..., Tuple[int, int, int]],
+    compile_function: Callable[[Any], Any],
+) -> Backend:
+    """Create covering backend from array kernels.
+
+    The placement functions repeat find_place_for_tower and
+    additionally_optimize_place_for_tower on grid arrays, so they give the
+    same positions for the same blocks.
+
+    Args:
+        count: function counting blocks in the square area of tower.
+        get_statistics: function getting statistics of rows band.
+        find_closest: function finding uncovered block closest to corner.
+        compile_function: function compiling placement functions.
+
+    Returns:
+        Backend functions.
+    """
+
+    def is_clear(value: float) -> bool:
+        """Check that tower can be placed on block with value."""
+        return value == CLEAR or value == COVERED or value == OVER_COVERED
+
+    def find_place(
+        grid: ndarray,
+        x: int,
+        y: int,
+        tower_range: int,
+    ) -> Tuple[int, int]:
+        """Find place for tower covering the closest uncovered block."""
+        n, m = grid.shape
+        farthest_x = min(x + tower_range, n)
+        farthest_y = min(y + tower_range, m)
+        optimal_x, optimal_y = x, y
+        optimal_covered = count(grid, CLEAR, x, y, tower_range) - 1
+        optimal_over_covered = count(grid, COVERED, x, y, tower_range)
+        optimized = True
+        distance = 0
+        while optimized and distance <= tower_range:
+            found = False
+            for index in range(2 * distance + 1):
+                if index <= distance:
+                    neighbor_x = farthest_x - index
+                    neighbor_y = farthest_y - distance
+                else:
+                    neighbor_x = farthest_x - distance
+                    neighbor_y = farthest_y - 2 * distance + index
+                if not (
+                    0 <= neighbor_x < n
+                    and 0 <= neighbor_y < m
+                    and is_clear(grid[neighbor_x, neighbor_y])
+                ):
+                    continue
+                if not found:
+                    found = True
+                    optimized = False
+                covered = count(
+                    grid,
+                    CLEAR,
+                    neighbor_x,
+                    neighbor_y,
+                    tower_range,
+                )
+                over_covered = count(
+                    grid,
+                    COVERED,
+                    neighbor_x,
+                    neighbor_y,
+                    tower_range,
+                )
+                if (
+                    covered >= optimal_covered
+                    and over_covered <= optimal_over_covered
+                ) and not (
+                    covered == optimal_covered
+                    and over_covered == optimal_over_covered
+                ):
+                    optimal_x, optimal_y = neighbor_x, neighbor_y
+                    optimal_covered = covered
+                    optimal_over_covered = over_covered
+                    optimized = True
+            distance += 1
+        return optimal_x, optimal_y
+
+    def optimize_place(
+        grid: ndarray,
+        x: int,
+        y: int,
+        tower_range: int,
+    ) -> Tuple[int, int]:
+        """Move tower to the left or to the bottom while it is better."""
+        columns_grid = grid.T
+        optimal_covered = count(grid, CLEAR, x, y, tower_range)
+        average_y, min_y = get_statistics(grid, x, y, tower_range)
+        average_x, min_x = get_statistics(columns_grid, y, x, tower_range)
+        left_allowed = True
+        bottom_allowed = True
+        while left_allowed or bottom_allowed:
+            left = y - 1
+            while left >= 0 and not is_clear(grid[x, left]):
+                left -= 1
+            if left < 0:
+                left_allowed = False
+            bottom = x - 1
+            while bottom >= 0 and not is_clear(grid[bottom, y]):
+                bottom -= 1
+            if bottom < 0:
+                bottom_allowed = False
+            if left_allowed and (not bottom_allowed or y - left <= x - bottom):
+                covered = count(grid, CLEAR, x, left, tower_range)
+                new_average_y, new_min_y = get_statistics(
+                    grid,
+                    x,
+                    left,
+                    tower_range,
+                )
+                if (
+                    new_average_y <= average_y
+                    and new_min_y <= min_y
+                    and covered <= optimal_covered
+                ):
+                    left_allowed = False
+                else:
+                    average_y, min_y = new_average_y, new_min_y
+                    optimal_covered = covered
+                    y = left
+                    average_x, min_x = get_statistics(
+                        columns_grid,
+                        y,
+                        x,
+                        tower_range,
+                    )
+            elif bottom_allowed:
+                covered = count(grid, CLEAR, bottom, y, tower_range)
+                new_average_x, new_min_x = get_statistics(
+                    columns_grid,
+                    y,
+                    bottom,
+                    tower_range,
+                )
+                if (
+                    new_average_x <= average_x
+                    and new_min_x <= min_x
+                    and covered <= optimal_covered
+                ):
+                    bottom_allowed = False
+                else:
+                    average_x, min_x = new_average_x, new_min_x
+                    optimal_covered = covered
+                    x = bottom
+                    average_y, min_y = get_statistics(
+                        grid,
+                        x,
+                        y,
+                        tower_range,
+                    )
+        return x, y
+
+    is_clear = compile_function(is_clear)
+    find_place = compile_function(find_place)
+    optimize_place = compile_function(optimize_place)
+
+    def find_sweep_place(
+        grid: ndarray,
+        tower_range: int,
+        diagonal: int,
+    ) -> Tuple[int, int, int]:
+        """Find place for the next tower of sweep covering."""
+        x, y, diagonal = find_closest(grid, diagonal)
+        if x < 0:
+            return x, y, diagonal
+        x, y = find_place(grid, x, y, tower_range)
+        x, y = optimize_place(grid, x, y, tower_range)
+        return x, y, diagonal
+
+    return Backend(
+        count,
+        get_statistics,
+        find_closest,
+        find_place,
+        optimize_place,
+        compile_function(find_sweep_place),
+    )
+
+
+BACKENDS: Dict[str, Backend] = {
+    'numpy': create_backend(
+        count_square,
+        get_band_statistics,
+        find_closest_uncovered,
+        lambda function: function,
+    ),
+}
+if NUMBA_AVAILABLE:
+    from numba import njit
+
+    BACKENDS['numba'] = create_backend(
+        njit(count_square_loops),
+        njit(get_band_statistics_loops),
+        njit(find_closest_uncovered_loops),
+        njit,
+    )
+
+
+def get_backend(name: Optional[str] = None) -> Backend:
+    """Get covering backend.
+
+    Args:
+        name: 'numba' or 'numpy', the fastest available if not specified.
+
+    Returns:
+        Backend functions.
+
+    Raises:
+        Exception if backend is not available.
+    """
+    if name is None:
+        name = next(name for name in BACKENDS_ORDER if name in BACKENDS)
+    if name not in BACKENDS:
+        raise Exception(f'Backend should be one of {tuple(BACKENDS)}')
+    return BACKENDS[name]
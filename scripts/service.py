@@ -0,0 +1,666 @@
+import asyncio
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from hashlib import sha256
+from http import HTTPStatus
+from random import Random
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from numpy import array, bincount, frombuffer, int32, ndarray, packbits, uint8
+
+from cache import ResultCache, get_result_key
+from classes import CityGrid
+from constants import (
+    DEFAULT_FOOTPRINT,
+    DEFAULT_OBSTRUCTED_PERCENTAGE,
+    DEFAULT_STRATEGY,
+    EXPORT_BATCH_SIZE,
+    FOOTPRINTS,
+    GRID_VALUES,
+    RESULTS_VERSION,
+    SERVICE_CACHE_SIZE,
+    SERVICE_HOST,
+    SERVICE_MAX_BODY_SIZE,
+    SERVICE_PORT,
+    SERVICE_QUEUE_SIZE,
+    SERVICE_RETRY_AFTER,
+    STRATEGIES,
+)
+from exporters import iter_batches
+from loaders import FileName
+from utils import (
+    create_random_mask,
+    get_percentage,
+    get_percentage_amount,
+    get_workers,
+)
+
+Spec = Dict[str, Any]
+Summary = Dict[str, Any]
+
+
+def get_integer(data: Dict[str, Any], name: str, minimum: int) -> int:
+    """Get integer field of request.
+
+    Args:
+        data: request data.
+        name: field name.
+        minimum: minimum allowed value.
+
+    Returns:
+        Field value.
+
+    Raises:
+        Exception if field is missing or is not an allowed integer.
+    """
+    value = data.get(name)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise Exception(f'{name} should be an integer')
+    if value < minimum:
+        raise Exception(f'{name} should not be less than {minimum}')
+    return value
+
+
+def parse_mask(rows: Any) -> ndarray:
+    """Parse uploaded obstruction mask.
+
+    Args:
+        rows: rows of mask, strings of '0' and '1' or lists of numbers.
+
+    Returns:
+        Boolean mask.
+
+    Raises:
+        Exception if rows are empty, have different lengths or strings
+        have other symbols.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise Exception('mask should be a non-empty list of rows')
+    if not all(isinstance(row, str) for row in rows):
+        mask = array(rows, bool)
+        if mask.ndim != 2:
+            raise Exception('mask rows should have the same length')
+        return mask
+    symbols = frombuffer(''.join(rows).encode(), uint8)
+    if len(symbols) != len(rows) * len(rows[0]):
+        raise Exception('mask rows should have the same length')
+    mask = symbols == ord('1')
+    if not (mask | (symbols == ord('0'))).all():
+        raise Exception("mask rows should consist of '0' and '1'")
+    return mask.reshape(len(rows), -1)
+
+
+def parse_spec(data: Any) -> Spec:
+    """Check city spec and fill default values.
+
+    The spec has 'range', optional 'strategy' and 'footprint', and either
+    'mask' with rows of obstruction mask or 'n', 'm', 'seed' and optional
+    'percentage' of randomly obstructed blocks.
+
+    Args:
+        data: city spec from request.
+
+    Returns:
+        City spec with obstruction mask parsed to array.
+
+    Raises:
+        Exception if spec is not valid.
+    """
+    if not isinstance(data, dict):
+        raise Exception('City spec should be an object')
+    spec = {
+        'range': get_integer(data, 'range', 0),
+        'strategy': data.get('strategy', DEFAULT_STRATEGY),
+        'footprint': data.get('footprint', DEFAULT_FOOTPRINT),
+    }
+    if spec['strategy'] not in STRATEGIES:
+        raise Exception(f'strategy should be one of {STRATEGIES}')
+    if spec['footprint'] not in FOOTPRINTS:
+        raise Exception(f'footprint should be one of {FOOTPRINTS}')
+    if spec['strategy'] == 'sweep' and spec['footprint'] != 'square':
+        raise Exception('sweep strategy covers only square footprint')
+    if 'mask' in data:
+        spec['mask'] = parse_mask(data['mask'])
+        spec['n'], spec['m'] = spec['mask'].shape
+        return spec
+    spec['n'] = get_integer(data, 'n', 1)
+    spec['m'] = get_integer(data, 'm', 1)
+    spec['seed'] = get_integer(data, 'seed', 0)
+    percentage = data.get('percentage', DEFAULT_OBSTRUCTED_PERCENTAGE)
+    if (
+        isinstance(percentage, bool)
+        or not isinstance(percentage, (int, float))
+        or not 100 >= percentage >= 0
+    ):
+        raise Exception('percentage should be a number from 0 to 100')
+    spec['percentage'] = float(percentage)
+    return spec
+
+
+def get_spec_key(spec: Spec) -> str:
+    """Get content hash of city spec.
+
+    Args:
+        spec: parsed city spec.
+
+    Returns:
+        Hexadecimal SHA-256 of results version, parameters and packed
+        obstruction mask.
+    """
+    digest = sha256(str(RESULTS_VERSION).encode())
+    parameters = {
+        name: value for name, value in spec.items() if name != 'mask'
+    }
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    if 'mask' in spec:
+        digest.update(packbits(spec['mask']).tobytes())
+    return digest.hexdigest()
+
+
+def read_spec(body: bytes) -> Tuple[str, Spec]:
+    """Decode and check city spec of request body and hash it.
+
+    Bodies with large masks take a while, so they are read outside of
+    the event loop.
+
+    Args:
+        body: JSON body of request.
+
+    Returns:
+        Content hash of spec and parsed spec.
+    """
+    spec = parse_spec(json.loads(body))
+    return get_spec_key(spec), spec
+
+
+@lru_cache(maxsize=None)
+def get_cache(directory: Optional[str]) -> ResultCache:
+    """Get result cache of worker process.
+
+    Args:
+        directory: directory of stored results, results are kept only in
+            memory if not specified.
+
+    Returns:
+        Result cache shared by jobs of the process.
+    """
+    return ResultCache(directory)
+
+
+def cover_city(
+    spec: Spec,
+    cache_directory: Optional[str] = None,
+) -> Tuple[Summary, ndarray]:
+    """Cover city of spec with towers, runs in worker process.
+
+    Coverings of the same obstructions are taken from the result cache
+    without creating CityGrid.
+
+    Args:
+        spec: parsed city spec.
+        cache_directory: directory of stored results shared by workers.
+
+    Returns:
+        Summary of covering and positions of towers.
+    """
+    n, m = spec['n'], spec['m']
+    mask = spec.get('mask')
+    if mask is None:
+        mask = create_random_mask(
+            n,
+            m,
+            get_percentage_amount(n * m, spec['percentage']),
+            Random(spec['seed']),
+        )
+    cache = get_cache(cache_directory)
+    key = get_result_key(
+        mask,
+        spec['range'],
+        spec['strategy'],
+        spec['footprint'],
+    )
+    result = cache.get(key)
+    if result is None:
+        city = CityGrid(n, m, mask)
+        city.cover_with_towers(
+            spec['range'],
+            strategy=spec['strategy'],
+            footprint=spec['footprint'],
+            workers=1,
+        )
+        result = city.get_covering()
+        cache.put(key, result)
+    counts = bincount(result['grid'].ravel(), minlength=len(GRID_VALUES))
+    summary = {
+        'n': n,
+        'm': m,
+        'range': spec['range'],
+        'strategy': spec['strategy'],
+        'footprint': spec['footprint'],
+        'towers': len(result['positions']),
+        'obstructed_percentage': get_percentage(n * m, int(mask.sum())),
+        'blocks': {
+            name: int(counts[value]) for name, value in GRID_VALUES.items()
+        },
+    }
+    return summary, result['positions']
+
+
+async def read_request(
+    reader: asyncio.StreamReader,
+) -> Tuple[str, List[str], bytes]:
+    """Read HTTP request.
+
+    Args:
+        reader: stream of connection.
+
+    Returns:
+        Method, parts of path and body of request.
+
+    Raises:
+        Exception if request is malformed or its body is too large.
+    """
+    method, target, _ = (await reader.readline()).decode('latin-1').split()
+    headers = {}
+    line = await reader.readline()
+    while line.strip():
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+        line = await reader.readline()
+    length = int(headers.get('content-length', 0))
+    if length > SERVICE_MAX_BODY_SIZE:
+        raise Exception('Request body is too large')
+    path = target.partition('?')[0].strip('/')
+    return method, path.split('/'), await reader.readexactly(length)
+
+
+def get_head(status: int, headers: Dict[str, str]) -> bytes:
+    """Get status line and headers of HTTP response.
+
+    Args:
+        status: status code.
+        headers: response headers.
+
+    Returns:
+        Encoded head of response.
+    """
+    lines = [
+        f'HTTP/1.1 {int(status)} {HTTPStatus(status).phrase}',
+        *(f'{name}: {value}' for name, value in headers.items()),
+        'Connection: close',
+        '',
+        '',
+    ]
+    return '\r\n'.join(lines).encode('latin-1')
+
+
+async def write_json(
+    writer: asyncio.StreamWriter,
+    status: int,
+    payload: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None,
+) -> None:
+    """Write HTTP response with JSON body.
+
+    Args:
+        writer: stream of connection.
+        status: status code.
+        payload: response data.
+        headers: additional response headers.
+    """
+    body = json.dumps(payload).encode()
+    writer.write(
+        get_head(
+            status,
+            {
+                'Content-Type': 'application/json',
+                'Content-Length': str(len(body)),
+                **(headers or {}),
+            },
+        )
+        + body,
+    )
+    await writer.drain()
+
+
+async def write_chunks(
+    writer: asyncio.StreamWriter,
+    chunks: Iterator[bytes],
+) -> None:
+    """Stream HTTP response with JSON Lines body in chunks.
+
+    Every chunk is sent only after the previous one is taken by the
+    client, so slow clients do not pile results up in memory. The status
+    is already sent with the first chunk, so the connection is aborted
+    if chunks fail, and the client sees the truncated body.
+
+    Args:
+        writer: stream of connection.
+        chunks: encoded chunks of lines.
+
+    Raises:
+        ConnectionAbortedError if chunks fail after the head is sent.
+    """
+    writer.write(
+        get_head(
+            HTTPStatus.OK,
+            {
+                'Content-Type': 'application/x-ndjson',
+                'Transfer-Encoding': 'chunked',
+            },
+        ),
+    )
+    try:
+        for chunk in chunks:
+            writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            await writer.drain()
+    except ConnectionError:
+        raise
+    except Exception as error:
+        writer.transport.abort()
+        raise ConnectionAbortedError('Response is aborted') from error
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+
+class Job:
+    """Covering job of coverage service."""
+
+    def __init__(self, key: str, spec: Spec) -> None:
+        """Initialize class Job.
+
+        Args:
+            key: content hash of spec, used as job id.
+            spec: parsed city spec.
+        """
+        self.key = key
+        self.spec = spec
+        self.status = 'queued'
+        self.error = ''
+        self.summary: Summary = {}
+        self.positions = array([], int32).reshape(0, 2)
+        self.done = asyncio.Event()
+
+    def get_state(self) -> Dict[str, Any]:
+        """Get job id, status and summary or error if job is finished.
+
+        Returns:
+            Job state.
+        """
+        state: Dict[str, Any] = {'id': self.key, 'status': self.status}
+        if self.summary:
+            state['summary'] = self.summary
+        if self.error:
+            state['error'] = self.error
+        return state
+
+    def get_lines(self) -> Iterator[bytes]:
+        """Get result of finished job as JSON Lines.
+
+        Yields:
+            Line of summary, then chunks of lines of towers.
+        """
+        yield (json.dumps(self.summary) + '\n').encode()
+        tower_range = self.summary['range']
+        for batch in iter_batches(self.positions.tolist(), EXPORT_BATCH_SIZE):
+            yield ''.join(
+                json.dumps({'x': x, 'y': y, 'range': tower_range}) + '\n'
+                for x, y in batch
+            ).encode()
+
+
+class CoverageService:
+    """Local HTTP/JSON service covering cities in worker processes.
+
+    Routes:
+        POST /jobs: submit city spec, get job id and status.
+        GET /jobs/<id>: get job status and summary.
+        GET /jobs/<id>/result: wait for job and stream JSON Lines result.
+        GET /status: get amounts of queued and cached jobs.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_size: int = SERVICE_QUEUE_SIZE,
+        cache_size: int = SERVICE_CACHE_SIZE,
+        cache_directory: Optional[FileName] = None,
+    ) -> None:
+        """Initialize class CoverageService.
+
+        Args:
+            workers: amount of worker processes, all processors if not
+                specified.
+            queue_size: maximum amount of waiting jobs, new jobs are
+                rejected while the queue is full.
+            cache_size: maximum amount of kept finished jobs.
+            cache_directory: directory of results stored by workers,
+                results are kept only in memory of workers if not
+                specified.
+        """
+        self.workers = get_workers(workers)
+        self.queue_size = queue_size
+        self.cache_size = cache_size
+        self.cache_directory = (
+            None if cache_directory is None else str(cache_directory)
+        )
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+
+    async def start(
+        self,
+        host: str = SERVICE_HOST,
+        port: int = SERVICE_PORT,
+    ) -> Tuple[str, int]:
+        """Start worker processes and server.
+
+        Args:
+            host: host to listen.
+            port: port to listen, any free port if 0.
+
+        Returns:
+            Host and port of server.
+        """
+        self.queue: 'asyncio.Queue[Job]' = asyncio.Queue(self.queue_size)
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.dispatchers = [
+            asyncio.create_task(self._run_jobs()) for _ in range(self.workers)
+        ]
+        self.server = await asyncio.start_server(self._handle, host, port)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return host, port
+
+    async def close(self) -> None:
+        """Stop server and worker processes."""
+        self.server.close()
+        await self.server.wait_closed()
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.executor.shutdown(cancel_futures=True)
+
+    async def serve(
+        self,
+        host: str = SERVICE_HOST,
+        port: int = SERVICE_PORT,
+    ) -> None:
+        """Serve requests until cancelled.
+
+        Args:
+            host: host to listen.
+            port: port to listen.
+        """
+        await self.start(host, port)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    def submit(self, spec: Spec, key: Optional[str] = None) -> Optional[Job]:
+        """Submit covering job.
+
+        Jobs with the same content hash are shared, so repeated specs get
+        cached results. Failed jobs are submitted again.
+
+        Args:
+            spec: parsed city spec.
+            key: content hash of spec, calculated if not specified.
+
+        Returns:
+            New or existing job, None if the queue is full.
+        """
+        if key is None:
+            key = get_spec_key(spec)
+        job = self.jobs.get(key)
+        if job is None or job.status == 'failed':
+            if self.queue.full():
+                return None
+            job = Job(key, spec)
+            self.jobs[key] = job
+            self.queue.put_nowait(job)
+        self.jobs.move_to_end(key)
+        finished = [
+            finished_key
+            for finished_key, finished_job in self.jobs.items()
+            if finished_job.done.is_set()
+        ]
+        for finished_key in finished[
+            : max(len(self.jobs) - self.cache_size, 0)
+        ]:
+            del self.jobs[finished_key]
+        return job
+
+    async def _run_jobs(self) -> None:
+        """Run queued jobs in worker processes one by one."""
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = 'running'
+            try:
+                job.summary, job.positions = await loop.run_in_executor(
+                    self.executor,
+                    cover_city,
+                    job.spec,
+                    self.cache_directory,
+                )
+                job.status = 'done'
+            except Exception as error:
+                job.status = 'failed'
+                job.error = str(error) or type(error).__name__
+            job.spec = {}
+            job.done.set()
+
+    async def _handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Handle HTTP connection.
+
+        Errors are answered with Bad Request only before the response is
+        started, started responses are aborted instead. Connections closed
+        by the client are dropped without a response.
+
+        Args:
+            reader: stream of connection to read.
+            writer: stream of connection to write.
+        """
+        try:
+            await self._route(*await read_request(reader), writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as error:
+            try:
+                await write_json(
+                    writer,
+                    HTTPStatus.BAD_REQUEST,
+                    {'error': str(error)},
+                )
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _route(
+        self,
+        method: str,
+        parts: List[str],
+        body: bytes,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Respond to HTTP request.
+
+        Args:
+            method: request method.
+            parts: parts of request path.
+            body: request body.
+            writer: stream of connection.
+        """
+        if parts == ['status'] and method == 'GET':
+            await write_json(
+                writer,
+                HTTPStatus.OK,
+                {
+                    'workers': self.workers,
+                    'queued': self.queue.qsize(),
+                    'jobs': len(self.jobs),
+                },
+            )
+        elif parts == ['jobs'] and method == 'POST':
+            key, spec = await asyncio.get_running_loop().run_in_executor(
+                None,
+                read_spec,
+                body,
+            )
+            job = self.submit(spec, key)
+            if job is None:
+                await write_json(
+                    writer,
+                    HTTPStatus.SERVICE_UNAVAILABLE,
+                    {'error': 'Queue is full'},
+                    {'Retry-After': str(SERVICE_RETRY_AFTER)},
+                )
+            else:
+                await write_json(
+                    writer,
+                    HTTPStatus.OK
+                    if job.done.is_set()
+                    else HTTPStatus.ACCEPTED,
+                    job.get_state(),
+                )
+        elif (
+            parts[0] == 'jobs'
+            and len(parts) in (2, 3)
+            and parts[2:] in ([], ['result'])
+            and method == 'GET'
+        ):
+            job = self.jobs.get(parts[1])
+            if job is None:
+                await write_json(
+                    writer,
+                    HTTPStatus.NOT_FOUND,
+                    {'error': 'Job is not found'},
+                )
+            elif len(parts) == 2:
+                await write_json(writer, HTTPStatus.OK, job.get_state())
+            else:
+                await job.done.wait()
+                if job.status == 'failed':
+                    await write_json(
+                        writer,
+                        HTTPStatus.INTERNAL_SERVER_ERROR,
+                        job.get_state(),
+                    )
+                else:
+                    await write_chunks(writer, job.get_lines())
+        else:
+            await write_json(
+                writer,
+                HTTPStatus.NOT_FOUND,
+                {'error': 'Route is not found'},
+            )
+
+
+if __name__ == '__main__':
+    asyncio.run(CoverageService().serve())
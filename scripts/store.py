@@ -0,0 +1,503 @@
+from abc import ABC, abstractmethod
+from functools import total_ordering
+from typing import Any, Callable, Iterator, List, Optional, Set, Tuple, Union
+
+from numpy import (
+    arange,
+    bincount,
+    concatenate,
+    cumsum,
+    delete,
+    diff,
+    flatnonzero,
+    insert,
+    int32,
+    int64,
+    lexsort,
+    ndarray,
+    stack,
+    zeros,
+)
+
+from objects import Path, Position, Tower
+
+Area = Callable[[Position, int], Set[Position]]
+RemovedTower = Tuple[ndarray, ndarray, ndarray]
+
+
+def reserve(array: ndarray, size: int) -> ndarray:
+    """Get array with room for the specified amount of columns.
+
+    Capacity is doubled, so columns appended one by one take amortized
+    constant time.
+
+    Args:
+        array: array with columns as elements.
+        size: required amount of columns.
+
+    Returns:
+        The same array if it has room, the grown copy otherwise.
+    """
+    capacity = array.shape[1]
+    if size <= capacity:
+        return array
+    grown = zeros((len(array), max(size, 2 * capacity)), array.dtype)
+    grown[:, :capacity] = array
+    return grown
+
+
+@total_ordering
+class LazySequence(ABC):
+    """Read-only sequence, which items are created on access.
+
+    It is compared with other sequences as a list of its items.
+    """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Get amount of items.
+
+        Returns:
+            Amount of items.
+        """
+
+    @abstractmethod
+    def get_item(self, index: int) -> Any:
+        """Create item by non-negative index.
+
+        Args:
+            index: index of item.
+
+        Returns:
+            Created item.
+        """
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        """Create item by index, negative indexes count from the end.
+
+        Args:
+            index: index of item or slice of items.
+
+        Returns:
+            Created item or list of created items of slice.
+
+        Raises:
+            IndexError if index is out of range.
+        """
+        if isinstance(index, slice):
+            return [
+                self.get_item(item_index)
+                for item_index in range(*index.indices(len(self)))
+            ]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Index out of range')
+        return self.get_item(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        """Create items one by one.
+
+        Yields:
+            Created items.
+        """
+        for index in range(len(self)):
+            yield self.get_item(index)
+
+    def __eq__(self, other: object) -> bool:
+        """Compare items with items of other sequence.
+
+        Args:
+            other: other sequence.
+
+        Returns:
+            True if items are equal.
+        """
+        if not isinstance(other, (LazySequence, list, tuple)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __lt__(self, other: object) -> bool:
+        """Compare items with items of other sequence lexicographically.
+
+        Args:
+            other: other sequence.
+
+        Returns:
+            True if items are less.
+        """
+        if not isinstance(other, (LazySequence, list, tuple)):
+            return NotImplemented
+        return list(self) < list(other)
+
+    def __repr__(self) -> str:
+        """Show items as list.
+
+        Returns:
+            Representation of list of items.
+        """
+        return repr(list(self))
+
+
+class PathView(LazySequence):
+    """Paths between towers created from links of tower store."""
+
+    def __init__(self, store: 'TowerStore') -> None:
+        """Initialize class PathView.
+
+        Args:
+            store: store of towers and links.
+        """
+        self.store = store
+
+    def __len__(self) -> int:
+        """Get amount of paths.
+
+        Returns:
+            Amount of links.
+        """
+        return self.store.links_amount
+
+    def get_item(self, index: int) -> Path:
+        """Create path by index.
+
+        Args:
+            index: index of link.
+
+        Returns:
+            Path between positions of linked towers.
+        """
+        first, second = self.store.get_links()[:, index].tolist()
+        return Path(
+            self.store.get_position(first),
+            self.store.get_position(second),
+        )
+
+    def __iter__(self) -> Iterator[Path]:
+        """Create paths in order of links.
+
+        Yields:
+            Paths between positions of linked towers.
+        """
+        firsts, seconds = self.store.get_links()
+        xs, ys = self.store.xs, self.store.ys
+        for x1, y1, x2, y2 in zip(
+            xs[firsts].tolist(),
+            ys[firsts].tolist(),
+            xs[seconds].tolist(),
+            ys[seconds].tolist(),
+        ):
+            yield Path(Position(x1, y1), Position(x2, y2))
+
+
+class TowerStore(LazySequence):
+    """Struct-of-arrays storage of towers and links between them.
+
+    Towers are kept as columns of coordinates and ranges, covered areas
+    are implicit in the footprint, and links are kept as pairs of tower
+    indexes with the lazily built compressed sparse rows of neighbors.
+    Tower objects are created only on access.
+    """
+
+    def __init__(
+        self,
+        get_area: Area,
+        xs: Optional[ndarray] = None,
+        ys: Optional[ndarray] = None,
+        ranges: Optional[ndarray] = None,
+    ) -> None:
+        """Initialize class TowerStore.
+
+        Args:
+            get_area: function getting covered area of tower by position
+                and range.
+            xs: x coordinates of towers, no towers if not specified.
+            ys: y coordinates of towers.
+            ranges: ranges of towers.
+        """
+        self.get_area = get_area
+        if xs is None or ys is None or ranges is None:
+            self.towers = zeros((3, 0), int32)
+        else:
+            self.towers = stack([xs, ys, ranges]).astype(int32)
+        self.size = self.towers.shape[1]
+        self.links = zeros((2, 0), int32)
+        self.links_amount = 0
+        self._neighbors: Optional[Tuple[ndarray, ndarray]] = None
+
+    @property
+    def xs(self) -> ndarray:
+        """X coordinates of towers."""
+        size = self.size
+        return self.towers[0, :size]
+
+    @property
+    def ys(self) -> ndarray:
+        """Y coordinates of towers."""
+        size = self.size
+        return self.towers[1, :size]
+
+    @property
+    def ranges(self) -> ndarray:
+        """Ranges of towers."""
+        size = self.size
+        return self.towers[2, :size]
+
+    @property
+    def paths(self) -> PathView:
+        """Paths between linked towers."""
+        return PathView(self)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of arrays in bytes."""
+        neighbors = self._neighbors or ()
+        return (
+            self.towers.nbytes
+            + self.links.nbytes
+            + sum(array.nbytes for array in neighbors)
+        )
+
+    def __len__(self) -> int:
+        """Get amount of towers.
+
+        Returns:
+            Amount of towers.
+        """
+        return self.size
+
+    def get_columns(self) -> ndarray:
+        """Get towers as columns of coordinates and range.
+
+        Returns:
+            View of columns of towers.
+        """
+        size = self.size
+        return self.towers[:, :size]
+
+    def get_position(self, index: int) -> Position:
+        """Get position of tower.
+
+        Args:
+            index: index of tower.
+
+        Returns:
+            Position of tower.
+        """
+        return Position(int(self.towers[0, index]), int(self.towers[1, index]))
+
+    def get_item(self, index: int) -> Tower:
+        """Create tower by index.
+
+        Args:
+            index: index of tower.
+
+        Returns:
+            Tower with covered area and connections.
+        """
+        position = self.get_position(index)
+        tower_range = int(self.towers[2, index])
+        return Tower(
+            position,
+            tower_range,
+            self.get_area(position, tower_range),
+            self.get_connections(index),
+        )
+
+    def __contains__(self, tower: object) -> bool:
+        """Check that tower is in the store.
+
+        Args:
+            tower: tower to find.
+
+        Returns:
+            True if the store has the same tower.
+        """
+        if not isinstance(tower, Tower):
+            return False
+        found = flatnonzero(
+            (self.xs == tower.position.x) & (self.ys == tower.position.y),
+        )
+        return bool(len(found)) and self.get_item(int(found[0])) == tower
+
+    def get_arrays(self) -> Tuple[ndarray, ndarray, ndarray]:
+        """Get copies of towers coordinates and ranges.
+
+        Returns:
+            Arrays of x coordinates, y coordinates and ranges.
+        """
+        size = self.size
+        xs, ys, ranges = self.towers[:, :size].astype(int64)
+        return xs, ys, ranges
+
+    def get_positions(self) -> Set[Position]:
+        """Get positions of all towers.
+
+        Returns:
+            Set of positions.
+        """
+        return set(
+            map(Position._make, zip(self.xs.tolist(), self.ys.tolist())),
+        )
+
+    def find(self, position: Position) -> int:
+        """Find tower by its position.
+
+        Args:
+            position: position of tower.
+
+        Returns:
+            Index of tower.
+
+        Raises:
+            Exception if tower was not found.
+        """
+        found = flatnonzero((self.xs == position.x) & (self.ys == position.y))
+        if not len(found):
+            raise Exception('Tower not found in this position')
+        return int(found[0])
+
+    def append(self, position: Position, tower_range: int) -> None:
+        """Add tower without links.
+
+        Args:
+            position: position of tower.
+            tower_range: range of tower.
+        """
+        self.towers = reserve(self.towers, self.size + 1)
+        self.towers[:, self.size] = (*position, tower_range)
+        self.size += 1
+        self._neighbors = None
+
+    def pop(self) -> None:
+        """Remove the last tower with its links."""
+        self.delete(self.size - 1)
+
+    def delete(self, index: int) -> RemovedTower:
+        """Remove tower with its links.
+
+        Args:
+            index: index of tower.
+
+        Returns:
+            Data to insert the tower back: its column, indexes of its links
+            and links.
+        """
+        links = self.get_links()
+        removed = flatnonzero((links == index).any(axis=0))
+        removed_links = links[:, removed].copy()
+        links = delete(links, removed, axis=1)
+        links -= links > index
+        self.links_amount = amount = links.shape[1]
+        self.links[:, :amount] = links
+        tower = self.towers[:, index].copy()
+        size = self.size - 1
+        self.towers[:, :size] = delete(self.get_columns(), index, axis=1)
+        self.size = size
+        self._neighbors = None
+        return tower, removed, removed_links
+
+    def insert(self, index: int, removed: RemovedTower) -> None:
+        """Insert removed tower with its links back.
+
+        Args:
+            index: index of tower.
+            removed: data returned by delete.
+        """
+        tower, removed_indexes, removed_links = removed
+        columns = insert(self.get_columns(), index, tower, axis=1)
+        self.size += 1
+        self.towers = reserve(self.towers, self.size)
+        size = self.size
+        self.towers[:, :size] = columns
+        links = self.get_links()
+        links += links >= index
+        links = insert(
+            links,
+            removed_indexes - arange(len(removed_indexes)),
+            removed_links,
+            axis=1,
+        )
+        self.links_amount = 0
+        self.add_links(*links)
+
+    def get_links(self) -> ndarray:
+        """Get linked towers.
+
+        Returns:
+            View of indexes of first and second towers of links.
+        """
+        amount = self.links_amount
+        return self.links[:, :amount]
+
+    def add_links(self, firsts: ndarray, seconds: ndarray) -> None:
+        """Link towers.
+
+        Args:
+            firsts: indexes of first towers.
+            seconds: indexes of second towers.
+        """
+        start = self.links_amount
+        amount = start + len(firsts)
+        self.links = reserve(self.links, amount)
+        self.links[0, start:amount] = firsts
+        self.links[1, start:amount] = seconds
+        self.links_amount = amount
+        self._neighbors = None
+
+    def truncate_links(self, amount: int) -> None:
+        """Remove the last links.
+
+        Args:
+            amount: amount of links to keep.
+        """
+        self.links_amount = amount
+        self._neighbors = None
+
+    def get_neighbors(self) -> Tuple[ndarray, ndarray]:
+        """Get linked towers of every tower as compressed sparse rows.
+
+        Neighbors of every tower are in order of links.
+
+        Returns:
+            Start of neighbors of every tower with the total amount at
+            the end, and indexes of neighbors.
+        """
+        if self._neighbors is None:
+            firsts, seconds = self.get_links()
+            ends = concatenate([firsts, seconds])
+            order = lexsort((concatenate([arange(len(firsts))] * 2), ends))
+            starts = zeros(self.size + 1, int64)
+            cumsum(bincount(ends, minlength=self.size), out=starts[1:])
+            self._neighbors = (
+                starts,
+                concatenate([seconds, firsts])[order].astype(int32),
+            )
+        return self._neighbors
+
+    def get_degrees(self) -> ndarray:
+        """Get amounts of links of towers.
+
+        Returns:
+            Degree of every tower.
+        """
+        return diff(self.get_neighbors()[0])
+
+    def get_connections(self, index: int) -> List[Position]:
+        """Get positions of towers linked with tower.
+
+        Args:
+            index: index of tower.
+
+        Returns:
+            Positions in order of links.
+        """
+        starts, neighbors = self.get_neighbors()
+        start, end = starts[index], starts[index + 1]
+        indexes = neighbors[start:end]
+        return list(
+            map(
+                Position._make,
+                zip(self.xs[indexes].tolist(), self.ys[indexes].tolist()),
+            ),
+        )
@@ -1,14 +1,68 @@
+import json
+from asyncio import new_event_loop, run_coroutine_threadsafe
+from http.client import IncompleteRead
+from itertools import combinations
+from math import ceil, sqrt
+from os import path
+from pathlib import Path as FilePath
+from random import getstate, sample
+from socket import SHUT_WR, create_connection
+from tempfile import TemporaryDirectory
+from threading import Thread
+from typing import Any, Callable, List, Set, Tuple
 from unittest import TestCase, main
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
 
+from matplotlib import pyplot
+from numpy import (
+    arange,
+    array,
+    full,
+    ones,
+    random,
+    save,
+    savetxt,
+    savez,
+    uint8,
+    zeros,
+)
+from PIL import Image
+
+from batch import cover_batch
+from cache import ResultCache, get_result_key
 from classes import CityGrid
 from constants import (
     DEFAULT_OBSTRUCTED_PERCENTAGE,
+    DEFAULT_REGION_SIZE,
+    FOOTPRINTS,
+    GRID_VALUES_AMOUNT,
+    SERVICE_HOST,
+    TEST_CACHE_SIZE,
+    TEST_CELL_SIZE,
     TEST_HEIGHT,
     TEST_PERCENTAGE,
     TEST_RANGE,
+    TEST_TOWER_BYTES,
     TEST_TOWERS_AMOUNT,
     TEST_WIDTH,
+    TEST_WORKERS,
 )
+from exporters import export_coverage, export_links, export_towers
+from hierarchy import build_pyramid, get_tiling_positions
+from kernels import (
+    accumulate_footprints,
+    correlate_directly,
+    correlate_many,
+    correlate_with_fft,
+    create_footprint,
+)
+from loaders import load_obstruction_mask
+from objects import Path, Position, TowerType
+from placement import BACKENDS
+from service import CoverageService, cover_city, parse_spec
+from store import TowerStore
+from utils import additionally_optimize_place_for_tower, find_place_for_tower
 
 
 class TestCityGridAttributes(TestCase):
@@ -179,5 +233,1184 @@ class TestCityGridMethods(TestCase):
         self.check_attributes(city)
 
 
+class TestIncrementalCoverage(TestCase):
+    """Class for incremental covering testing."""
+
+    def setUp(self) -> None:
+        """Create data for testing."""
+        self.city = CityGrid(TEST_WIDTH, TEST_HEIGHT)
+        self.city.cover_with_towers(TEST_RANGE)
+
+    def check_coverage(self) -> None:
+        """Check that the city is covered and coverage is consistent."""
+        city = self.city
+        self.assertEqual(city.uncovered_blocks, set(), 'Uncovered blocks left')
+        for tower in city.towers:
+            self.assertNotIn(
+                tower.position,
+                city.obstructed_blocks,
+                'Tower placed on obstructed block',
+            )
+        covered_blocks: Set[Position] = set()
+        over_covered_blocks: Set[Position] = set()
+        for tower in city.towers:
+            over_covered_blocks |= covered_blocks & tower.covered
+            covered_blocks |= tower.covered
+        self.assertEqual(
+            city.over_covered_blocks,
+            over_covered_blocks & city.clear_blocks,
+            'Over covered blocks do not match towers',
+        )
+        self.assertEqual(
+            city.covered_blocks,
+            (covered_blocks - over_covered_blocks) & city.clear_blocks,
+            'Covered blocks do not match towers',
+        )
+
+    def test_obstruct_rectangle(self) -> None:
+        """Test obstructing rectangle with towers."""
+        towers = list(self.city.towers)
+        right_top = Position(TEST_HEIGHT // 2, TEST_WIDTH // 2)
+        self.city.obstruct_rectangle(Position(0, 0), right_top, TEST_RANGE)
+        self.check_coverage()
+        for tower in towers:
+            if (
+                tower.position.x > right_top.x
+                or tower.position.y > right_top.y
+            ):
+                self.assertIn(tower, self.city.towers, 'Tower removed')
+        self.city.clear_rectangle(Position(0, 0), right_top, TEST_RANGE)
+        self.check_coverage()
+        self.city.obstruct_rectangle(
+            Position(-TEST_RANGE, -TEST_RANGE),
+            Position(TEST_HEIGHT, 0),
+        )
+        self.assertTrue(self.city.obstructions[:, 0].all())
+        grid = self.city.grid.copy()
+        for positions in [[Position(-1, -1)], [Position(0, TEST_WIDTH)]]:
+            with self.assertRaises(Exception):
+                self.city.obstruct_blocks(positions)
+            with self.assertRaises(Exception):
+                self.city.clear_obstructions(positions)
+        self.assertTrue((self.city.grid == grid).all(), 'Grid changed')
+
+    def test_incremental_change_obstructed(self) -> None:
+        """Test changing obstructed percentage keeping towers."""
+        towers = self.city.towers
+        self.city.change_obstructed(TEST_PERCENTAGE, TEST_RANGE)
+        self.assertGreaterEqual(
+            self.city.percentage,
+            TEST_PERCENTAGE,
+            'Real percentage is less than specified',
+        )
+        self.assertIs(self.city.towers, towers, 'Towers were recreated')
+        self.check_coverage()
+        self.city.change_obstructed(DEFAULT_OBSTRUCTED_PERCENTAGE, TEST_RANGE)
+        self.check_coverage()
+
+
+class TestFailureImpact(TestCase):
+    """Class for towers failure impact testing."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Create data for testing."""
+        super().setUpClass()
+        cls.city = CityGrid(  # type: ignore[attr-defined]
+            TEST_WIDTH,
+            TEST_HEIGHT,
+        )
+        cls.city.cover_with_towers(TEST_RANGE)  # type: ignore[attr-defined]
+
+    def get_uncovered_amount(self, positions: Tuple[Position, ...]) -> int:
+        """Count blocks uncovered after removing towers."""
+        city = TestFailureImpact.city  # type: ignore[attr-defined]
+        with city.fork():
+            for position in positions:
+                city.remove_tower(position)
+            return len(city.uncovered_blocks - set(positions))
+
+    def test_failure_impact(self) -> None:
+        """Test counting blocks covered only by every tower."""
+        city = TestFailureImpact.city  # type: ignore[attr-defined]
+        for tower, impact in zip(city.towers, city.get_failure_impact()):
+            self.assertEqual(
+                impact,
+                self.get_uncovered_amount((tower.position,)),
+                'Failure impact calculated incorrectly',
+            )
+
+    def test_worst_failures(self) -> None:
+        """Test finding worst failures of groups of towers."""
+        city = TestFailureImpact.city  # type: ignore[attr-defined]
+        for size in (1, 2, 3):
+            worst_failures = city.get_worst_failures(size, TEST_TOWERS_AMOUNT)
+            self.assertLessEqual(
+                len(worst_failures),
+                TEST_TOWERS_AMOUNT,
+                'Too many failures found',
+            )
+            impacts = [impact for _, impact in worst_failures]
+            self.assertEqual(
+                impacts,
+                sorted(impacts, reverse=True),
+                'Failures are not sorted by impact',
+            )
+            for positions, impact in worst_failures:
+                self.assertEqual(len(positions), size, 'Wrong group size')
+                self.assertEqual(
+                    impact,
+                    self.get_uncovered_amount(positions),
+                    'Group failure impact calculated incorrectly',
+                )
+
+
+class TestDistanceField(TestCase):
+    """Class for distance field testing."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Create data for testing."""
+        super().setUpClass()
+        cls.city = CityGrid(  # type: ignore[attr-defined]
+            TEST_WIDTH,
+            TEST_HEIGHT,
+        )
+        cls.city.cover_with_towers(TEST_RANGE)  # type: ignore[attr-defined]
+
+    def test_distances(self) -> None:
+        """Test distances to the closest towers."""
+        city = TestDistanceField.city  # type: ignore[attr-defined]
+        chebyshev = city.get_distance_field('chebyshev')
+        euclidean = city.get_distance_field('euclidean')
+        for block in list(city.clear_blocks)[:TEST_WIDTH]:
+            self.assertEqual(
+                chebyshev[block],
+                min(
+                    max(
+                        abs(block.x - tower.position.x),
+                        abs(block.y - tower.position.y),
+                    )
+                    for tower in city.towers
+                ),
+                'Chebyshev distance calculated incorrectly',
+            )
+            self.assertAlmostEqual(
+                euclidean[block],
+                min(
+                    sqrt(
+                        (block.x - tower.position.x) ** 2
+                        + (block.y - tower.position.y) ** 2,
+                    )
+                    for tower in city.towers
+                ),
+                msg='Euclidean distance calculated incorrectly',
+            )
+        for tower in city.towers:
+            self.assertEqual(euclidean[tower.position], 0, 'Tower not at 0')
+        with self.assertRaises(Exception):
+            city.get_distance_field('manhattan')
+
+    def test_distance_statistics(self) -> None:
+        """Test statistics of distances of covered city."""
+        city = TestDistanceField.city  # type: ignore[attr-defined]
+        statistics = city.get_distance_statistics()
+        self.assertLessEqual(
+            statistics['max'],
+            TEST_RANGE,
+            'Covered block is farther than tower range',
+        )
+        self.assertLessEqual(
+            statistics['p50'],
+            statistics['p99'],
+            'Percentiles are not ordered',
+        )
+
+
+class TestCheckpoints(TestCase):
+    """Class for CityGrid checkpoints testing."""
+
+    def setUp(self) -> None:
+        """Create data for testing."""
+        self.city = CityGrid(TEST_WIDTH, TEST_HEIGHT)
+        self.city.cover_with_towers(TEST_RANGE)
+
+    def get_state(self) -> Tuple[Any, ...]:
+        """Get copy of CityGrid state."""
+        return (
+            self.city.grid.tolist(),
+            self.city.clear_blocks.copy(),
+            self.city.uncovered_blocks.copy(),
+            self.city.covered_blocks.copy(),
+            self.city.over_covered_blocks.copy(),
+            self.city.obstructed_blocks.copy(),
+            self.city.obstructed_covered_blocks.copy(),
+            list(self.city.towers),
+            list(self.city.paths),
+            self.city.percentage,
+        )
+
+    def test_rollback(self) -> None:
+        """Test rolling back changes to checkpoints."""
+        state = self.get_state()
+        checkpoint = self.city.checkpoint()
+        self.city.change_obstructed(TEST_PERCENTAGE)
+        self.city.cover_with_towers(TEST_RANGE)
+        changed_state = self.get_state()
+        self.city.checkpoint()
+        self.city.clear_city()
+        self.city.rollback()
+        self.assertEqual(
+            self.get_state(),
+            changed_state,
+            'Nested checkpoint rolled back incorrectly',
+        )
+        self.city.rollback(checkpoint)
+        self.assertEqual(self.get_state(), state, 'Changes not rolled back')
+        with self.assertRaises(Exception):
+            self.city.rollback()
+
+    def test_fork(self) -> None:
+        """Test what-if changes in fork."""
+        state = self.get_state()
+        with self.city.fork() as city:
+            city.place_tower(next(iter(city.clear_blocks)), TEST_RANGE)
+            city.create_paths()
+            pyplot.close('all')
+        with self.city.fork() as city:
+            city.change_obstructed(DEFAULT_OBSTRUCTED_PERCENTAGE / 2)
+            city.cover_with_towers(TEST_RANGE)
+        self.assertEqual(self.get_state(), state, 'Fork changed the city')
+
+    def test_commit_in_fork(self) -> None:
+        """Test committing inside fork does not break its rollback."""
+        state = self.get_state()
+        with self.assertRaisesRegex(Exception, 'active fork'):
+            with self.city.fork() as city:
+                city.change_obstructed(DEFAULT_OBSTRUCTED_PERCENTAGE, 2)
+                city.commit()
+        self.assertEqual(self.get_state(), state, 'Fork changed the city')
+        with self.city.fork() as city:
+            city.checkpoint()
+            city.change_obstructed(DEFAULT_OBSTRUCTED_PERCENTAGE, 2)
+            city.commit()
+            with self.assertRaises(Exception):
+                city.rollback()
+        self.assertEqual(self.get_state(), state, 'Fork changed the city')
+
+    def test_commit(self) -> None:
+        """Test keeping changes made after checkpoint."""
+        self.city.checkpoint()
+        self.city.clear_city()
+        self.city.commit()
+        self.assertEqual(self.city.towers, [], 'Committed changes lost')
+        with self.assertRaises(Exception):
+            self.city.rollback()
+
+
+class TestObstructionLoading(TestCase):
+    """Class for obstruction maps loading testing."""
+
+    def setUp(self) -> None:
+        """Create data for testing."""
+        self.directory = TemporaryDirectory()
+        self.mask = (
+            random.default_rng().random((TEST_HEIGHT, TEST_WIDTH + 1))
+            < TEST_PERCENTAGE / 100
+        )
+
+    def tearDown(self) -> None:
+        """Remove created files."""
+        self.directory.cleanup()
+
+    def get_file_name(self, name: str) -> str:
+        """Get path to file in temporary directory."""
+        return path.join(self.directory.name, name)
+
+    def test_load_files(self) -> None:
+        """Test loading obstruction maps of all formats."""
+        file_names = [
+            self.get_file_name(name)
+            for name in ('map.npy', 'map.csv', 'map.png')
+        ]
+        save(file_names[0], self.mask)
+        savetxt(file_names[1], self.mask, fmt='%d', delimiter=',')
+        pyplot.imsave(file_names[2], self.mask, cmap='gray')
+        for file_name in file_names:
+            city = CityGrid.from_file(file_name, chunk_rows=TEST_RANGE)
+            self.assertEqual(
+                (city.n, city.m),
+                self.mask.shape,
+                f'{file_name} loaded with wrong shape',
+            )
+            self.assertEqual(
+                len(city.obstructed_blocks),
+                self.mask.sum(),
+                f'{file_name} loaded incorrectly',
+            )
+            self.assertEqual(
+                city.uncovered_blocks,
+                city.clear_blocks,
+                'Uncovered blocks are not equal clear blocks after loading',
+            )
+            self.assertTrue(
+                (city.grid[self.mask] == 1).all(),
+                'Grid does not match loaded obstructions',
+            )
+
+    def test_colored_png(self) -> None:
+        """Test loading colored and palette PNG images."""
+        colors = zeros((2, 3), uint8)
+        colors[1, 2] = 255
+        pixels = self.mask.astype(uint8)
+        images = {
+            'map.png': Image.fromarray(colors[pixels]),
+            'palette.png': Image.fromarray(pixels, 'P'),
+        }
+        images['palette.png'].putpalette(colors.ravel().tolist())
+        for name, image in images.items():
+            file_name = self.get_file_name(name)
+            image.save(file_name)
+            self.assertTrue(
+                (
+                    load_obstruction_mask(file_name, chunk_rows=TEST_RANGE)
+                    == self.mask
+                ).all(),
+                f'{name} loaded incorrectly',
+            )
+
+    def test_downsampling(self) -> None:
+        """Test downsampling obstruction map to blocks."""
+        file_name = self.get_file_name('map.npy')
+        save(file_name, self.mask)
+        city = CityGrid.from_file(
+            file_name,
+            cell_size=TEST_CELL_SIZE,
+            obstructed_share=1,
+            chunk_rows=TEST_RANGE,
+        )
+        self.assertEqual(
+            (city.n, city.m),
+            (
+                -(-self.mask.shape[0] // TEST_CELL_SIZE),
+                -(-self.mask.shape[1] // TEST_CELL_SIZE),
+            ),
+            'Downsampled grid has wrong shape',
+        )
+        for position in city.obstructed_blocks:
+            x = position.x * TEST_CELL_SIZE
+            y = position.y * TEST_CELL_SIZE
+            block = self.mask[x:, y:][:TEST_CELL_SIZE, :TEST_CELL_SIZE]
+            self.assertTrue(block.all(), 'Partially clear block obstructed')
+
+    def test_preallocated_mask(self) -> None:
+        """Test text maps are written into the preallocated mask."""
+        file_names = [
+            self.get_file_name(name) for name in ('map.npy', 'map.asc')
+        ]
+        save(file_names[0], self.mask)
+        savetxt(
+            file_names[1],
+            self.mask,
+            fmt='%d',
+            header=f'ncols {self.mask.shape[1]}\nnrows {self.mask.shape[0]}',
+            comments='',
+        )
+        masks = [
+            load_obstruction_mask(
+                file_name,
+                cell_size=TEST_CELL_SIZE,
+                chunk_rows=TEST_RANGE,
+            )
+            for file_name in file_names
+        ]
+        self.assertTrue(
+            (masks[0] == masks[1]).all(),
+            'ASCII grid loaded differently from array',
+        )
+        with open(file_names[1], 'a') as file:
+            file.write('1\n')
+        with self.assertRaises(Exception):
+            load_obstruction_mask(file_names[1], chunk_rows=TEST_RANGE)
+
+
+class TestExport(TestCase):
+    """Class for results export testing."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Create data for testing."""
+        super().setUpClass()
+        cls.city = CityGrid(  # type: ignore[attr-defined]
+            TEST_WIDTH,
+            TEST_HEIGHT,
+        )
+        cls.city.cover_with_towers(TEST_RANGE)  # type: ignore[attr-defined]
+        cls.city.create_paths()  # type: ignore[attr-defined]
+        pyplot.close('all')
+
+    def setUp(self) -> None:
+        """Create directory for exported files."""
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """Remove exported files."""
+        self.directory.cleanup()
+
+    def test_export_formats(self) -> None:
+        """Test exporting towers, links and coverage to all formats."""
+        city = TestExport.city  # type: ignore[attr-defined]
+        regions_amount = ceil(city.n / DEFAULT_REGION_SIZE) * ceil(
+            city.m / DEFAULT_REGION_SIZE,
+        )
+        exports: List[Tuple[Callable[..., None], Any, int]] = [
+            (export_towers, city.towers, len(city.towers)),
+            (export_links, city.paths, len(city.paths)),
+            (export_coverage, city.grid, regions_amount),
+        ]
+        for exporter, data, amount in exports:
+            for suffix in ('csv', 'jsonl', 'geojson'):
+                file_name = path.join(self.directory.name, f'data.{suffix}')
+                exporter(data, file_name, batch_size=TEST_TOWERS_AMOUNT)
+                with open(file_name) as file:
+                    if suffix == 'geojson':
+                        exported = len(json.load(file)['features'])
+                    else:
+                        exported = len(file.readlines()) - (suffix == 'csv')
+                self.assertEqual(
+                    exported,
+                    amount,
+                    f'{exporter.__name__} exported wrong rows to {suffix}',
+                )
+
+    def test_export_values(self) -> None:
+        """Test exported towers and coverage values."""
+        city = TestExport.city  # type: ignore[attr-defined]
+        file_name = path.join(self.directory.name, 'towers.jsonl')
+        export_towers(city.towers, file_name)
+        with open(file_name) as file:
+            rows = [json.loads(line) for line in file]
+        for row, tower in zip(rows, city.towers):
+            self.assertEqual(
+                (row['x'], row['y'], row['range'], row['degree']),
+                (*tower.position, tower.range, len(tower.connections)),
+                'Tower exported incorrectly',
+            )
+        file_name = path.join(self.directory.name, 'coverage.jsonl')
+        export_coverage(city.grid, file_name, city.n)
+        with open(file_name) as file:
+            row = json.loads(file.readline())
+        self.assertEqual(
+            row['tower'],
+            len(city.towers),
+            'Towers amount in region exported incorrectly',
+        )
+        self.assertEqual(
+            row['covered_percentage'],
+            100.0,
+            'Covered city exported as not fully covered',
+        )
+
+
+class TestFootprints(TestCase):
+    """Class for footprint kernels and greedy covering testing."""
+
+    def test_correlation(self) -> None:
+        """Test direct and FFT correlation give the same counts."""
+        mask = random.random((TEST_HEIGHT, TEST_WIDTH)) < 0.5
+        for footprint in FOOTPRINTS:
+            kernel = create_footprint(footprint, TEST_RANGE)
+            self.assertTrue(
+                (
+                    correlate_directly(mask, kernel)
+                    == correlate_with_fft(mask, kernel)
+                ).all(),
+                f'Correlations differ for {footprint} footprint',
+            )
+
+    def test_greedy_covering(self) -> None:
+        """Test covering the city greedily with every footprint."""
+        for footprint in FOOTPRINTS:
+            city = CityGrid(TEST_WIDTH, TEST_HEIGHT)
+            city.cover_with_towers(
+                TEST_RANGE,
+                strategy='greedy',
+                footprint=footprint,
+            )
+            self.assertEqual(
+                city.uncovered_blocks,
+                set(),
+                f'Uncovered blocks left with {footprint} footprint',
+            )
+            kernel = create_footprint(footprint, TEST_RANGE)
+            coverage = zeros((TEST_HEIGHT, TEST_WIDTH), int)
+            for tower in city.towers:
+                if (
+                    TEST_RANGE <= tower.position.x < TEST_HEIGHT - TEST_RANGE
+                    and TEST_RANGE
+                    <= tower.position.y
+                    < TEST_WIDTH - TEST_RANGE
+                ):
+                    self.assertEqual(
+                        len(tower.covered) + 1,
+                        kernel.sum(),
+                        'Tower covers area of wrong shape',
+                    )
+                for block in tower.covered:
+                    if block.x < TEST_HEIGHT and block.y < TEST_WIDTH:
+                        coverage[block] += 1
+            self.assertTrue(
+                (coverage == city.coverage).all(),
+                f'Coverage does not match {footprint} footprints',
+            )
+
+    def test_sweep_footprint(self) -> None:
+        """Test sweep strategy supports only square footprints."""
+        city = CityGrid(TEST_WIDTH, TEST_HEIGHT)
+        with self.assertRaises(Exception):
+            city.cover_with_towers(TEST_RANGE, footprint='circle')
+        city.cover_with_towers(
+            TEST_RANGE,
+            strategy='greedy',
+            footprint='circle',
+        )
+        towers = list(city.towers)
+        with self.assertRaises(Exception):
+            city.cover_with_towers(TEST_RANGE)
+        self.assertEqual(list(city.towers), towers, 'Towers are removed')
+        city.obstruct_blocks([tower.position for tower in towers], TEST_RANGE)
+        self.assertEqual(city.footprint, 'circle', 'Footprint changed')
+        self.assertEqual(city.uncovered_blocks, set(), 'City is not covered')
+
+
+class TestCatalogue(TestCase):
+    """Class for covering with catalogue of tower types testing."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Create data for testing."""
+        super().setUpClass()
+        cls.catalogue = [  # type: ignore[attr-defined]
+            TowerType('small', TEST_RANGE // 2, 1),
+            TowerType('medium', TEST_RANGE, 3),
+            TowerType('expensive', TEST_RANGE, 4),
+            TowerType('large', 2 * TEST_RANGE, 10),
+        ]
+        cls.city = CityGrid(  # type: ignore[attr-defined]
+            TEST_WIDTH,
+            TEST_HEIGHT,
+        )
+        cls.cost = cls.city.cover_with_catalogue(  # type: ignore[attr-defined]
+            cls.catalogue,  # type: ignore[attr-defined]
+        )
+
+    def test_catalogue_covering(self) -> None:
+        """Test covering the city with the cheapest tower types."""
+        city = TestCatalogue.city  # type: ignore[attr-defined]
+        self.assertEqual(city.uncovered_blocks, set(), 'Uncovered blocks left')
+        costs = {
+            tower_type.range: tower_type.cost
+            for tower_type in reversed(
+                TestCatalogue.catalogue,  # type: ignore[attr-defined]
+            )
+        }
+        self.assertEqual(
+            sum(costs[tower.range] for tower in city.towers),
+            TestCatalogue.cost,  # type: ignore[attr-defined]
+            'Total cost calculated incorrectly',
+        )
+
+    def test_threads(self) -> None:
+        """Test covering does not depend on amount of threads."""
+        city = TestCatalogue.city  # type: ignore[attr-defined]
+        catalogue = TestCatalogue.catalogue  # type: ignore[attr-defined]
+        towers = [(tower.position, tower.range) for tower in city.towers]
+        with city.fork():
+            for workers in (1, TEST_WORKERS):
+                self.assertEqual(
+                    city.cover_with_catalogue(catalogue, workers=workers),
+                    TestCatalogue.cost,  # type: ignore[attr-defined]
+                    'Total cost depends on amount of threads',
+                )
+                self.assertEqual(
+                    [(tower.position, tower.range) for tower in city.towers],
+                    towers,
+                    'Towers depend on amount of threads',
+                )
+        mask = random.random((TEST_HEIGHT, TEST_WIDTH)) < 0.5
+        kernels = [
+            create_footprint(footprint, TEST_RANGE) for footprint in FOOTPRINTS
+        ]
+        for whole, striped in zip(
+            correlate_many(mask, kernels),
+            correlate_many(mask, kernels, TEST_WORKERS),
+        ):
+            self.assertTrue(
+                (whole == striped).all(),
+                'Stripes counted incorrectly',
+            )
+
+    def test_mixed_paths(self) -> None:
+        """Test paths between towers of different ranges."""
+        city = TestCatalogue.city  # type: ignore[attr-defined]
+        city.create_paths()
+        pyplot.close('all')
+        paths = set(city.paths)
+        for tower1, tower2 in combinations(city.towers, 2):
+            distance = tower1.range + tower2.range + 1
+            self.assertEqual(
+                Path(tower1.position, tower2.position) in paths,
+                abs(tower1.position.x - tower2.position.x) <= distance
+                and abs(tower1.position.y - tower2.position.y) <= distance,
+                'Paths do not match tower ranges',
+            )
+
+
+class TestBackends(TestCase):
+    """Class for array kernels backends testing."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Create data for testing."""
+        super().setUpClass()
+        cls.city = CityGrid(  # type: ignore[attr-defined]
+            TEST_WIDTH,
+            TEST_HEIGHT,
+        )
+        for position in sample(
+            sorted(cls.city.clear_blocks),  # type: ignore[attr-defined]
+            TEST_TOWERS_AMOUNT,
+        ):
+            cls.city.place_tower(  # type: ignore[attr-defined]
+                position,
+                TEST_RANGE,
+            )
+
+    def test_placement(self) -> None:
+        """Test backends place towers as set based functions."""
+        city = TestBackends.city  # type: ignore[attr-defined]
+        closest = min(
+            city.uncovered_blocks,
+            key=lambda position: (position.x + position.y, position.x),
+        )
+        place = find_place_for_tower(
+            TEST_RANGE,
+            closest,
+            city.clear_blocks,
+            city.uncovered_blocks,
+            city.covered_blocks,
+            city.n,
+            city.m,
+        )
+        starts = [place, *sample(sorted(city.clear_blocks), TEST_RANGE)]
+        for name, backend in BACKENDS.items():
+            self.assertEqual(
+                backend.find_closest_uncovered(city.grid, 0)[:2],
+                tuple(closest),
+                f'Closest block found incorrectly by {name}',
+            )
+            self.assertEqual(
+                backend.find_place(city.grid, *closest, TEST_RANGE),
+                tuple(place),
+                f'Place found incorrectly by {name}',
+            )
+            for start in starts:
+                self.assertEqual(
+                    backend.optimize_place(city.grid, *start, TEST_RANGE),
+                    tuple(
+                        additionally_optimize_place_for_tower(
+                            start,
+                            city.uncovered_blocks,
+                            city.clear_blocks,
+                            TEST_RANGE,
+                            city.n,
+                            city.m,
+                        ),
+                    ),
+                    f'Place optimized incorrectly by {name}',
+                )
+
+    def test_sweep_covering(self) -> None:
+        """Test backends cover the city with the same towers."""
+        city = CityGrid(TEST_WIDTH, TEST_HEIGHT)
+        towers = {}
+        for name in BACKENDS:
+            city.cover_with_towers(TEST_RANGE, backend=name)
+            towers[name] = [tower.position for tower in city.towers]
+            self.assertEqual(
+                city.uncovered_blocks,
+                set(),
+                f'Uncovered blocks left by {name}',
+            )
+        self.assertEqual(
+            len(set(map(tuple, towers.values()))),
+            1,
+            'Backends placed different towers',
+        )
+
+
+class TestBatch(TestCase):
+    """Class for batched covering testing."""
+
+    def test_cover_batch(self) -> None:
+        """Test batch covering places the same towers as CityGrid."""
+        masks = random.random((TEST_WORKERS, TEST_HEIGHT, TEST_WIDTH)) < 0.5
+        masks[-1] = True
+        for footprint in FOOTPRINTS:
+            for mask, positions in zip(
+                masks,
+                cover_batch(masks, TEST_RANGE, footprint),
+            ):
+                city = CityGrid(TEST_HEIGHT, TEST_WIDTH, mask)
+                city.cover_with_towers(
+                    TEST_RANGE,
+                    strategy='greedy',
+                    footprint=footprint,
+                )
+                self.assertEqual(
+                    positions.tolist(),
+                    [list(tower.position) for tower in city.towers],
+                    f'Towers differ for {footprint} footprint',
+                )
+
+
+class TestResultCache(TestCase):
+    """Class for cached covering testing."""
+
+    def setUp(self) -> None:
+        """Create directory for stored results."""
+        self.directory = TemporaryDirectory()
+        self.city = CityGrid(TEST_HEIGHT, TEST_WIDTH)
+
+    def tearDown(self) -> None:
+        """Remove stored results."""
+        self.directory.cleanup()
+
+    def get_state(self) -> Tuple[Any, ...]:
+        """Get copy of CityGrid state."""
+        return (
+            self.city.grid.tolist(),
+            self.city.coverage.tolist(),
+            self.city.clear_blocks.copy(),
+            self.city.uncovered_blocks.copy(),
+            self.city.covered_blocks.copy(),
+            self.city.over_covered_blocks.copy(),
+            self.city.obstructed_blocks.copy(),
+            self.city.obstructed_covered_blocks.copy(),
+            list(self.city.towers),
+            list(self.city.paths),
+            self.city.footprint,
+        )
+
+    def test_restore(self) -> None:
+        """Test cached covering restores the same state."""
+        for strategy, footprint in [('sweep', 'square'), ('greedy', 'circle')]:
+            cache = ResultCache(self.directory.name)
+            self.city.cover_with_towers(
+                TEST_RANGE,
+                strategy=strategy,
+                footprint=footprint,
+                cache=cache,
+            )
+            state = self.get_state()
+            self.city.cover_with_towers(TEST_RANGE // 2, footprint='square')
+            self.city.create_paths()
+            pyplot.close('all')
+            changed_state = self.get_state()
+            for restored_cache in [cache, ResultCache(self.directory.name)]:
+                checkpoint = self.city.checkpoint()
+                self.city.cover_with_towers(
+                    TEST_RANGE,
+                    strategy=strategy,
+                    footprint=footprint,
+                    cache=restored_cache,
+                )
+                self.assertEqual(self.get_state(), state, 'State differs')
+                self.city.rollback(checkpoint)
+                self.assertEqual(
+                    self.get_state(),
+                    changed_state,
+                    'Restored covering rolled back incorrectly',
+                )
+
+    def test_eviction(self) -> None:
+        """Test results are evicted over the sizes."""
+        cache = ResultCache(
+            self.directory.name,
+            TEST_CACHE_SIZE,
+            TEST_CACHE_SIZE,
+        )
+        masks = random.random((TEST_WORKERS, TEST_HEIGHT, TEST_WIDTH)) < 0.5
+        keys = [
+            get_result_key(mask, TEST_RANGE, 'sweep', 'square')
+            for mask in masks
+        ]
+        for key, mask in zip(keys, masks):
+            city = CityGrid(TEST_HEIGHT, TEST_WIDTH, mask)
+            city.cover_with_towers(TEST_RANGE, cache=cache)
+            self.assertIsNotNone(cache.get(key), 'Result is not cached')
+        self.assertLessEqual(cache.size, TEST_CACHE_SIZE)
+        self.assertEqual(list(cache.results), keys[-1:])
+        files = list(FilePath(self.directory.name).iterdir())
+        self.assertLessEqual(
+            sum(file.stat().st_size for file in files),
+            TEST_CACHE_SIZE,
+        )
+        self.assertEqual(
+            [file.stem for file in files],
+            keys[-1:],
+            'Old results are not evicted',
+        )
+        self.assertIsNone(ResultCache().get(keys[-1]))
+        self.assertIsNotNone(ResultCache(self.directory.name).get(keys[-1]))
+
+    def test_broken_results(self) -> None:
+        """Test broken stored results are removed as not cached."""
+        cache = ResultCache(self.directory.name)
+        file_name = FilePath(self.directory.name) / 'broken.npz'
+        for content in [b'', b'PK\x03\x04broken']:
+            file_name.write_bytes(content)
+            self.assertIsNone(cache.get(file_name.stem))
+            self.assertFalse(file_name.exists(), 'Broken result is kept')
+        savez(file_name, grid=zeros(1))
+        self.assertIsNone(cache.get(file_name.stem))
+        self.assertFalse(file_name.exists(), 'Incomplete result is kept')
+
+
+class TestTowerStore(TestCase):
+    """Class for compact towers storage testing."""
+
+    def setUp(self) -> None:
+        """Create data for testing."""
+        self.city = CityGrid(TEST_HEIGHT, TEST_WIDTH)
+        self.city.cover_with_towers(TEST_RANGE // 2)
+        self.city.create_paths()
+        pyplot.close('all')
+
+    def test_links(self) -> None:
+        """Test paths and connections after removing towers."""
+        towers = list(self.city.towers)
+        paths = list(self.city.paths)
+        checkpoint = self.city.checkpoint()
+        removed = {tower.position for tower in towers[::TEST_TOWERS_AMOUNT]}
+        for position in removed:
+            self.city.remove_tower(position)
+        paths_left = [path for path in paths if removed.isdisjoint(path)]
+        self.assertEqual(self.city.paths, paths_left, 'Paths are not removed')
+        for tower in self.city.towers:
+            self.assertEqual(
+                tower.covered,
+                self.city.get_covered_area(tower.position, tower.range),
+                'Covered area differs from footprint',
+            )
+            self.assertEqual(
+                tower.connections,
+                [
+                    path.end if path.start == tower.position else path.start
+                    for path in paths_left
+                    if tower.position in path
+                ],
+                'Connections do not match paths',
+            )
+        self.city.rollback(checkpoint)
+        self.assertEqual(self.city.towers, towers, 'Towers are not restored')
+        self.assertEqual(self.city.paths, paths, 'Paths are not restored')
+        for items, sequence in [
+            (towers, self.city.towers),
+            (paths, self.city.paths),
+        ]:
+            for part in [slice(None), slice(1, -1, 2), slice(None, None, -1)]:
+                self.assertEqual(sequence[part], items[part], 'Wrong slice')
+
+    def test_memory(self) -> None:
+        """Test towers with links take a few dozen bytes."""
+        store = TowerStore(self.city.get_covered_area)
+        for index in range(TEST_HEIGHT * TEST_WIDTH):
+            store.append(
+                Position(index // TEST_WIDTH, index % TEST_WIDTH),
+                TEST_RANGE,
+            )
+        store.add_links(arange(len(store) - 1), arange(1, len(store)))
+        self.assertEqual(
+            store[-1].connections,
+            [Position(TEST_HEIGHT - 1, TEST_WIDTH - 2)],
+        )
+        self.assertLessEqual(store.nbytes / len(store), TEST_TOWER_BYTES)
+
+
+class TestVerification(TestCase):
+    """Class for city state invariants testing."""
+
+    def setUp(self) -> None:
+        """Create data for testing."""
+        self.city = CityGrid(TEST_HEIGHT, TEST_WIDTH)
+        self.city.debug = True
+
+    def test_valid_states(self) -> None:
+        """Test invariants hold after changes in debug mode."""
+        for footprint in FOOTPRINTS:
+            self.city.cover_with_towers(
+                TEST_RANGE // 2,
+                strategy='greedy',
+                footprint=footprint,
+            )
+            self.city.create_paths()
+            pyplot.close('all')
+            with self.city.fork():
+                self.city.remove_tower(self.city.towers[0].position)
+                self.assertEqual(self.city.get_violations(), [])
+            self.assertEqual(self.city.get_violations(complete=True), [])
+            self.city.clear_city()
+        self.city.change_obstructed(TEST_PERCENTAGE, TEST_RANGE)
+        self.city.verify(complete=True)
+
+    def test_violations(self) -> None:
+        """Test broken grid, coverage, towers and links are found."""
+        corruptions: List[Tuple[str, Callable[[CityGrid], Any]]] = [
+            (
+                'Unknown grid codes',
+                lambda city: city.grid.fill(GRID_VALUES_AMOUNT),
+            ),
+            ('Coverage does not match', lambda city: city.coverage.fill(1)),
+            (
+                'Grid codes do not match obstructions',
+                lambda city: city.obstructions.fill(False),
+            ),
+            ('Counted 0 covered blocks', lambda city: city._amounts.fill(0)),
+            (
+                'Towers on obstructions',
+                lambda city: city.towers.append(
+                    min(city.obstructed_blocks),
+                    TEST_RANGE,
+                ),
+            ),
+            (
+                'Linked towers are out of range',
+                lambda city: city.towers.add_links(
+                    array([0]),
+                    array([len(city.towers) - 1]),
+                ),
+            ),
+        ]
+        for message, corrupt in corruptions:
+            city = CityGrid(TEST_HEIGHT, TEST_WIDTH)
+            city.cover_with_towers(TEST_RANGE)
+            city.create_paths()
+            pyplot.close('all')
+            corrupt(city)
+            violations = city.get_violations()
+            self.assertTrue(
+                any(violation.startswith(message) for violation in violations),
+                f'{message} is not found in {violations}',
+            )
+            with self.assertRaises(Exception):
+                city.verify()
+
+
+class TestHierarchy(TestCase):
+    """Class for hierarchical covering testing."""
+
+    def setUp(self) -> None:
+        """Create data for testing."""
+        self.mask = zeros((TEST_HEIGHT, TEST_WIDTH), bool)
+        start, end = TEST_RANGE, 3 * TEST_RANGE
+        self.mask[start:end, start:] = True
+        self.mask[-1, -1] = True
+
+    def test_tiling_positions(self) -> None:
+        """Test lattice towers are only in squares of chosen blocks."""
+        pyramid = build_pyramid(~self.mask, TEST_RANGE)
+        self.assertEqual(pyramid[-1].shape, (1, 1))
+        self.assertEqual(pyramid[-1][0, 0], (~self.mask).sum())
+        radius = TEST_RANGE // 2
+        size = 2 * radius + 1
+        positions = get_tiling_positions(~self.mask, 'square', radius)
+        expected = [
+            (x + radius, y + radius)
+            for x in range(0, TEST_HEIGHT - size + 1, size)
+            for y in range(0, TEST_WIDTH - size + 1, size)
+            if not self.mask[x:, y:][:size, :size].any()
+        ]
+        self.assertEqual(list(map(tuple, positions.tolist())), expected)
+        for footprint in FOOTPRINTS:
+            xs, ys = get_tiling_positions(
+                ones((TEST_HEIGHT, TEST_WIDTH), bool),
+                footprint,
+                radius,
+            ).T
+            coverage = accumulate_footprints(
+                (TEST_HEIGHT, TEST_WIDTH),
+                xs,
+                ys,
+                full(len(xs), radius),
+                footprint,
+            )
+            self.assertTrue(
+                coverage[size:-size, size:-size].all(),
+                f'Lattice of {footprint} footprint does not cover blocks',
+            )
+
+    def test_hierarchical_covering(self) -> None:
+        """Test the city is covered by lattice towers and greedy towers."""
+        city = CityGrid(TEST_HEIGHT, TEST_WIDTH, self.mask)
+        city.debug = True
+        radius = TEST_RANGE // 2
+        for footprint in FOOTPRINTS:
+            city.cover_with_towers(
+                radius,
+                strategy='hierarchical',
+                footprint=footprint,
+            )
+            city.verify(complete=True)
+            lattice = get_tiling_positions(~self.mask, footprint, radius)
+            self.assertLessEqual(
+                set(map(Position._make, lattice.tolist())),
+                city.towers.get_positions(),
+                'Lattice towers are not placed',
+            )
+        towers = list(city.towers)
+        with city.fork():
+            for tower in towers[::TEST_TOWERS_AMOUNT]:
+                city.remove_tower(tower.position)
+            city.cover_with_towers(
+                radius,
+                incremental=True,
+                strategy='hierarchical',
+            )
+            city.verify(complete=True)
+        self.assertEqual(city.towers, towers, 'Towers are not rolled back')
+
+
+class TestService(TestCase):
+    """Class for coverage service testing."""
+
+    def setUp(self) -> None:
+        """Start service with one worker and one waiting job."""
+        self.loop = new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.service = CoverageService(1, 1)
+        host, port = run_coroutine_threadsafe(
+            self.service.start(SERVICE_HOST, 0),
+            self.loop,
+        ).result()
+        self.url = f'http://{host}:{port}'
+
+    def tearDown(self) -> None:
+        """Stop service."""
+        run_coroutine_threadsafe(self.service.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def request(self, path: str, data: Any = None) -> Tuple[int, bytes]:
+        """Send request to service.
+
+        Args:
+            path: request path.
+            data: JSON data to post, GET request if not specified.
+
+        Returns:
+            Status and body of response.
+        """
+        body = None if data is None else json.dumps(data).encode()
+        try:
+            with urlopen(Request(self.url + path, body)) as response:
+                return response.status, response.read()
+        except HTTPError as error:
+            return error.code, error.read()
+
+    def test_jobs(self) -> None:
+        """Test results of service are the same as of CityGrid."""
+        mask = random.random((TEST_HEIGHT, TEST_WIDTH)) < 0.5
+        spec = {
+            'mask': [''.join(map(str, row)) for row in mask.astype(int)],
+            'range': TEST_RANGE,
+            'strategy': 'greedy',
+            'footprint': 'circle',
+        }
+        status, body = self.request('/jobs', spec)
+        self.assertEqual(status, 202, 'Job is not accepted')
+        key = json.loads(body)['id']
+        status, body = self.request(f'/jobs/{key}/result')
+        self.assertEqual(status, 200, 'Result is not streamed')
+        summary, *towers = map(json.loads, body.splitlines())
+        city = CityGrid(TEST_HEIGHT, TEST_WIDTH, mask)
+        city.cover_with_towers(
+            TEST_RANGE,
+            strategy='greedy',
+            footprint='circle',
+        )
+        self.assertEqual(
+            [(tower['x'], tower['y']) for tower in towers],
+            [tuple(tower.position) for tower in city.towers],
+            'Towers differ from CityGrid',
+        )
+        self.assertEqual(summary['towers'], len(city.towers))
+        self.assertEqual(summary['blocks']['clear'], 0)
+        spec['mask'] = mask.astype(int).tolist()
+        status, body = self.request('/jobs', spec)
+        self.assertEqual(status, 200, 'Result is not cached')
+        self.assertEqual(json.loads(body)['id'], key)
+        for route, data, expected in [
+            ('/jobs', {'range': TEST_RANGE}, 400),
+            ('/jobs', {**spec, 'strategy': 'random'}, 400),
+            ('/jobs/unknown', None, 404),
+            ('/unknown', None, 404),
+        ]:
+            self.assertEqual(self.request(route, data)[0], expected, route)
+
+    def test_backpressure(self) -> None:
+        """Test jobs are rejected while the queue is full."""
+        specs = [
+            {
+                'n': 200,
+                'm': 200,
+                'seed': seed,
+                'range': 2,
+                'strategy': 'greedy',
+            }
+            for seed in range(3)
+        ]
+        statuses = [self.request('/jobs', spec)[0] for spec in specs]
+        self.assertEqual(statuses, [202, 202, 503], 'Queue is not bounded')
+        key = json.loads(self.request('/jobs', specs[0])[1])['id']
+        status, body = self.request(f'/jobs/{key}/result')
+        self.assertEqual(status, 200, 'Result is not streamed')
+        self.assertEqual(
+            len(body.splitlines()) - 1,
+            json.loads(body.splitlines()[0])['towers'],
+        )
+
+    def test_aborted_stream(self) -> None:
+        """Test failed streams are aborted without error responses."""
+        spec = {
+            'n': TEST_HEIGHT,
+            'm': TEST_WIDTH,
+            'seed': 0,
+            'range': TEST_RANGE,
+        }
+        state = getstate()
+        summary, _ = cover_city(parse_spec(spec))
+        self.assertEqual(getstate(), state, 'Global generator is seeded')
+        key = json.loads(self.request('/jobs', spec)[1])['id']
+        status, body = self.request(f'/jobs/{key}/result')
+        self.assertEqual(json.loads(body.splitlines()[0]), summary)
+        self.service.jobs[key].positions = None  # type: ignore[assignment]
+        with self.assertRaises((IncompleteRead, ConnectionError)):
+            self.request(f'/jobs/{key}/result')
+
+    def test_truncated_request(self) -> None:
+        """Test truncated requests are dropped without response."""
+        address = self.url.split('//')[1].split(':')
+        with create_connection((address[0], int(address[1]))) as client:
+            client.sendall(
+                b'POST /jobs HTTP/1.1\r\nContent-Length: 100\r\n\r\n{',
+            )
+            client.shutdown(SHUT_WR)
+            self.assertEqual(client.recv(1), b'', 'Truncated request answered')
+        self.assertEqual(self.request('/unknown')[0], 404)
+
+
 if __name__ == '__main__':
     main()
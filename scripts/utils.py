@@ -1,29 +1,31 @@
 from math import ceil
-from typing import Any, Dict, List, Set, Union
-
-from numpy import floating, inf, ndarray, zeros
-
-from constants import TOTAL_PERCENTAGE
-from objects import Position, Tower
-
-
-def find_tower_by_path(towers: List[Tower], position: Position) -> Tower:
-    """Find tower by its path.
-
-    Args:
-        towers: list of towers.
-        position: specified position of tower.
-
-    Returns:
-        Founded tower.
-
-    Raises:
-        Exception if tower was not found.
-    """
-    for tower in towers:
-        if tower.position == position:
-            return tower
-    raise Exception('Tower not found in this position')
+from os import cpu_count
+from random import Random, sample
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from numpy import (
+    absolute,
+    add,
+    arange,
+    argsort,
+    array,
+    concatenate,
+    count_nonzero,
+    floating,
+    inf,
+    int64,
+    maximum,
+    minimum,
+    ndarray,
+    nonzero,
+    repeat,
+    searchsorted,
+    select,
+    zeros,
+)
+
+from constants import GRID_VALUES, GRID_VALUES_AMOUNT, TOTAL_PERCENTAGE
+from objects import Position, TowerType
 
 
 def get_percentage_amount(total_amount: int, percentage: float) -> int:
@@ -52,41 +54,162 @@ def get_percentage(total_amount: int, amount: int) -> float:
     return amount / total_amount * TOTAL_PERCENTAGE
 
 
-def create_grid_from_data(
+def create_random_mask(
     n: int,
     m: int,
-    data: Dict[Any, Set[Position]],
+    amount: int,
+    generator: Optional[Random] = None,
 ) -> ndarray:
-    """Create grid from data.
+    """Create mask with specified amount of randomly chosen blocks.
 
     Args:
         n: rows amount (height).
         m: columns amount (width).
-        data: values (except 0) with set of positions.
+        amount: amount of chosen blocks.
+        generator: random generator, the global one if not specified.
 
     Returns:
-        Created grid.
+        Boolean mask.
     """
-    grid = zeros((n, m))
-    for value, positions in data.items():
-        for position in positions:
-            grid[position] = value
-    return grid
+    blocks = range(n * m)
+    mask = zeros(n * m, bool)
+    mask[
+        sample(blocks, amount)
+        if generator is None
+        else generator.sample(blocks, amount)
+    ] = True
+    return mask.reshape(n, m)
 
 
-def change_grid_from_data(
-    grid: ndarray,
-    data: Dict[Any, Set[Position]],
-) -> None:
-    """Change specified grid using data.
+def get_positions_from_mask(mask: ndarray) -> Set[Position]:
+    """Get positions of all chosen blocks of mask.
 
     Args:
-        grid: grid to change.
-        data: values (except 0) with set of positions.
+        mask: boolean mask.
+
+    Returns:
+        Set of chosen positions.
     """
-    for value, positions in data.items():
-        for position in list(positions):
-            grid[position] = value
+    rows, columns = nonzero(mask)
+    return set(map(Position._make, zip(rows.tolist(), columns.tolist())))
+
+
+def get_position_arrays(
+    positions: Iterable[Position],
+) -> Tuple[ndarray, ndarray]:
+    """Get coordinates of different positions.
+
+    Args:
+        positions: positions of blocks, may be repeated.
+
+    Returns:
+        Arrays of x and y coordinates.
+    """
+    coordinates = array(list(set(positions)), int64).reshape(-1, 2)
+    return coordinates[:, 0], coordinates[:, 1]
+
+
+def count_grid_values(grid: ndarray) -> ndarray:
+    """Count blocks with every grid value.
+
+    Args:
+        grid: city grid.
+
+    Returns:
+        Amounts of blocks indexed by grid values.
+    """
+    return array(
+        [count_nonzero(grid == value) for value in range(GRID_VALUES_AMOUNT)],
+        int64,
+    )
+
+
+def get_grid_values(
+    obstructed: ndarray,
+    towers: ndarray,
+    coverage: ndarray,
+) -> ndarray:
+    """Calculate grid values of blocks.
+
+    Args:
+        obstructed: whether blocks are obstructed.
+        towers: whether blocks are occupied by towers.
+        coverage: amounts of towers covering blocks.
+
+    Returns:
+        Grid values of blocks.
+    """
+    return select(
+        [
+            towers,
+            obstructed & (coverage > 0),
+            obstructed,
+            coverage > 1,
+            coverage == 1,
+        ],
+        [
+            GRID_VALUES['tower'],
+            GRID_VALUES['obstructed covered'],
+            GRID_VALUES['obstructed'],
+            GRID_VALUES['over covered'],
+            GRID_VALUES['covered'],
+        ],
+        GRID_VALUES['clear'],
+    )
+
+
+def get_footprint_slices(
+    n: int,
+    m: int,
+    position: Position,
+    tower_range: int,
+) -> Tuple[slice, slice]:
+    """Get slices of grid covered by tower including tower position.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        position: tower position.
+        tower_range: tower range.
+
+    Returns:
+        Slices of rows and columns.
+    """
+    return (
+        slice(
+            max(0, position.x - tower_range),
+            min(n, position.x + tower_range + 1),
+        ),
+        slice(
+            max(0, position.y - tower_range),
+            min(m, position.y + tower_range + 1),
+        ),
+    )
+
+
+def get_rectangle_positions(
+    n: int,
+    m: int,
+    left_bottom: Position,
+    right_top: Position,
+) -> Set[Position]:
+    """Get all positions of rectangle inside the grid.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        left_bottom: corner with minimal coordinates.
+        right_top: corner with maximal coordinates.
+
+    Returns:
+        Set of positions including corners, except positions outside
+        of the grid.
+    """
+    return {
+        Position(i, j)
+        for i in range(max(0, left_bottom.x), min(n, right_top.x + 1))
+        for j in range(max(0, left_bottom.y), min(m, right_top.y + 1))
+    }
 
 
 def get_covered_area(
@@ -474,3 +597,216 @@ def additionally_optimize_place_for_tower(
                     uncovered_in_x_range,
                 )
     return optimal_position
+
+
+def get_cheapest_types(catalogue: Iterable[TowerType]) -> List[TowerType]:
+    """Choose the cheapest tower type for every range.
+
+    Args:
+        catalogue: tower types.
+
+    Returns:
+        Tower types in increasing order of ranges.
+
+    Raises:
+        Exception if catalogue is empty or some cost is not positive.
+    """
+    cheapest: Dict[int, TowerType] = {}
+    for tower_type in catalogue:
+        if tower_type.cost <= 0:
+            raise Exception('Tower cost should be positive')
+        if (
+            tower_type.range not in cheapest
+            or tower_type.cost < cheapest[tower_type.range].cost
+        ):
+            cheapest[tower_type.range] = tower_type
+    if not cheapest:
+        raise Exception('Tower catalogue is empty')
+    return [cheapest[tower_range] for tower_range in sorted(cheapest)]
+
+
+def get_footprint_bounds(
+    n: int,
+    m: int,
+    xs: ndarray,
+    ys: ndarray,
+    ranges: ndarray,
+) -> Tuple[ndarray, ndarray, ndarray, ndarray]:
+    """Get bounds of rectangles covered by towers.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        ranges: ranges of towers.
+
+    Returns:
+        First rows, last rows (excluded), first columns and last columns
+        (excluded).
+    """
+    return (
+        maximum(xs - ranges, 0),
+        minimum(xs + ranges + 1, n),
+        maximum(ys - ranges, 0),
+        minimum(ys + ranges + 1, m),
+    )
+
+
+def get_prefix_sums(mask: ndarray) -> ndarray:
+    """Get two-dimensional prefix sums (summed-area table) of mask.
+
+    Args:
+        mask: counted blocks.
+
+    Returns:
+        Array with one more row and column, where every element is the
+        amount of counted blocks with smaller coordinates.
+    """
+    prefix_sums = zeros((mask.shape[0] + 1, mask.shape[1] + 1), int64)
+    prefix_sums[1:, 1:] = mask.cumsum(axis=0, dtype=int64).cumsum(axis=1)
+    return prefix_sums
+
+
+def sum_rectangles(
+    prefix_sums: ndarray,
+    rows_start: ndarray,
+    rows_end: ndarray,
+    columns_start: ndarray,
+    columns_end: ndarray,
+) -> ndarray:
+    """Count blocks in rectangles using prefix sums.
+
+    Args:
+        prefix_sums: prefix sums of counted blocks.
+        rows_start: first rows of rectangles.
+        rows_end: last rows of rectangles (excluded).
+        columns_start: first columns of rectangles.
+        columns_end: last columns of rectangles (excluded).
+
+    Returns:
+        Amounts of counted blocks, zero for empty rectangles.
+    """
+    rows_end = maximum(rows_end, rows_start)
+    columns_end = maximum(columns_end, columns_start)
+    return (
+        prefix_sums[rows_end, columns_end]
+        - prefix_sums[rows_start, columns_end]
+        - prefix_sums[rows_end, columns_start]
+        + prefix_sums[rows_start, columns_start]
+    )
+
+
+def accumulate_rectangles(
+    n: int,
+    m: int,
+    bounds: Tuple[ndarray, ndarray, ndarray, ndarray],
+    weights: ndarray,
+) -> ndarray:
+    """Sum weights of rectangles covering every block.
+
+    Args:
+        n: rows amount (height).
+        m: columns amount (width).
+        bounds: first rows, last rows (excluded), first columns and last
+            columns (excluded) of rectangles.
+        weights: weights of rectangles.
+
+    Returns:
+        Sum of weights of rectangles for every block.
+    """
+    rows_start, rows_end, columns_start, columns_end = bounds
+    differences = zeros((n + 1, m + 1), int64)
+    add.at(differences, (rows_start, columns_start), weights)
+    add.at(differences, (rows_start, columns_end), -weights)
+    add.at(differences, (rows_end, columns_start), -weights)
+    add.at(differences, (rows_end, columns_end), weights)
+    return differences.cumsum(axis=0).cumsum(axis=1)[:n, :m]
+
+
+def expand_ranges(
+    starts: ndarray,
+    amounts: ndarray,
+) -> Tuple[ndarray, ndarray]:
+    """Expand ranges of indexes into one array.
+
+    Args:
+        starts: first indexes of ranges.
+        amounts: lengths of ranges.
+
+    Returns:
+        Index of range and index from this range for every element.
+    """
+    owners = repeat(arange(len(starts)), amounts)
+    offsets = amounts.cumsum() - amounts
+    shifts = arange(amounts.sum()) - repeat(offsets, amounts)
+    return owners, starts[owners] + shifts
+
+
+def find_tower_pairs(
+    xs: ndarray,
+    ys: ndarray,
+    ranges: ndarray,
+    gap: int = 0,
+) -> Tuple[ndarray, ndarray]:
+    """Find pairs of towers with close covered areas.
+
+    Towers are grouped into square buckets, so only towers from
+    neighboring buckets are compared.
+
+    Args:
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        ranges: ranges of towers.
+        gap: allowed distance between covered areas, 0 for overlapping.
+
+    Returns:
+        Indexes of first and second towers of pairs, first index is
+        always less than second.
+    """
+    if len(xs) < 2:
+        return zeros(0, int64), zeros(0, int64)
+    bucket_size = 2 * int(ranges.max()) + gap + 1
+    bucket_xs = xs // bucket_size
+    bucket_ys = ys // bucket_size - ys.min() // bucket_size + 1
+    width = int(bucket_ys.max()) + 2
+    keys = bucket_xs * width + bucket_ys
+    order = argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    firsts_list = []
+    seconds_list = []
+    for offset in (0, 1, width - 1, width, width + 1):
+        starts = searchsorted(sorted_keys, sorted_keys + offset, 'left')
+        ends = searchsorted(sorted_keys, sorted_keys + offset, 'right')
+        if offset == 0:
+            starts = arange(len(keys)) + 1
+        firsts, seconds = expand_ranges(starts, maximum(ends - starts, 0))
+        firsts_list.append(order[firsts])
+        seconds_list.append(order[seconds])
+    firsts = concatenate(firsts_list)
+    seconds = concatenate(seconds_list)
+    distances = ranges[firsts] + ranges[seconds] + gap
+    close = (absolute(xs[firsts] - xs[seconds]) <= distances) & (
+        absolute(ys[firsts] - ys[seconds]) <= distances
+    )
+    firsts, seconds = firsts[close], seconds[close]
+    return minimum(firsts, seconds), maximum(firsts, seconds)
+
+
+def get_workers(workers: Optional[int]) -> int:
+    """Get amount of threads.
+
+    Args:
+        workers: amount of threads, all processors if not specified.
+
+    Returns:
+        Positive amount of threads.
+
+    Raises:
+        Exception if amount of threads is not positive.
+    """
+    if workers is None:
+        return cpu_count() or 1
+    if workers < 1:
+        raise Exception('Amount of threads should be positive')
+    return workers
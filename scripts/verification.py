@@ -0,0 +1,306 @@
+from typing import List, Sequence, Tuple
+
+from numpy import (
+    absolute,
+    arange,
+    array,
+    bincount,
+    count_nonzero,
+    flatnonzero,
+    full,
+    iinfo,
+    isin,
+    minimum,
+    ndarray,
+    ones,
+    uint8,
+    unique,
+    zeros,
+)
+
+from constants import (
+    COVERAGE_LEVELS,
+    GRID_VALUES,
+    LINK_GAP,
+    VERIFICATION_AMOUNT,
+)
+from kernels import accumulate_footprints
+from utils import get_grid_values
+
+
+def get_first_blocks(mask: ndarray, amount: int) -> List[Tuple[int, int]]:
+    """Get the first chosen blocks in order of rows.
+
+    Args:
+        mask: boolean mask of chosen blocks.
+        amount: maximum amount of blocks.
+
+    Returns:
+        Coordinates of blocks.
+    """
+    found = flatnonzero(mask)[:amount]
+    width = mask.shape[1]
+    return list(zip((found // width).tolist(), (found % width).tolist()))
+
+
+def get_tower_positions(
+    xs: ndarray,
+    ys: ndarray,
+    indexes: ndarray,
+) -> List[Tuple[int, int]]:
+    """Get coordinates of chosen towers.
+
+    Args:
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        indexes: indexes of chosen towers.
+
+    Returns:
+        Coordinates of towers.
+    """
+    return list(zip(xs[indexes].tolist(), ys[indexes].tolist()))
+
+
+def describe(message: str, total: int, items: Sequence[object]) -> str:
+    """Describe violation with the first violating items.
+
+    Args:
+        message: description of violated invariant.
+        total: amount of violating items.
+        items: the first violating items.
+
+    Returns:
+        Description of violation.
+    """
+    return f'{message} ({total}): {", ".join(map(str, items))}'
+
+
+def describe_blocks(message: str, mask: ndarray, amount: int) -> str:
+    """Describe violation with the first violating blocks.
+
+    Args:
+        message: description of violated invariant.
+        mask: boolean mask of violating blocks.
+        amount: maximum amount of reported blocks.
+
+    Returns:
+        Description of violation.
+    """
+    return describe(
+        message,
+        count_nonzero(mask),
+        get_first_blocks(mask, amount),
+    )
+
+
+def find_violations(
+    grid: ndarray,
+    coverage: ndarray,
+    xs: ndarray,
+    ys: ndarray,
+    ranges: ndarray,
+    links: ndarray,
+    footprint: str,
+    obstructions: ndarray,
+    value_amounts: ndarray,
+    complete: bool = False,
+    amount: int = VERIFICATION_AMOUNT,
+) -> List[str]:
+    """Find violated invariants of city state.
+
+    Every invariant is checked by a few passes over arrays, so the check
+    takes time proportional to the grid size and amounts of towers and
+    links. Checked invariants:
+    - grid has only known codes;
+    - towers are on different blocks inside the grid, not on obstructions,
+      and only blocks of towers have the tower code;
+    - coverage is the amount of towers covering blocks by footprints,
+      except own blocks of towers;
+    - grid codes match obstructions, towers and coverage in every block;
+    - counted amounts of blocks with every grid value match the grid;
+    - links are between different existing towers within their ranges;
+    - no clear block is uncovered if covering is complete.
+
+    Args:
+        grid: grid codes of blocks.
+        coverage: amounts of towers covering blocks.
+        xs: x coordinates of towers.
+        ys: y coordinates of towers.
+        ranges: ranges of towers.
+        links: indexes of first and second towers of links.
+        footprint: shape of area covered by towers.
+        obstructions: boolean mask of obstructed blocks.
+        value_amounts: counted amounts of blocks indexed by grid values.
+        complete: check that all clear blocks are covered.
+        amount: maximum amount of reported items of every violation.
+
+    Returns:
+        Descriptions of violations with the first violating blocks,
+        towers or links.
+    """
+    violations = []
+    n, m = grid.shape
+    codes = grid.astype(uint8)
+    codes_amount = iinfo(uint8).max + 1
+    grid_amounts = bincount(codes.ravel(), minlength=codes_amount)
+    known_values = list(GRID_VALUES.values())
+    truncated = codes != grid
+    if grid_amounts[known_values].sum() < codes.size or truncated.any():
+        violations.append(
+            describe_blocks(
+                'Unknown grid codes in blocks',
+                truncated | ~isin(codes, known_values),
+                amount,
+            ),
+        )
+    inside = (xs >= 0) & (xs < n) & (ys >= 0) & (ys < m)
+    if not inside.all():
+        outside = flatnonzero(~inside)
+        violations.append(
+            describe(
+                'Towers outside of the grid',
+                len(outside),
+                get_tower_positions(xs, ys, outside[:amount]),
+            ),
+        )
+    obstructed_towers = zeros(len(xs), bool)
+    obstructed_towers[inside] = obstructions[xs[inside], ys[inside]]
+    if obstructed_towers.any():
+        obstructed = flatnonzero(obstructed_towers)
+        violations.append(
+            describe(
+                'Towers on obstructions',
+                len(obstructed),
+                get_tower_positions(xs, ys, obstructed[:amount]),
+            ),
+        )
+    inside_xs, inside_ys = xs[inside], ys[inside]
+    tower_blocks, towers_amounts = unique(
+        inside_xs * m + inside_ys,
+        return_counts=True,
+    )
+    repeated = tower_blocks[towers_amounts > 1]
+    if len(repeated):
+        violations.append(
+            describe(
+                'Several towers in blocks',
+                len(repeated),
+                list(
+                    zip(
+                        (repeated[:amount] // m).tolist(),
+                        (repeated[:amount] % m).tolist(),
+                    ),
+                ),
+            ),
+        )
+    tower_code = GRID_VALUES['tower']
+    if (
+        grid_amounts[tower_code] != len(tower_blocks)
+        or (codes.ravel()[tower_blocks] != tower_code).any()
+    ):
+        towers = zeros(n * m, bool)
+        towers[tower_blocks] = True
+        violations.append(
+            describe_blocks(
+                'Tower codes do not match towers in blocks',
+                (codes == tower_code) != towers.reshape(n, m),
+                amount,
+            ),
+        )
+    expected_coverage = accumulate_footprints(
+        (n, m),
+        inside_xs,
+        inside_ys,
+        ranges[inside],
+        footprint,
+    )
+    expected_coverage[inside_xs, inside_ys] -= 1
+    levels = arange(len(COVERAGE_LEVELS))
+    matching = ones((2, len(levels), codes_amount), bool)
+    matching[:, :, known_values] = False
+    matching[:, :, tower_code] = True
+    for obstruction in (False, True):
+        matching[
+            int(obstruction),
+            levels,
+            get_grid_values(
+                full(len(levels), obstruction),
+                zeros(len(levels), bool),
+                array(COVERAGE_LEVELS),
+            ),
+        ] = True
+    checks = [
+        (
+            'Coverage does not match towers in blocks',
+            expected_coverage != coverage,
+        ),
+        (
+            'Grid codes do not match obstructions and coverage in blocks',
+            ~matching.take(
+                (
+                    obstructions * len(levels)
+                    + minimum(expected_coverage, COVERAGE_LEVELS[-1])
+                )
+                * codes_amount
+                + codes,
+            ),
+        ),
+    ]
+    if complete and grid_amounts[GRID_VALUES['clear']]:
+        checks.append(
+            ('Clear blocks are not covered', codes == GRID_VALUES['clear']),
+        )
+    violations.extend(
+        describe_blocks(message, mask, amount)
+        for message, mask in checks
+        if mask.any()
+    )
+    for name, value in GRID_VALUES.items():
+        if value_amounts[value] != grid_amounts[value]:
+            violations.append(
+                f'Counted {value_amounts[value]} {name} blocks, '
+                f'grid has {grid_amounts[value]}',
+            )
+    firsts, seconds = links
+    size = len(inside)
+    existing = (
+        (firsts >= 0)
+        & (firsts < size)
+        & (seconds >= 0)
+        & (seconds < size)
+        & (firsts != seconds)
+    )
+    if not existing.all():
+        missing = flatnonzero(~existing)
+        violations.append(
+            describe(
+                'Links without two different towers',
+                len(missing),
+                list(
+                    zip(
+                        firsts[missing][:amount].tolist(),
+                        seconds[missing][:amount].tolist(),
+                    ),
+                ),
+            ),
+        )
+    firsts, seconds = firsts[existing], seconds[existing]
+    reach = ranges[firsts] + ranges[seconds] + LINK_GAP
+    far = flatnonzero(
+        (absolute(xs[firsts] - xs[seconds]) > reach)
+        | (absolute(ys[firsts] - ys[seconds]) > reach),
+    )
+    if len(far):
+        violations.append(
+            describe(
+                'Linked towers are out of range',
+                len(far),
+                list(
+                    zip(
+                        get_tower_positions(xs, ys, firsts[far[:amount]]),
+                        get_tower_positions(xs, ys, seconds[far[:amount]]),
+                    ),
+                ),
+            ),
+        )
+    return violations